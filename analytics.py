@@ -0,0 +1,178 @@
+import sqlite3
+from datetime import date, timedelta
+from database import get_connection
+
+# Consultas agregadas do dashboard sobre 'leads'. Cada uma recebe o WHERE de
+# filter_clause e devolve só o resultado já agrupado, nunca as linhas de 'leads'.
+
+SQL_KPIS = '''
+    SELECT COUNT(*) AS total_leads,
+           COUNT(l.modelo) AS modelos_count,
+           COALESCE(SUM(l.timestamp >= ? AND l.timestamp < ?), 0) AS leads_hoje,
+           COALESCE(SUM(l.timestamp >= ?), 0) AS leads_recentes
+    FROM leads l
+    {where}
+'''
+
+SQL_COUNT_LEADS_BY_DAY = '''
+    SELECT substr(l.timestamp, 1, 10) AS data_dia, COUNT(*) AS count
+    FROM leads l
+    {where}
+    GROUP BY data_dia
+    ORDER BY data_dia
+'''
+
+SQL_COUNT_LEADS_BY_MODEL = '''
+    SELECT l.modelo, COUNT(*) AS count
+    FROM leads l
+    {where}
+    GROUP BY l.modelo
+    ORDER BY count DESC, l.modelo
+'''
+
+SQL_COUNT_LEADS_BY_YEAR = '''
+    SELECT l.ano, COUNT(*) AS count
+    FROM leads l
+    {where}
+    GROUP BY l.ano
+    ORDER BY count DESC, l.ano
+'''
+
+SQL_COUNT_LEADS_BY_GAME = '''
+    SELECT g.titulo AS jogo, COUNT(*) AS count
+    FROM lead_games lg
+    JOIN games g ON g.id = lg.game_id
+    JOIN leads l ON l.id = lg.lead_id
+    {where}
+    GROUP BY g.id
+    ORDER BY count DESC, g.titulo
+'''
+
+# Sem filtro de ano, as mesmas contagens saem da tabela 'daily_rollups'
+# (O(dias) linhas). O ano clicado não é uma dimensão cruzada do rollup, então
+# com ele as consultas acima, sobre 'leads', continuam sendo usadas.
+
+SQL_ROLLUP_KPIS = '''
+    SELECT COALESCE(SUM(CASE WHEN dimensao = 'total' THEN count END), 0) AS total_leads,
+           COALESCE(SUM(CASE WHEN dimensao = 'modelo' THEN count END), 0) AS modelos_count,
+           COALESCE(SUM(CASE WHEN dimensao = 'total' AND dia = ? THEN count END), 0) AS leads_hoje,
+           COALESCE(SUM(CASE WHEN dimensao = 'total' AND dia >= ? THEN count END), 0) AS leads_recentes
+    FROM daily_rollups
+    {where}
+'''
+
+SQL_ROLLUP_BY_DAY = '''
+    SELECT dia AS data_dia, SUM(count) AS count
+    FROM daily_rollups
+    {where}
+    GROUP BY dia
+    HAVING SUM(count) > 0
+    ORDER BY dia
+'''
+
+SQL_ROLLUP_BY_VALUE = '''
+    SELECT valor, SUM(count) AS count
+    FROM daily_rollups
+    {where}
+    GROUP BY valor
+    HAVING SUM(count) > 0
+    ORDER BY count DESC, valor
+'''
+
+def _day(value):
+    """Converte date/datetime/str ('2025-08-30', '2025-08-30T10:00:00') para date."""
+    return date.fromisoformat(str(value)[:10])
+
+def filter_conditions(start_date=None, end_date=None, selected_year=None, alias='l'):
+    """Monta as condições dos filtros do dashboard.
+
+    Segue a mesma regra de create_dashboard_elements: o ano clicado no
+    gráfico tem prioridade sobre o intervalo de datas. Os timestamps são
+    ISO 8601, então o intervalo vira uma comparação de texto que usa o
+    índice em 'timestamp'. Retorna (lista de condições, parâmetros).
+    """
+    if selected_year is not None:
+        return [f"{alias}.ano = ?"], [selected_year]
+    if start_date and end_date:
+        fim = _day(end_date) + timedelta(days=1)
+        return [f"{alias}.timestamp >= ?", f"{alias}.timestamp < ?"], [_day(start_date).isoformat(), fim.isoformat()]
+    return [], []
+
+def filter_clause(start_date=None, end_date=None, selected_year=None, alias='l', extra=()):
+    """Como filter_conditions, mas já monta o WHERE (com condições extras). Retorna (sql, parâmetros)."""
+    conditions, params = filter_conditions(start_date, end_date, selected_year, alias)
+    conditions = conditions + list(extra)
+    if not conditions:
+        return "", tuple(params)
+    return "WHERE " + " AND ".join(conditions), tuple(params)
+
+def _fetch_all(sql, params=()):
+    """Executa a consulta e retorna as linhas; um banco ainda sem as tabelas conta como vazio."""
+    with get_connection() as conn:
+        try:
+            return conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError:
+            return []
+
+def rollup_clause(start_date=None, end_date=None, dimensoes=('total',)):
+    """WHERE sobre 'daily_rollups' para as dimensões e o intervalo de datas. Retorna (sql, parâmetros)."""
+    conditions = ["dimensao IN (%s)" % ', '.join('?' for _ in dimensoes)]
+    params = list(dimensoes)
+    if start_date and end_date:
+        conditions.append("dia >= ? AND dia <= ?")
+        params += [_day(start_date).isoformat(), _day(end_date).isoformat()]
+    return "WHERE " + " AND ".join(conditions), tuple(params)
+
+def _count_by_value(dimensao, base_sql, start_date, end_date, selected_year, not_null_column):
+    if selected_year is None:
+        where, params = rollup_clause(start_date, end_date, (dimensao,))
+        return _fetch_all(SQL_ROLLUP_BY_VALUE.format(where=where), params)
+    extra = [f"{not_null_column} IS NOT NULL"] if not_null_column else []
+    where, params = filter_clause(start_date, end_date, selected_year, extra=extra)
+    return _fetch_all(base_sql.format(where=where), params)
+
+def count_kpis(start_date=None, end_date=None, selected_year=None, today=None):
+    """Indicadores do topo do dashboard.
+
+    Retorna um dict com 'total_leads', 'modelos_count' (leads com modelo
+    informado), 'leads_hoje' e 'leads_recentes' (desde 7 dias atrás).
+    """
+    today = today or date.today()
+    semana = (today - timedelta(days=7)).isoformat()
+    if selected_year is None:
+        where, params = rollup_clause(start_date, end_date, ('total', 'modelo'))
+        rows = _fetch_all(SQL_ROLLUP_KPIS.format(where=where), (today.isoformat(), semana) + params)
+    else:
+        where, params = filter_clause(start_date, end_date, selected_year)
+        kpi_params = (today.isoformat(), (today + timedelta(days=1)).isoformat(), semana)
+        rows = _fetch_all(SQL_KPIS.format(where=where), kpi_params + params)
+    total_leads, modelos_count, leads_hoje, leads_recentes = rows[0] if rows else (0, 0, 0, 0)
+    return {
+        'total_leads': total_leads,
+        'modelos_count': modelos_count,
+        'leads_hoje': leads_hoje,
+        'leads_recentes': leads_recentes,
+    }
+
+def count_leads_by_day(start_date=None, end_date=None, selected_year=None):
+    """Leads por dia, em ordem cronológica. Retorna uma lista de ('AAAA-MM-DD', quantidade)."""
+    if selected_year is None:
+        where, params = rollup_clause(start_date, end_date)
+        return _fetch_all(SQL_ROLLUP_BY_DAY.format(where=where), params)
+    where, params = filter_clause(start_date, end_date, selected_year)
+    return _fetch_all(SQL_COUNT_LEADS_BY_DAY.format(where=where), params)
+
+def count_leads_by_model(start_date=None, end_date=None, selected_year=None):
+    """Leads por modelo de console, do mais comum para o menos comum. Retorna (modelo, quantidade)."""
+    return _count_by_value('modelo', SQL_COUNT_LEADS_BY_MODEL, start_date, end_date, selected_year, 'l.modelo')
+
+def count_leads_by_year(start_date=None, end_date=None, selected_year=None):
+    """Leads por ano de fabricação, do mais comum para o menos comum. Retorna (ano, quantidade)."""
+    return _count_by_value('ano', SQL_COUNT_LEADS_BY_YEAR, start_date, end_date, selected_year, 'l.ano')
+
+def count_leads_by_game(start_date=None, end_date=None, selected_year=None):
+    """Quantidade de leads que escolheram cada jogo, do mais pedido para o menos pedido.
+
+    Retorna uma lista de (título, quantidade).
+    """
+    return _count_by_value('jogo', SQL_COUNT_LEADS_BY_GAME, start_date, end_date, selected_year, None)
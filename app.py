@@ -1,11 +1,14 @@
+import os
 import dash
 import dash_bootstrap_components as dbc
 from dash import dcc, html
 from dash.dependencies import Input, Output
 from pages import dashboard_page, status_page, leads_page
 from database import init_db
-from chatbot import whatsapp_webhook
-from flask import request
+from events import lead_events, sse_stream
+from export import ExportError, export_leads
+from health import health_blueprint
+from flask import Response, request
 
 # Use o link direto para a folha de estilo do Bootstrap
 BS_THEME = "https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css"
@@ -18,13 +21,51 @@ server = app.server
 init_db()
 
 # --- ROTA PARA O WEBHOOK DO WHATSAPP (TWILIO) ---
-@server.route("/whatsapp_webhook", methods=["POST"])
-def webhook():
-    return whatsapp_webhook()
+# Por padrão o painel também atende o webhook. Numa implantação separada
+# (webhook_app.py em outro processo), use CHATBOT_SERVE_WEBHOOK=0.
+SERVE_WEBHOOK = os.environ.get('CHATBOT_SERVE_WEBHOOK', '1') == '1'
+
+if SERVE_WEBHOOK:
+    from webhook_app import webhook_blueprint
+    server.register_blueprint(webhook_blueprint)
+
+# --- SAÚDE (/health, JSON) E MÉTRICAS (/metrics, PROMETHEUS) ---
+server.register_blueprint(health_blueprint)
+
+# --- STREAM DE ATUALIZAÇÕES AO VIVO (SSE) ---
+# Consumido por assets/live_updates.js; cada conexão aberta ocupa uma thread do servidor.
+# Os eventos só são publicados pelo webhook deste processo: sem ele, a rota não existe,
+# o EventSource falha e as páginas ficam no polling.
+if SERVE_WEBHOOK:
+    @server.route("/events/leads")
+    def lead_events_stream():
+        return Response(
+            sse_stream(lead_events.subscribe()),
+            mimetype="text/event-stream",
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+
+# --- EXPORTAÇÃO DOS LEADS (CSV, CSV.GZ OU PARQUET, EM STREAMING) ---
+# Ex.: /export/leads?formato=csv.gz&inicio=2025-08-01&fim=2025-08-31&status=FINALIZADO
+@server.route("/export/leads")
+def export_leads_download():
+    try:
+        body, mimetype, filename = export_leads(
+            request.args.get('formato', 'csv'),
+            request.args.get('inicio'),
+            request.args.get('fim'),
+            request.args.get('status'),
+        )
+    except ExportError as e:
+        return Response(str(e), status=400, mimetype="text/plain")
+    return Response(body, mimetype=mimetype, headers={'Content-Disposition': f'attachment; filename="{filename}"'})
 
 # Layout principal que inclui a barra de navegação e o conteúdo dinâmico do Dash
 app.layout = html.Div([
     dcc.Location(id='url', refresh=False),
+    # Preenchidos por assets/live_updates.js (último evento de lead e estado da conexão SSE)
+    dcc.Store(id='live-lead-event'),
+    dcc.Store(id='live-connected', data=False),
     dbc.NavbarSimple(
         children=[
             dbc.NavItem(dcc.Link("Dashboard", href="/", className="nav-link")),
@@ -46,11 +87,11 @@ app.layout = html.Div([
 )
 def display_page(pathname):
     if pathname == '/leads':
-        return leads_page.layout
+        return leads_page.layout()
     elif pathname == '/status':
-        return status_page.layout
+        return status_page.layout()
     else:
-        return dashboard_page.layout
+        return dashboard_page.layout()
 
 # Não chame as funções de callback aqui. O Dash as executará automaticamente.
 
@@ -0,0 +1,65 @@
+// Atualizações ao vivo do dashboard via Server-Sent Events.
+//
+// Cada lead gravado pelo chatbot chega como um evento 'lead' e é copiado para
+// o dcc.Store 'live-lead-event', que dispara os callbacks das páginas. Numa
+// rajada de eventos, o Store é atualizado no máximo uma vez a cada
+// MIN_INTERVAL_MS, sempre com o último evento recebido. Se o
+// navegador não suportar EventSource, se a versão do Dash não tiver
+// set_props ou se a conexão cair, o 'live-connected' fica falso e as páginas
+// continuam atualizando pelos dcc.Interval.
+(function () {
+    if (!window.EventSource) {
+        return;
+    }
+
+    var MIN_INTERVAL_MS = 1500;
+
+    function setProps(id, props) {
+        if (window.dash_clientside && window.dash_clientside.set_props) {
+            window.dash_clientside.set_props(id, props);
+            return true;
+        }
+        return false;
+    }
+
+    function connect() {
+        var source = new EventSource('/events/leads');
+        var lastUpdate = 0;
+        var pending = null;
+        var timer = null;
+
+        function flush() {
+            timer = null;
+            lastUpdate = Date.now();
+            var event = pending;
+            pending = null;
+            if (!setProps('live-lead-event', {data: event})) {
+                // Dash sem set_props: fica só com o polling
+                source.close();
+            }
+        }
+
+        source.onopen = function () {
+            setProps('live-connected', {data: true});
+        };
+
+        source.addEventListener('lead', function (message) {
+            pending = JSON.parse(message.data);
+            if (timer === null) {
+                // O primeiro evento sai na hora; os seguintes esperam o fim do intervalo
+                timer = setTimeout(flush, Math.max(0, lastUpdate + MIN_INTERVAL_MS - Date.now()));
+            }
+        });
+
+        source.onerror = function () {
+            // O EventSource reconecta sozinho; enquanto isso, volta para o polling
+            setProps('live-connected', {data: false});
+        };
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', connect);
+    } else {
+        connect();
+    }
+})();
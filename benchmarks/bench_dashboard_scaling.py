@@ -0,0 +1,168 @@
+"""Benchmark das páginas do painel com volumes crescentes de leads.
+
+Para cada tamanho de --sizes (padrão: 10 mil, 100 mil e 1 milhão), gera um
+banco sintético com benchmarks.generate_leads e mede, num processo Python
+novo, o trabalho feito por trás de cada página:
+
+- Dashboard (update_dashboard): indicadores e contagens de analytics para o
+  filtro padrão (hoje), o último ano e o histórico inteiro. Essas leituras
+  usam os rollups diários. Também mede um filtro por ano de fabricação,
+  que consulta 'leads' diretamente. Se pandas e plotly estiverem
+  instalados, inclui a montagem das figuras (create_dashboard_elements).
+- Leads (update_table): primeira e última página, ordenação por nome e
+  filtro por status, via leads_query.fetch_leads_page.
+- Exportação (antigo generate_csv): download completo em CSV e CSV.gz por
+  export.export_leads.
+- Status (check_db_status): sondagem do banco por health.db_health.
+
+Cada operação roda --repeat vezes e o script mostra a mediana em ms. Sem
+--data-dir, os bancos são gerados numa pasta temporária apagada no final.
+Com --data-dir, eles são mantidos e reaproveitados nas próximas
+execuções, o que evita gerar de novo 1 milhão de leads.
+
+Uso:
+    python -m benchmarks.bench_dashboard_scaling [--sizes 10000 100000 1000000] [--repeat 3]
+                                                 [--data-dir /tmp/chatbot-scaling] [--output resultado.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def _drain(body):
+    return sum(len(part) for part in body)
+
+
+def operations():
+    """Lista de (nome, função sem argumentos) medidas em cada banco. Importa os módulos do app."""
+    from datetime import date, timedelta
+    import analytics
+    from export import export_leads
+    from leads_query import fetch_leads_page
+
+    today = date.today()
+    last_year = today - timedelta(days=365)
+
+    def dashboard(start_date, end_date, selected_year=None):
+        def run():
+            analytics.count_kpis(start_date, end_date, selected_year)
+            analytics.count_leads_by_day(start_date, end_date, selected_year)
+            analytics.count_leads_by_model(start_date, end_date, selected_year)
+            analytics.count_leads_by_year(start_date, end_date, selected_year)
+            analytics.count_leads_by_game(start_date, end_date, selected_year)
+        return run
+
+    _, total = fetch_leads_page(0, 10)
+    last_page = max(0, (total - 1) // 10)
+    ops = [
+        ('dashboard: hoje', dashboard(today, today)),
+        ('dashboard: último ano', dashboard(last_year, today)),
+        ('dashboard: tudo', dashboard(None, None)),
+        ('dashboard: ano 2010', dashboard(None, None, 2010)),
+        ('leads: primeira página', lambda: fetch_leads_page(0, 10)),
+        ('leads: última página', lambda: fetch_leads_page(last_page, 10)),
+        ('leads: ordenado por nome', lambda: fetch_leads_page(0, 10, [{'column_id': 'nome', 'direction': 'asc'}])),
+        ('leads: filtro status', lambda: fetch_leads_page(0, 10, None, '{status} = AGUARDANDO_JOGOS')),
+        ('export: csv', lambda: _drain(export_leads('csv')[0])),
+        ('export: csv.gz', lambda: _drain(export_leads('csv.gz')[0])),
+    ]
+
+    try:
+        from pages.dashboard_page import create_dashboard_elements
+    except ImportError as e:
+        print(f"figuras do dashboard ignoradas ({e})", file=sys.stderr)
+    else:
+        ops.append(('dashboard: figuras (último ano)', lambda: create_dashboard_elements(last_year, today)))
+
+    try:
+        from health import db_health
+    except ImportError as e:
+        print(f"status do banco ignorado ({e})", file=sys.stderr)
+    else:
+        ops.append(('status: db_health', db_health))
+    return ops
+
+
+def run_child(rows, repeat):
+    """Executado no processo filho (CHATBOT_DB já definido): gera o banco se preciso e mede as operações."""
+    import database
+    from benchmarks.generate_leads import generate_leads
+
+    database.init_db()
+    with database.get_connection() as conn:
+        existing = conn.execute("SELECT COUNT(*) FROM leads").fetchone()[0]
+        generated_in = None
+        if existing != rows:
+            if existing:
+                raise SystemExit(f"'{database.DB_PATH}' tem {existing} leads, esperado {rows}; apague o arquivo.")
+            generated_in = generate_leads(conn, rows)
+
+    results = {'rows': rows, 'generated_seconds': generated_in, 'operations': {}}
+    for name, fn in operations():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+        results['operations'][name] = statistics.median(timings) * 1000
+    print(json.dumps(results))
+
+
+def measure(rows, repeat, data_dir):
+    """Roda o filho para um tamanho de banco e retorna o resultado (dict)."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, CHATBOT_DB=os.path.join(data_dir, f'leads_{rows}.db'))
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_dashboard_scaling', '--child', '--rows', str(rows), '--repeat', str(repeat)],
+        cwd=root, env=env, stdout=subprocess.PIPE, text=True,
+    )
+    if output.returncode != 0:
+        raise RuntimeError(f"Falha na medição com {rows} leads.")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--data-dir', help='pasta onde os bancos gerados são mantidos e reaproveitados (padrão: pasta temporária)')
+    parser.add_argument('--output', help='grava os resultados em JSON')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--rows', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.rows, args.repeat)
+        return
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='chatbot-scaling-')
+    os.makedirs(data_dir, exist_ok=True)
+    try:
+        results = []
+        for rows in args.sizes:
+            result = measure(rows, args.repeat, data_dir)
+            if result['generated_seconds'] is not None:
+                print(f"{rows} leads gerados em {result['generated_seconds']:.1f}s")
+            results.append(result)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    names = list(results[0]['operations']) if results else []
+    print(f"\n{'operação (mediana, ms)':<34}" + ''.join(f"{result['rows']:>12}" for result in results))
+    for name in names:
+        print(f"{name:<34}" + ''.join(f"{result['operations'].get(name, float('nan')):>12.1f}" for result in results))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark do índice de busca de jogos (game_search.GameSearchIndex).
+
+Gera um catálogo sintético (padrão: 10.000 títulos) misturando palavras
+comuns em títulos de jogos com nomes próprios inventados, como num catálogo
+real, mede o tempo de construção do índice e a latência das buscas com
+textos parciais e com erros de digitação.
+
+Uso:
+    python -m benchmarks.bench_game_search [--titles 10000] [--queries 2000]
+"""
+import argparse
+import json
+import random
+import time
+
+from game_search import GameSearchIndex
+
+WORDS = (
+    "call duty black ops ghosts advanced warfare grand theft auto forza horizon motorsport "
+    "halo reach assassins creed brotherhood revelations unity fifa pes street fighter mortal "
+    "kombat metal slug sonic sega racing need speed most wanted carbon underground spider man "
+    "batman arkham city asylum origins gears war battlefield bad company far cry crysis metro "
+    "resident evil dead rising lego star wars marvel avengers tomb raider mass effect skyrim "
+    "oblivion fallout bioshock infinite borderlands dragon ball naruto storm tekken soul calibur"
+).split()
+SYLLABLES = "ka ri to na mo ze lu vi sha dor gan tek rax mil ver un bo qua fen tor li es ar".split()
+SUFFIXES = ("", " 2", " 3", " 4", " II", " III", " IV", " V", " 2013", " 2018", " Edition", " Remastered")
+
+
+def synthetic_catalog(size, seed=42):
+    """Títulos únicos montados a partir do content.json e de combinações de palavras."""
+    rng = random.Random(seed)
+    with open('content.json', 'r', encoding='utf-8') as f:
+        titles = list(json.load(f).get('jogos', {}).values())
+    # Nomes próprios (franquias, personagens): cerca de metade do número de títulos
+    names = list({''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size // 2)})
+    seen = {t.lower() for t in titles}
+    while len(titles) < size:
+        words = [rng.choice(names)] + [rng.choice(WORDS) for _ in range(rng.randint(1, 3))]
+        rng.shuffle(words)
+        title = ' '.join(words).title() + rng.choice(SUFFIXES)
+        if title.lower() not in seen:
+            seen.add(title.lower())
+            titles.append(title)
+    return {str(i + 1): title for i, title in enumerate(titles)}
+
+
+def typo(text, rng):
+    """Aplica um erro de digitação simples (troca, remoção ou duplicação de letra)."""
+    if len(text) < 4:
+        return text
+    i = rng.randrange(1, len(text) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    if kind == 1:
+        return text[:i] + text[i + 1:]
+    return text[:i] + text[i] + text[i:]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--titles', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    catalog = synthetic_catalog(args.titles)
+
+    start = time.perf_counter()
+    index = GameSearchIndex(catalog)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"Índice com {len(index)} títulos construído em {build_ms:.0f} ms")
+
+    titles = list(catalog.values())
+    queries = []
+    for _ in range(args.queries):
+        title = rng.choice(titles)
+        queries.append((typo(title.lower(), rng), title))
+
+    latencies = []
+    found = 0
+    for query, title in queries:
+        start = time.perf_counter()
+        results = index.search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += any(result_title == title for _, _, result_title in results)
+
+    print(f"{len(queries)} buscas com erro de digitação | título certo entre os 5 primeiros: {found / len(queries):.0%}")
+    print(f"latência média {sum(latencies) / len(latencies):.3f} ms | "
+          f"p50 {percentile(latencies, 0.50):.3f} ms | "
+          f"p99 {percentile(latencies, 0.99):.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
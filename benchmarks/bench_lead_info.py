@@ -0,0 +1,76 @@
+"""Microbenchmark da leitura de um lead por mensagem (database.get_lead_info).
+
+Compara o caminho atual (sqlite3.Row -> dict) com o caminho antigo, que
+montava um DataFrame do pandas só para devolver uma linha.
+
+Uso:
+    python -m benchmarks.bench_lead_info [--leads 5000] [--calls 2000]
+"""
+import argparse
+import os
+import tempfile
+import timeit
+
+# O banco de teste precisa estar definido antes de importar o database
+_tmpdir = tempfile.mkdtemp(prefix='chatbot-bench-')
+os.environ['CHATBOT_DB'] = os.path.join(_tmpdir, 'bench.db')
+
+import database  # noqa: E402
+
+
+def populate(total_leads):
+    """Cria `total_leads` leads distribuídos entre 500 telefones."""
+    database.init_db()
+    with database.transaction() as conn:
+        for i in range(total_leads):
+            database._insert_lead(conn, {
+                'timestamp': f"2025-01-01T00:00:{i % 60:02d}.{i:06d}",
+                'nome': 'Teste',
+                'email': 'teste@exemplo.com',
+                'telefone': f"whatsapp:+55{i % 500:011d}",
+                'endereco': 'Rua A, 1',
+                'modelo': 'Slim',
+                'ano': 2010,
+                'tipo_de_armazenamento': 'HD Interno',
+                'jogos_selecionados': 'GTA V, FIFA 19',
+                'status': 'AGUARDANDO_LOCALIZACAO',
+            })
+
+
+def get_lead_info_pandas(phone_number):
+    """Implementação antiga, baseada em pandas (apenas para comparação)."""
+    import pandas as pd
+    with database.get_connection() as conn:
+        df = pd.read_sql_query(database.SQL_SELECT_LEAD, conn, params=(phone_number,))
+    return df.iloc[0].to_dict() if not df.empty else None
+
+
+def report(name, seconds, calls):
+    print(f"{name:<28} {seconds / calls * 1e6:10.1f} µs/chamada")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--leads', type=int, default=5000)
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+
+    populate(args.leads)
+    phone = "whatsapp:+55" + f"{42:011d}"
+
+    row_time = timeit.timeit(lambda: database.get_lead_info(phone), number=args.calls)
+    report("sqlite3.Row (atual)", row_time, args.calls)
+
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        print("pandas não instalado: comparação com o caminho antigo ignorada.")
+        return
+
+    pandas_time = timeit.timeit(lambda: get_lead_info_pandas(phone), number=args.calls)
+    report("pandas DataFrame (antigo)", pandas_time, args.calls)
+    print(f"Ganho: {pandas_time / row_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Benchmark do tempo de inicialização (import) dos pontos de entrada da aplicação.
+
+Cada módulo é importado num processo Python novo, sobre um banco de teste
+já migrado (as migrações consultam 'leads', mas rodam uma única vez e não
+fazem parte do que se quer medir), e o script mede o tempo do import.
+Também verifica o que o import carregou: se pandas/plotly já estão em
+memória e quantas consultas à tabela 'leads' foram feitas antes de
+qualquer requisição (o esperado é zero).
+
+Com --check o script termina com erro se algum módulo passar de
+--max-seconds, carregar pandas/plotly ou consultar 'leads' no import, e
+pode ser usado como verificação automática.
+
+Uso:
+    python -m benchmarks.bench_startup [--modules webhook_app app] [--runs 5] [--check] [--max-seconds 3]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Módulos que não deveriam ser carregados só para subir o app
+HEAVY_MODULES = ('pandas', 'plotly.express', 'plotly.graph_objects')
+
+# Executado no processo filho: mede o import e conta as consultas a 'leads'
+CHILD_SCRIPT = '''
+import json, sqlite3, sys, time
+
+queries = []
+connect = sqlite3.connect
+
+def traced_connect(*args, **kwargs):
+    conn = connect(*args, **kwargs)
+    conn.set_trace_callback(lambda sql: queries.append(sql) if 'FROM leads' in sql else None)
+    return conn
+
+sqlite3.connect = traced_connect
+
+start = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - start
+
+print(json.dumps({
+    'seconds': elapsed,
+    'heavy': [name for name in sys.argv[2:] if name in sys.modules],
+    'leads_queries': len(queries),
+}))
+'''
+
+
+def prepare_db(path):
+    """Cria e migra o banco de teste, para que o import medido encontre o esquema em dia (como em produção)."""
+    from database import migrate
+
+    conn = sqlite3.connect(path)
+    try:
+        migrate(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def measure(module, runs):
+    """Importa `module` `runs` vezes, cada uma num processo novo. Retorna a lista de resultados."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory(prefix='chatbot-startup-') as tmpdir:
+            db_path = os.path.join(tmpdir, 'startup.db')
+            prepare_db(db_path)
+            env = dict(os.environ, CHATBOT_DB=db_path)
+            output = subprocess.run(
+                [sys.executable, '-c', CHILD_SCRIPT, module, *HEAVY_MODULES],
+                cwd=root, env=env, capture_output=True, text=True,
+            )
+        if output.returncode != 0:
+            raise RuntimeError(f"Falha ao importar '{module}':\n{output.stderr.strip()}")
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', nargs='+', default=['webhook_app', 'app'])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--check', action='store_true', help='termina com erro se algum limite for violado')
+    parser.add_argument('--max-seconds', type=float, default=3.0)
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'módulo':<12} {'mediana':>10} {'mínimo':>10}  pesados carregados / consultas a leads")
+    for module in args.modules:
+        try:
+            results = measure(module, args.runs)
+        except RuntimeError as e:
+            print(e)
+            failures.append(module)
+            continue
+        seconds = [result['seconds'] for result in results]
+        heavy = sorted(set().union(*(result['heavy'] for result in results)))
+        leads_queries = max(result['leads_queries'] for result in results)
+        median = statistics.median(seconds)
+        print(f"{module:<12} {median * 1000:>8.1f}ms {min(seconds) * 1000:>8.1f}ms  "
+              f"{', '.join(heavy) or '-'} / {leads_queries}")
+        if median > args.max_seconds or heavy or leads_queries:
+            failures.append(module)
+
+    if args.check and failures:
+        print(f"Limites violados: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
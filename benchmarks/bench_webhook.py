@@ -0,0 +1,271 @@
+"""Teste de carga do webhook do WhatsApp (/whatsapp_webhook).
+
+Simula --users usuários simultâneos, cada um numa thread com o seu
+telefone, percorrendo --conversations vezes o fluxo completo, de "oi" até
+AGUARDANDO_LOCALIZACAO. Com probabilidade --retry-rate, cada etapa recebe
+antes uma resposta inválida (nome com números, email sem @, ano fora da
+faixa...), como um usuário real que erra e tenta de novo.
+
+Por padrão as mensagens são posts de formulário no mesmo formato da
+Twilio, enviados pelo cliente de teste do Flask a webhook_app.create_app(),
+sobre um chatbot.db temporário criado só para o teste. Com --url os posts
+vão por HTTP para um servidor já em execução. Nesse caso o banco é o do
+servidor e os erros de lock não são contados, pois só aparecem no log dele.
+
+Relata vazão (mensagens e conversas por segundo), percentis de latência,
+respostas de erro e erros de "database is locked". Com --save-baseline o
+resultado é gravado em --baseline (JSON). Se esse arquivo existir, cada
+execução é comparada com ele, e com --check o script termina com erro
+quando a vazão cai ou o p95 sobe mais que --tolerance.
+
+Uso:
+    python -m benchmarks.bench_webhook [--users 20] [--conversations 5] [--retry-rate 0.3] [--async]
+                                       [--url http://localhost:5000/whatsapp_webhook]
+                                       [--baseline benchmarks/baselines/webhook.json] [--save-baseline] [--check]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+# Etapas do fluxo: (mensagem válida, mensagens inválidas possíveis antes dela)
+FLOW = (
+    ('oi', ()),
+    ('joao da silva', ('j0ao', 'joao_123')),
+    ('joao@exemplo.com', ('joao.exemplo.com', 'joao@')),
+    ('rua das flores, 10', ()),
+    ('2', ('7', 'slim')),
+    ('2010', ('1999', 'dois mil e dez')),
+    ('1', ('5', 'hd')),
+    ('1, 14, 3', ('', '1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16')),
+    ('1', ('3', 'talvez')),
+)
+
+# Trecho da última resposta de uma conversa concluída (o resumo do atendimento)
+SUMMARY_MARKER = 'Resumo do seu Atendimento'
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'webhook.json')
+
+
+def conversation_messages(rng, retry_rate):
+    """Mensagens de uma conversa completa, com tentativas inválidas sorteadas."""
+    messages = []
+    for valid, invalid in FLOW:
+        if invalid and rng.random() < retry_rate:
+            messages.append(rng.choice(invalid))
+        messages.append(valid)
+    return messages
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class LockErrorCounter(logging.Handler):
+    """Conta os erros de banco bloqueado registrados pelo webhook e pelo processamento assíncrono."""
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def emit(self, record):
+        error = record.exc_info[1] if record.exc_info else None
+        if record.name == 'chatbot' and error is not None and 'locked' in str(error):
+            self.count += 1
+
+
+class FlaskClientTransport:
+    """Envia os posts pelo cliente de teste do Flask (um cliente por thread)."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def post(self, phone, body):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.post('/whatsapp_webhook', data={'From': phone, 'Body': body})
+        return response.get_data(as_text=True)
+
+
+class HttpTransport:
+    """Envia os posts por HTTP para um servidor em execução."""
+
+    def __init__(self, url):
+        self.url = url
+
+    def post(self, phone, body):
+        data = urllib.parse.urlencode({'From': phone, 'Body': body}).encode('utf-8')
+        with urllib.request.urlopen(self.url, data=data, timeout=30) as response:
+            return response.read().decode('utf-8')
+
+
+def run_user(transport, index, args, results, error_message):
+    """Percorre as conversas de um usuário e acumula as latências e as respostas em `results`."""
+    rng = random.Random(args.seed + index)
+    phone = f"whatsapp:+5599{index:09d}"
+    latencies, errors, completed = [], 0, 0
+    for _ in range(args.conversations):
+        body = ''
+        for message in conversation_messages(rng, args.retry_rate):
+            started = time.perf_counter()
+            body = transport.post(phone, message)
+            latencies.append(time.perf_counter() - started)
+            if error_message in body:
+                errors += 1
+        if SUMMARY_MARKER in body:
+            completed += 1
+    with results['lock']:
+        results['latencies'].extend(latencies)
+        results['errors'] += errors
+        results['completed'] += completed
+        results['phones'].append(phone)
+
+
+def setup_local(args):
+    """Prepara o banco temporário e o app do webhook. Retorna (transporte, contador de locks, remetente falso ou None)."""
+    tmpdir = tempfile.mkdtemp(prefix='chatbot-load-')
+    os.environ['CHATBOT_DB'] = os.path.join(tmpdir, 'chatbot.db')
+    # Sem linhas de log por turno durante a medição (as métricas continuam sendo contadas)
+    os.environ.setdefault('CHATBOT_TRACE_SAMPLE_RATE', '0')
+    if args.async_mode:
+        os.environ['CHATBOT_ASYNC_MODE'] = '1'
+        os.environ['CHATBOT_OUTBOUND_SENDER'] = 'fake'
+
+    from webhook_app import create_app
+    from outbound import get_sender
+
+    counter = LockErrorCounter()
+    logging.getLogger('chatbot').addHandler(counter)
+    # As respostas do modo assíncrono ficam no remetente falso, onde são conferidas no final
+    return FlaskClientTransport(create_app()), counter, get_sender() if args.async_mode else None
+
+
+def run(args):
+    """Executa o teste de carga e retorna o resultado como dict."""
+    if args.url:
+        transport, counter, sender = HttpTransport(args.url), None, None
+    else:
+        transport, counter, sender = setup_local(args)
+    # Importado só depois de setup_local, que define o banco e o modo do chatbot
+    from chatbot import ERROR_MESSAGE
+
+    results = {'latencies': [], 'errors': 0, 'completed': 0, 'phones': [], 'lock': threading.Lock()}
+    threads = [
+        threading.Thread(target=run_user, args=(transport, index, args, results, ERROR_MESSAGE))
+        for index in range(args.users)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if args.async_mode and not args.url:
+        # No modo assíncrono o post só confirma o recebimento: espera as filas esvaziarem
+        from dispatcher import get_dispatcher
+        get_dispatcher().stop()
+        results['completed'] = sum(
+            1 for phone in results['phones']
+            for reply in sender.messages_to(phone) if SUMMARY_MARKER in reply
+        )
+        results['errors'] = sum(
+            1 for phone in results['phones']
+            for reply in sender.messages_to(phone) if ERROR_MESSAGE in reply
+        )
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(results['latencies'])
+    return {
+        'mode': 'http' if args.url else ('async' if args.async_mode else 'sync'),
+        'users': args.users,
+        'conversations': args.users * args.conversations,
+        'completed': results['completed'],
+        'messages': len(latencies),
+        'seconds': elapsed,
+        'messages_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'conversations_per_second': results['completed'] / elapsed if elapsed else 0.0,
+        'latency_p50_ms': percentile(latencies, 0.50) * 1000,
+        'latency_p95_ms': percentile(latencies, 0.95) * 1000,
+        'latency_p99_ms': percentile(latencies, 0.99) * 1000,
+        'latency_max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+        'latency_mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        'error_responses': results['errors'],
+        'lock_errors': counter.count if counter is not None else None,
+    }
+
+
+def compare(result, baseline, tolerance):
+    """Lista as regressões de `result` em relação a `baseline` (vazão e p95, com a tolerância relativa dada)."""
+    regressions = []
+    if result['messages_per_second'] < baseline['messages_per_second'] * (1 - tolerance):
+        regressions.append(
+            f"vazão {result['messages_per_second']:.1f} msg/s < {baseline['messages_per_second']:.1f} msg/s da referência")
+    if result['latency_p95_ms'] > baseline['latency_p95_ms'] * (1 + tolerance):
+        regressions.append(
+            f"p95 {result['latency_p95_ms']:.1f}ms > {baseline['latency_p95_ms']:.1f}ms da referência")
+    if result['completed'] < result['conversations']:
+        regressions.append(f"{result['conversations'] - result['completed']} conversas não chegaram ao resumo")
+    if result['lock_errors']:
+        regressions.append(f"{result['lock_errors']} erros de banco bloqueado")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--conversations', type=int, default=5, help='conversas completas por usuário')
+    parser.add_argument('--retry-rate', type=float, default=0.3, help='chance de uma resposta inválida antes de cada etapa')
+    parser.add_argument('--async', dest='async_mode', action='store_true', help='usa CHATBOT_ASYNC_MODE=1 com o remetente falso')
+    parser.add_argument('--url', help='envia para um servidor em execução em vez do cliente de teste do Flask')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='grava o resultado em --baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--check', action='store_true', help='termina com erro se houver regressão em relação à referência')
+    args = parser.parse_args()
+
+    result = run(args)
+    print(f"modo {result['mode']}: {result['users']} usuários, {result['completed']}/{result['conversations']} conversas concluídas")
+    print(f"{result['messages']} mensagens em {result['seconds']:.2f}s: "
+          f"{result['messages_per_second']:.1f} msg/s, {result['conversations_per_second']:.1f} conversas/s")
+    print(f"latência: p50 {result['latency_p50_ms']:.1f}ms | p95 {result['latency_p95_ms']:.1f}ms | "
+          f"p99 {result['latency_p99_ms']:.1f}ms | máx {result['latency_max_ms']:.1f}ms")
+    lock_errors = '-' if result['lock_errors'] is None else result['lock_errors']
+    print(f"respostas de erro: {result['error_responses']} | erros de banco bloqueado: {lock_errors}")
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        setup = ('mode', 'users', 'conversations')
+        if any(baseline.get(key) != result[key] for key in setup):
+            print("referência ignorada: gravada com outro modo, quantidade de usuários ou de conversas")
+        else:
+            regressions = compare(result, baseline, args.tolerance)
+            print(f"referência ({baseline.get('recorded_at', '?')}): " + ('; '.join(regressions) or 'sem regressões'))
+
+    if args.save_baseline:
+        result.update(recorded_at=time.strftime('%Y-%m-%d %H:%M:%S'), python=platform.python_version(), platform=platform.platform())
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"Referência gravada em '{args.baseline}'.")
+
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""Gerador de leads sintéticos para testar o painel com volumes grandes.
+
+Preenche o esquema completo (leads, lead_games, active_sessions e os rollups
+diários) com dados plausíveis:
+- telefones com DDD brasileiro, alguns clientes voltando mais de uma vez;
+- datas ao longo de --years anos, com mais leads nos meses recentes e no
+  horário comercial;
+- modelo coerente com o ano de fabricação (Fat 2007–2010, Slim 2010–2013,
+  Super Slim 2013–2015);
+- tipos de armazenamento e jogos do content.json, com os jogos mais
+  populares escolhidos com mais frequência;
+- conversas interrompidas em cada etapa (AGUARDANDO_*), com os campos
+  ainda não respondidos como 'Não informado'.
+
+Os leads são inseridos em lotes, direto pelas tabelas. Os rollups são
+recalculados uma vez no final, em vez de um delta por lead. Por segurança,
+o banco de destino precisa ser informado explicitamente e não pode já ter
+leads, a menos que --append seja usado.
+
+Uso:
+    python -m benchmarks.generate_leads --db /tmp/leads_1m.db --rows 1000000 [--years 3] [--seed 42] [--append]
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Quantidade de leads gravados por transação
+BATCH_SIZE = 20000
+
+DDDS = ('11', '12', '19', '21', '27', '31', '41', '47', '48', '51', '61', '62', '71', '81', '85', '91', '92', '98')
+
+FIRST_NAMES = (
+    'Ana', 'Bruno', 'Carla', 'Daniel', 'Eduardo', 'Fernanda', 'Gabriel', 'Helena', 'Igor', 'Julia',
+    'Lucas', 'Mariana', 'Nicolas', 'Otavio', 'Paula', 'Rafael', 'Sofia', 'Thiago', 'Vitor', 'Yasmin',
+)
+
+LAST_NAMES = (
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Rodrigues', 'Almeida', 'Nascimento',
+    'Ferreira', 'Araujo', 'Ribeiro', 'Carvalho', 'Gomes', 'Martins', 'Rocha', 'Barbosa',
+)
+
+EMAIL_DOMAINS = ('gmail.com', 'hotmail.com', 'outlook.com', 'yahoo.com.br', 'uol.com.br')
+
+STREETS = ('Rua das Flores', 'Avenida Brasil', 'Rua XV de Novembro', 'Rua São João', 'Avenida Paulista', 'Rua da Paz')
+
+CITIES = ('São Paulo', 'Rio de Janeiro', 'Belo Horizonte', 'Curitiba', 'Porto Alegre', 'Salvador', 'Recife', 'Fortaleza')
+
+# Modelo -> (peso, anos de fabricação possíveis)
+MODELS = {
+    'Fat': (3, range(2007, 2011)),
+    'Slim': (5, range(2010, 2014)),
+    'Super Slim': (2, range(2013, 2016)),
+}
+
+# Tipo de armazenamento -> peso
+STORAGE_TYPES = {'HD Interno': 35, 'HD Externo': 25, 'Pendrive 16gb+': 25, 'Não tenho': 15}
+
+# Etapas da conversa na ordem do fluxo e o campo respondido em cada uma
+STAGES = (
+    ('AGUARDANDO_NOME', 'nome'),
+    ('AGUARDANDO_EMAIL', 'email'),
+    ('AGUARDANDO_ENDERECO', 'endereco'),
+    ('AGUARDANDO_MODELO', 'modelo'),
+    ('AGUARDANDO_ANO', 'ano'),
+    ('AGUARDANDO_ARMAZENAMENTO', 'tipo_de_armazenamento'),
+    ('AGUARDANDO_JOGOS', 'jogos_selecionados'),
+    ('AGUARDANDO_LOCALIZACAO', None),
+)
+
+# Chance de a conversa parar em cada etapa (o restante chega a FINALIZADO)
+DROP_OFF = (0.06, 0.04, 0.03, 0.03, 0.02, 0.03, 0.05, 0.04)
+
+# Peso de cada hora do dia (mais mensagens no horário comercial e à noite)
+HOUR_WEIGHTS = (1, 1, 1, 1, 1, 1, 2, 4, 6, 8, 9, 9, 8, 8, 9, 9, 8, 8, 9, 10, 10, 8, 5, 2)
+
+SQL_INSERT_LEAD_WITH_ID = '''
+    INSERT INTO leads (id, timestamp, nome, email, telefone, endereco, modelo, ano, tipo_de_armazenamento, jogos_selecionados, status)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+SQL_INSERT_LEAD_GAME_IDS = "INSERT INTO lead_games (lead_id, game_id) VALUES (?, ?)"
+
+
+def load_game_titles(path='content.json'):
+    """Títulos dos jogos do catálogo, na ordem do menu."""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = json.load(f)
+    return list(content.get('jogos', {}).values())
+
+
+class LeadFactory:
+    """Monta leads sintéticos a partir de um gerador aleatório com semente fixa (resultados reproduzíveis)."""
+
+    def __init__(self, rows, game_titles, years=3, end=None, seed=42):
+        self.rng = random.Random(seed)
+        self.end = end or datetime.now()
+        self.span = timedelta(days=365 * years).total_seconds()
+        self.game_titles = game_titles
+        # Popularidade dos jogos no estilo Zipf: o primeiro do menu é o mais pedido
+        self.game_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(game_titles) + 1)))
+        self.model_weights = list(itertools.accumulate(weight for weight, _ in MODELS.values()))
+        self.storage_weights = list(itertools.accumulate(STORAGE_TYPES.values()))
+        # Cerca de 20% dos leads são de telefones que já tinham conversado antes
+        self.phones = [self._phone() for _ in range(max(1, int(rows * 0.8)))]
+
+    def _phone(self):
+        return f"whatsapp:+55{self.rng.choice(DDDS)}9{self.rng.randrange(10**8):08d}"
+
+    def timestamps(self, count):
+        """`count` datas em ordem crescente, concentradas nos meses mais recentes."""
+        start = self.end - timedelta(seconds=self.span)
+        days = sorted(self.rng.random() ** 0.6 * self.span for _ in range(count))
+        hours = self.rng.choices(range(24), weights=HOUR_WEIGHTS, k=count)
+        result = []
+        for offset, hour in zip(days, hours):
+            moment = start + timedelta(seconds=offset)
+            moment = moment.replace(hour=hour, minute=self.rng.randrange(60), second=self.rng.randrange(60))
+            result.append(min(moment, self.end).isoformat())
+        # A troca de hora pode desordenar o mesmo dia; os ids seguem a ordem cronológica
+        return sorted(result)
+
+    def _games(self):
+        count = min(15, 1 + int(self.rng.expovariate(1 / 3)))
+        chosen = []
+        while len(chosen) < min(count, len(self.game_titles)):
+            titulo = self.rng.choices(self.game_titles, cum_weights=self.game_weights)[0]
+            if titulo not in chosen:
+                chosen.append(titulo)
+        return chosen
+
+    def lead(self, timestamp):
+        """Retorna (dict com as colunas do lead, lista de jogos escolhidos)."""
+        rng = self.rng
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        modelo = rng.choices(list(MODELS), cum_weights=self.model_weights)[0]
+        armazenamento = rng.choices(list(STORAGE_TYPES), cum_weights=self.storage_weights)[0]
+        games = self._games() if armazenamento != 'Não tenho' else []
+        answers = {
+            'nome': f"{first} {last}",
+            'email': f"{first}.{last}{rng.randrange(1000)}@{rng.choice(EMAIL_DOMAINS)}".lower(),
+            'endereco': f"{rng.choice(STREETS)}, {rng.randrange(1, 3000)} - {rng.choice(CITIES)}",
+            'modelo': modelo,
+            'ano': rng.choice(MODELS[modelo][1]),
+            'tipo_de_armazenamento': armazenamento,
+            'jogos_selecionados': ', '.join(games) if games else 'Nenhum, pois não tem armazenamento',
+        }
+
+        # Etapa em que a conversa parou (None = chegou ao fim)
+        stop = None
+        for index, chance in enumerate(DROP_OFF):
+            if rng.random() < chance:
+                stop = index
+                break
+        if stop is None:
+            status = 'FINALIZADO'
+        elif STAGES[stop][0] == 'AGUARDANDO_JOGOS' and armazenamento == 'Não tenho':
+            status = 'AGUARDANDO_CONTINUAR'
+        else:
+            status = STAGES[stop][0]
+        answered = {field for _, field in STAGES[:stop]} if stop is not None else set(answers)
+
+        lead = {
+            'timestamp': timestamp,
+            'nome': 'Não informado',
+            'email': 'Não informado',
+            'telefone': rng.choice(self.phones),
+            'endereco': 'Não informado',
+            'modelo': 'Não informado',
+            'ano': 0,
+            'tipo_de_armazenamento': 'Não informado',
+            'jogos_selecionados': 'Não informado',
+            'status': status,
+        }
+        lead.update({field: value for field, value in answers.items() if field in answered})
+        return lead, games if 'jogos_selecionados' in answered else []
+
+
+def generate_leads(conn, rows, years=3, seed=42, end=None, game_titles=None, progress=None):
+    """Insere `rows` leads sintéticos em `conn` e recalcula os rollups. Retorna o tempo gasto (segundos).
+
+    O commit é feito a cada BATCH_SIZE leads. `progress(inseridos)`, se
+    informado, é chamado após cada lote.
+    """
+    from database import LEAD_COLUMNS, SQL_INSERT_GAME, SQL_UPSERT_ACTIVE_SESSION, rebuild_rollups
+
+    started = time.perf_counter()
+    game_titles = game_titles or load_game_titles()
+    factory = LeadFactory(rows, game_titles, years=years, end=end, seed=seed)
+
+    conn.executemany(SQL_INSERT_GAME, [(titulo,) for titulo in game_titles])
+    game_ids = dict(conn.execute("SELECT titulo, id FROM games").fetchall())
+    next_id = (conn.execute("SELECT MAX(id) FROM leads").fetchone()[0] or 0) + 1
+    conn.commit()
+
+    # Lead mais recente de cada telefone, que vira a sessão ativa
+    latest = {}
+    timestamps = factory.timestamps(rows)
+    for batch_start in range(0, rows, BATCH_SIZE):
+        lead_rows, game_rows = [], []
+        for timestamp in timestamps[batch_start:batch_start + BATCH_SIZE]:
+            lead, games = factory.lead(timestamp)
+            lead_rows.append((next_id,) + tuple(lead[col] for col in LEAD_COLUMNS))
+            game_rows.extend((next_id, game_ids[titulo]) for titulo in games)
+            latest[lead['telefone']] = (next_id, timestamp)
+            next_id += 1
+        conn.executemany(SQL_INSERT_LEAD_WITH_ID, lead_rows)
+        conn.executemany(SQL_INSERT_LEAD_GAME_IDS, game_rows)
+        conn.commit()
+        if progress:
+            progress(min(batch_start + BATCH_SIZE, rows))
+
+    conn.executemany(
+        SQL_UPSERT_ACTIVE_SESSION,
+        [(telefone, lead_id, timestamp, None) for telefone, (lead_id, timestamp) in latest.items()],
+    )
+    rebuild_rollups(conn)
+    conn.commit()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', required=True, help='arquivo do banco de destino (criado se não existir)')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--append', action='store_true', help='permite acrescentar leads a um banco que já tem leads')
+    args = parser.parse_args()
+
+    # O banco precisa estar definido antes de importar o database
+    os.environ['CHATBOT_DB'] = args.db
+    import database
+
+    database.init_db()
+    with database.get_connection() as conn:
+        existing = conn.execute("SELECT COUNT(*) FROM leads").fetchone()[0]
+        if existing and not args.append:
+            print(f"'{args.db}' já tem {existing} leads; use --append para acrescentar mais.")
+            sys.exit(1)
+        seconds = generate_leads(
+            conn, args.rows, years=args.years, seed=args.seed,
+            progress=lambda done: print(f"\r{done}/{args.rows} leads", end='', flush=True),
+        )
+    print(f"\n{args.rows} leads gerados em '{args.db}' em {seconds:.1f}s.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from game_search import GameSearchIndex, normalize as normalize_title
+
+# Intervalo mínimo entre duas verificações do arquivo (em segundos)
+CHECK_INTERVAL = float(os.environ.get('CHATBOT_CATALOG_CHECK_INTERVAL', '2'))
+
+logger = logging.getLogger('chatbot.catalog')
+
+# Quantas versões antigas do catálogo são mantidas para as conversas em andamento
+HISTORY_SIZE = 8
+
+# Quantas versões não encontradas por `loader` são lembradas (para não consultá-lo a cada turno)
+MISSING_SIZE = 256
+
+
+def build_prompts(content):
+    """Monta os menus que dependem do content.json."""
+    menu_modelos = "Obrigado! Qual é o modelo do seu Xbox? Por favor, digite o número da opção:\n"
+    for num, modelo in content.get("modelos_xbox", {}).items():
+        menu_modelos += f"{num} - {modelo}\n"
+    menu_modelos += "\n[9 - Sair]"
+
+    jogos_options = ""
+    for num, jogo in content.get("jogos", {}).items():
+        jogos_options += f"{num}. {jogo}\n"
+    menu_jogos = f"Escolha 15 jogos da lista abaixo, separados por vírgula:\n{jogos_options}\n[9 - Sair]"
+
+    return {'menu_modelos': menu_modelos, 'menu_jogos': menu_jogos}
+
+
+class CatalogSnapshot:
+    """Versão imutável do content.json, com menus e índices pré-calculados.
+
+    - `modelos` / `jogos`: número digitado -> título
+    - `prompts`: textos dos menus prontos para envio
+    - `titulos`: título normalizado -> número do jogo
+    - `busca`: índice de busca por texto livre sobre os jogos
+    - `content`: o JSON em forma canônica, e `version`, o hash dele. O mesmo
+      conteúdo tem a mesma versão em qualquer processo e após reiniciar.
+    """
+
+    __slots__ = ('version', 'content', 'modelos', 'jogos', 'prompts', 'titulos', 'busca')
+
+    def __init__(self, content):
+        jogos = dict(content.get("jogos", {}))
+        self.content = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        self.version = hashlib.sha256(self.content.encode('utf-8')).hexdigest()[:16]
+        self.modelos = MappingProxyType(dict(content.get("modelos_xbox", {})))
+        self.jogos = MappingProxyType(jogos)
+        self.prompts = MappingProxyType(build_prompts(content))
+        self.titulos = MappingProxyType({normalize_title(titulo): num for num, titulo in jogos.items()})
+        self.busca = GameSearchIndex(jogos)
+
+    def resolve_game(self, text):
+        """Resolve um item digitado na seleção de jogos.
+
+        Aceita o número do menu, o título exato ou um texto aproximado
+        ("gta 5", "cod black ops"). Retorna (título, sugestões): o título é
+        None quando não há um resultado claro, e as sugestões trazem os
+        (número, título) mais prováveis quando o texto é ambíguo.
+        """
+        text = text.strip()
+        if text in self.jogos:
+            return self.jogos[text], []
+        num = self.titulos.get(normalize_title(text))
+        if num is not None:
+            return self.jogos[num], []
+        num, titulo, sugestoes = self.busca.resolve(text)
+        return titulo, sugestoes
+
+
+class Catalog:
+    """Catálogo recarregável do content.json.
+
+    A cada consulta (no máximo uma vez a cada `check_interval` segundos) o
+    mtime do arquivo é comparado com o da versão carregada; se mudou, um
+    novo CatalogSnapshot é montado e trocado atomicamente. Um JSON inválido
+    é ignorado e a versão anterior continua valendo. As últimas versões
+    ficam guardadas para que uma conversa em andamento continue usando a
+    numeração que o usuário viu no menu. Uma versão que não está mais em
+    memória (processo reiniciado, ou carregada por outro processo) é pedida
+    a `loader(versão)`, que retorna o conteúdo gravado ou None. Uma versão
+    que o loader não encontrou é lembrada e a conversa passa a usar a
+    versão atual, sem nova consulta a cada turno.
+    """
+
+    def __init__(self, path, check_interval=CHECK_INTERVAL, loader=None):
+        self.path = path
+        self.check_interval = check_interval
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._last_check = 0.0
+        self._history = OrderedDict()
+        self._missing = OrderedDict()
+        self._snapshot = CatalogSnapshot({})
+        self.reload()
+
+    def reload(self):
+        """Relê o arquivo e troca o snapshot atual. Retorna True se uma nova versão foi carregada."""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                logger.error("O arquivo '%s' não foi encontrado. Certifique-se de que ele está na mesma pasta que o 'chatbot.py'.", self.path)
+                return False
+            # Registra o mtime mesmo se a leitura falhar: só tenta de novo quando o arquivo mudar outra vez
+            self._mtime = mtime
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    content = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error("Erro ao recarregar '%s': %s. Mantendo a versão anterior do catálogo.", self.path, e)
+                return False
+
+            snapshot = CatalogSnapshot(content)
+            self._remember(snapshot)
+            self._snapshot = snapshot
+            return True
+
+    def _remember(self, snapshot):
+        self._history[snapshot.version] = snapshot
+        self._history.move_to_end(snapshot.version)
+        while len(self._history) > HISTORY_SIZE:
+            self._history.popitem(last=False)
+
+    def current(self):
+        """Retorna o snapshot atual, recarregando o arquivo se ele mudou."""
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime = self._mtime
+            if mtime != self._mtime:
+                self.reload()
+        return self._snapshot
+
+    def snapshot(self, version=None):
+        """Retorna a versão pedida (da memória ou de `loader`) ou, se ela não for encontrada, a versão atual."""
+        current = self.current()
+        if version is None or version == current.version:
+            return current
+        snapshot = self._history.get(version)
+        if snapshot is None and self.loader is not None and version not in self._missing:
+            try:
+                content = self.loader(version)
+            except Exception as e:
+                # Falha do loader (ex.: banco ocupado): tenta de novo no próximo turno
+                logger.error("Erro ao carregar a versão %s do catálogo: %s", version, e)
+                return current
+            with self._lock:
+                if content is None:
+                    logger.warning("Versão %s do catálogo não encontrada; usando a atual (%s)", version, current.version)
+                    self._missing[version] = True
+                    while len(self._missing) > MISSING_SIZE:
+                        self._missing.popitem(last=False)
+                else:
+                    snapshot = CatalogSnapshot(content)
+                    self._remember(snapshot)
+        return snapshot or current
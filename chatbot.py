@@ -1,26 +1,65 @@
 from flask import request
 from twilio.twiml.messaging_response import MessagingResponse
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
-from database import get_lead_status, update_lead_status_and_data, get_lead_info, save_lead_to_db
-import json
+from functools import partial
+from database import load_catalog_version, load_conversation_turn
+from dispatcher import get_dispatcher
+from outbound import get_sender, sender_configured
+from state_machine import StateMachine
+from catalog import Catalog
+from health import turn_metrics
+from tracing import TurnTrace, logger
+import os
 import re
+import time
 
-# Carrega o conteúdo dinâmico do arquivo JSON
-try:
-    with open('content.json', 'r', encoding='utf-8') as f:
-        content_data = json.load(f)
-except FileNotFoundError:
-    print("Erro: O arquivo 'content.json' não foi encontrado. Certifique-se de que ele está na mesma pasta que o 'chatbot.py'.")
-    content_data = {}
+# Modo assíncrono: o webhook só enfileira a mensagem e a resposta é enviada pelos workers
+ASYNC_MODE = os.environ.get('CHATBOT_ASYNC_MODE', '0') == '1'
 
-def start_new_conversation(sender_phone_number):
+# Tempo máximo que o webhook síncrono espera pelo worker da conversa
+SYNC_TIMEOUT = 10.0
+
+ERROR_MESSAGE = "Erro interno. Por favor, tente novamente mais tarde."
+
+# Resposta quando a mensagem nem chegou a ser processada dentro de SYNC_TIMEOUT (a conversa não mudou)
+BUSY_MESSAGE = "Estamos com muitas mensagens no momento. Por favor, envie sua última mensagem novamente."
+
+# Catálogo dinâmico (content.json), recarregado automaticamente quando o arquivo muda
+catalog = Catalog('content.json', loader=load_catalog_version)
+
+# Opções de armazenamento: número digitado -> (tipo de armazenamento, próxima etapa)
+OPCOES_ARMAZENAMENTO = {
+    '1': ('HD Interno', 'AGUARDANDO_JOGOS'),
+    '2': ('HD Externo', 'AGUARDANDO_JOGOS'),
+    '3': ('Pendrive 16gb+', 'AGUARDANDO_JOGOS'),
+    '4': ('Não tenho', 'AGUARDANDO_CONTINUAR'),
+}
+
+def handle_unknown(incoming_msg, turn):
+    """Resposta padrão quando não há conversa em andamento."""
+    return "Desculpe, não entendi. Por favor, digite 'oi' para começar."
+
+# Tabela de despacho da conversa (preenchida pelos decoradores abaixo)
+conversa = StateMachine(fallback=handle_unknown)
+
+@conversa.command('9')
+def handle_exit(incoming_msg, turn):
+    """Encerra o atendimento em qualquer etapa."""
+    turn.update('FINALIZADO', {})
+    return "Atendimento finalizado. Para começar um novo, digite 'oi'."
+
+@conversa.command('oi')
+def start_new_conversation(incoming_msg, turn):
     """Inicia uma nova conversa e cria um lead."""
+    # Uma conversa nova sempre usa a versão mais recente do catálogo
+    turn.catalog = catalog.current()
     response_message = "Olá! 👋 Bem-vindo ao Da Hora Games! Para começar, por favor, informe seu nome. 🎮"
     lead_data = {
         'timestamp': datetime.now().isoformat(),
         'nome': 'Não informado',
         'email': 'Não informado',
-        'telefone': sender_phone_number,
+        'telefone': turn.phone_number,
         'endereco': 'Não informado',
         'modelo': 'Não informado',
         'ano': 0,
@@ -28,52 +67,53 @@ def start_new_conversation(sender_phone_number):
         'jogos_selecionados': 'Não informado',
         'status': 'AGUARDANDO_NOME'
     }
-    save_lead_to_db(lead_data)
+    turn.start_lead(lead_data)
     return response_message
 
-def handle_awaiting_name(incoming_msg, sender_phone_number):
+@conversa.state('AGUARDANDO_NOME')
+def handle_awaiting_name(incoming_msg, turn):
     """Trata a mensagem quando o chatbot está aguardando o nome do usuário."""
     if not re.match(r'^[a-zA-Z\s]+$', incoming_msg):
         return "Nome inválido. Por favor, digite seu nome usando apenas letras e espaços. ✍️"
     else:
         nome = incoming_msg.capitalize()
-        update_lead_status_and_data(sender_phone_number, 'AGUARDANDO_EMAIL', {'nome': nome})
+        turn.update('AGUARDANDO_EMAIL', {'nome': nome})
         return f"Certo, {nome}! Agora, por favor, me informe seu email: [9 - Sair]"
 
-def handle_awaiting_email(incoming_msg, sender_phone_number):
+@conversa.state('AGUARDANDO_EMAIL')
+def handle_awaiting_email(incoming_msg, turn):
     """Trata a mensagem quando o chatbot está aguardando o email do usuário."""
     if not re.match(r'[^@]+@[^@]+\.[^@]+', incoming_msg):
         return "Email inválido. Por favor, digite um email no formato correto (ex: seu.nome@dominio.com). 📧"
     else:
-        lead_info = get_lead_info(sender_phone_number)
+        lead_info = turn.lead
         if lead_info:
             nome = lead_info.get('nome', 'amigo')
-            update_lead_status_and_data(sender_phone_number, 'AGUARDANDO_ENDERECO', {'email': incoming_msg})
+            turn.update('AGUARDANDO_ENDERECO', {'email': incoming_msg})
             return f"Obrigado, {nome}! Qual é o seu endereço completo? 🏡 [9 - Sair]"
         else:
-            update_lead_status_and_data(sender_phone_number, 'FINALIZADO')
+            turn.update('FINALIZADO')
             return "Desculpe, não consegui encontrar seus dados. Por favor, reinicie a conversa digitando 'oi'."
 
-def handle_awaiting_address(incoming_msg, sender_phone_number):
+@conversa.state('AGUARDANDO_ENDERECO')
+def handle_awaiting_address(incoming_msg, turn):
     """Trata a mensagem quando o chatbot está aguardando o endereço do usuário."""
-    response_message = "Obrigado! Qual é o modelo do seu Xbox? Por favor, digite o número da opção:\n"
-    for num, modelo in content_data.get("modelos_xbox", {}).items():
-        response_message += f"{num} - {modelo}\n"
-    response_message += "\n[9 - Sair]"
-    update_lead_status_and_data(sender_phone_number, 'AGUARDANDO_MODELO', {'endereco': incoming_msg.capitalize()})
-    return response_message
+    turn.update('AGUARDANDO_MODELO', {'endereco': incoming_msg.capitalize()})
+    return turn.catalog.prompts['menu_modelos']
 
-def handle_awaiting_model(incoming_msg, sender_phone_number):
+@conversa.state('AGUARDANDO_MODELO')
+def handle_awaiting_model(incoming_msg, turn):
     """Trata a mensagem quando o chatbot está aguardando o modelo do Xbox."""
-    modelos_mapeamento = content_data.get("modelos_xbox", {})
+    modelos_mapeamento = turn.catalog.modelos
     if incoming_msg in modelos_mapeamento:
         modelo_selecionado = modelos_mapeamento[incoming_msg]
-        update_lead_status_and_data(sender_phone_number, 'AGUARDANDO_ANO', {'modelo': modelo_selecionado})
+        turn.update('AGUARDANDO_ANO', {'modelo': modelo_selecionado})
         return f"Entendido. Qual o ano de fabricação do seu console? (Ex: 2008, 2012). [9 - Sair]"
     else:
         return "Por favor, digite um dos números válidos: 1, 2 ou 3."
 
-def handle_awaiting_year(incoming_msg, sender_phone_number):
+@conversa.state('AGUARDANDO_ANO')
+def handle_awaiting_year(incoming_msg, turn):
     """Trata a mensagem quando o chatbot está aguardando o ano de fabricação."""
     try:
         ano = int(incoming_msg)
@@ -86,55 +126,56 @@ def handle_awaiting_year(incoming_msg, sender_phone_number):
             response_message += "Atenção: Consoles fabricados em 2015 não podem ser desbloqueados definitivamente! ⚠️"
         
         response_message += "\n\nO seu console tem Armazenamento?\n1- HD Interno\n2- HD Externo\n3- Pendrive 16gb+\n4- Não tenho\n\n[9 - Sair]"
-        update_lead_status_and_data(sender_phone_number, 'AGUARDANDO_ARMAZENAMENTO', {'ano': ano})
+        turn.update('AGUARDANDO_ARMAZENAMENTO', {'ano': ano})
         return response_message
     except ValueError:
         return "Por favor, digite apenas o ano de fabricação (Ex: 2010). 🔢"
 
-def handle_awaiting_storage(incoming_msg, sender_phone_number):
+@conversa.state('AGUARDANDO_ARMAZENAMENTO')
+def handle_awaiting_storage(incoming_msg, turn):
     """Trata a mensagem quando o chatbot está aguardando o tipo de armazenamento."""
-    jogos_options = ""
-    for num, jogo in content_data.get("jogos", {}).items():
-        jogos_options += f"{num}. {jogo}\n"
-
-    if incoming_msg == '1':
-        update_lead_status_and_data(sender_phone_number, 'AGUARDANDO_JOGOS', {'tipo_de_armazenamento': 'HD Interno'})
-        return f"Escolha 15 jogos da lista abaixo, separados por vírgula:\n{jogos_options}\n[9 - Sair]"
-    elif incoming_msg == '2':
-        update_lead_status_and_data(sender_phone_number, 'AGUARDANDO_JOGOS', {'tipo_de_armazenamento': 'HD Externo'})
-        return f"Escolha 15 jogos da lista abaixo, separados por vírgula:\n{jogos_options}\n[9 - Sair]"
-    elif incoming_msg == '3':
-        update_lead_status_and_data(sender_phone_number, 'AGUARDANDO_JOGOS', {'tipo_de_armazenamento': 'Pendrive 16gb+'})
-        return f"Escolha 15 jogos da lista abaixo, separados por vírgula:\n{jogos_options}\n[9 - Sair]"
-    elif incoming_msg == '4':
-        update_lead_status_and_data(sender_phone_number, 'AGUARDANDO_CONTINUAR', {'tipo_de_armazenamento': 'Não tenho'})
-        return "Atenção: Sem armazenamento, não será possível jogar nem copiar os jogos. Deseja continuar o atendimento?\n1 - Sim\n2 - Não\n\n[9 - Sair]"
-    else:
+    opcao = OPCOES_ARMAZENAMENTO.get(incoming_msg)
+    if opcao is None:
         return "Opção inválida. Por favor, digite um número de 1 a 4. ❌"
 
-def handle_awaiting_continue(incoming_msg, sender_phone_number):
+    tipo_de_armazenamento, proxima_etapa = opcao
+    turn.update(proxima_etapa, {'tipo_de_armazenamento': tipo_de_armazenamento})
+    if proxima_etapa == 'AGUARDANDO_JOGOS':
+        return turn.catalog.prompts['menu_jogos']
+    return "Atenção: Sem armazenamento, não será possível jogar nem copiar os jogos. Deseja continuar o atendimento?\n1 - Sim\n2 - Não\n\n[9 - Sair]"
+
+@conversa.state('AGUARDANDO_CONTINUAR')
+def handle_awaiting_continue(incoming_msg, turn):
     """Trata a mensagem quando o chatbot pergunta se o usuário deseja continuar sem armazenamento."""
     if incoming_msg == '1':
-        lead_info = get_lead_info(sender_phone_number)
+        lead_info = turn.lead
         if lead_info and lead_info['tipo_de_armazenamento'] == 'Não tenho':
-            update_lead_status_and_data(sender_phone_number, 'AGUARDANDO_LOCALIZACAO', {'jogos_selecionados': 'Nenhum, pois não tem armazenamento'})
+            turn.update('AGUARDANDO_LOCALIZACAO', {'jogos_selecionados': 'Nenhum, pois não tem armazenamento'})
             return "Tudo certo! Você deseja receber o link da nossa localização? (1 - Sim / 2 - Não)\n\n[9 - Sair]"
     elif incoming_msg == '2':
-        update_lead_status_and_data(sender_phone_number, 'FINALIZADO')
+        turn.update('FINALIZADO')
         return "Entendido. Obrigado por usar nosso serviço! Seu atendimento foi registrado. Qualquer dúvida, pode nos contatar. 👍"
     else:
         return "Opção inválida. Por favor, digite '1' para continuar ou '2' para finalizar. ❌"
 
-def handle_awaiting_games(incoming_msg, sender_phone_number):
+@conversa.state('AGUARDANDO_JOGOS')
+def handle_awaiting_games(incoming_msg, turn):
     """Trata a mensagem quando o chatbot está aguardando a seleção de jogos."""
-    jogos_mapeamento = content_data.get("jogos", {})
     jogos_escolhidos_numeros = [j.strip() for j in incoming_msg.split(',')]
     
     jogos_selecionados = []
     jogos_invalidos = False
     for numero in jogos_escolhidos_numeros:
-        if numero in jogos_mapeamento:
-            jogos_selecionados.append(jogos_mapeamento[numero])
+        # Aceita o número do menu, o título ou um texto aproximado ("gta 5", "cod black ops")
+        jogo, sugestoes = turn.catalog.resolve_game(numero)
+        if jogo is not None:
+            jogos_selecionados.append(jogo)
+        elif sugestoes and len(jogos_escolhidos_numeros) <= 15:
+            opcoes = "".join(f"{num}. {titulo}\n" for num, titulo in sugestoes)
+            return (
+                f"Não tenho certeza de qual jogo você quis dizer com \"{numero}\". Opções mais próximas:\n{opcoes}\n"
+                "Por favor, envie sua seleção novamente usando os números da lista, separados por vírgula. [9 - Sair]"
+            )
         else:
             jogos_invalidos = True
             break
@@ -142,20 +183,21 @@ def handle_awaiting_games(incoming_msg, sender_phone_number):
     if len(jogos_escolhidos_numeros) > 15 or len(jogos_escolhidos_numeros) < 1 or jogos_invalidos:
         return "Seleção inválida. Por favor, escolha entre 1 e 15 jogos da lista e separe-os por vírgula."
     else:
-        update_lead_status_and_data(sender_phone_number, 'AGUARDANDO_LOCALIZACAO', {'jogos_selecionados': ', '.join(jogos_selecionados)})
+        turn.update('AGUARDANDO_LOCALIZACAO', {'jogos_selecionados': ', '.join(jogos_selecionados)})
         return "Tudo certo! ✅ Você deseja receber o link da nossa localização? (1 - Sim / 2 - Não)\n\n[9 - Sair]"
 
-def handle_awaiting_location(incoming_msg, sender_phone_number):
+@conversa.state('AGUARDANDO_LOCALIZACAO')
+def handle_awaiting_location(incoming_msg, turn):
     """Trata a mensagem quando o chatbot está aguardando a decisão sobre a localização."""
-    lead_data = get_lead_info(sender_phone_number)
+    lead_data = turn.lead
     
     final_message = ""
     if incoming_msg == '1':
         final_message = "Obrigado! Aqui está o link da nossa localização: https://maps.app.goo.gl/G4HYUhf9JqWPkJoT7\n"
-        update_lead_status_and_data(sender_phone_number, 'FINALIZADO')
+        turn.update('FINALIZADO')
     elif incoming_msg == '2':
         final_message = "Entendido. Obrigado por usar nosso serviço! Seu atendimento foi registrado. 👋\n"
-        update_lead_status_and_data(sender_phone_number, 'FINALIZADO')
+        turn.update('FINALIZADO')
     else:
         return "Opção inválida. Por favor, digite '1' para Sim ou '2' para Não. ❌"
 
@@ -186,60 +228,126 @@ def handle_awaiting_location(incoming_msg, sender_phone_number):
     return final_message
 
 # O "roteador" principal da conversa
+def process_message(incoming_msg, sender_phone_number, trace=None):
+    """Executa um turno da conversa e retorna o texto da resposta.
+
+    As etapas (leitura do status, handler e gravação) são cronometradas em
+    `trace`. Quem chama pode passar o próprio TurnTrace para somar as
+    etapas de fora (espera na fila, TwiML, envio); sem ele, o turno é
+    registrado aqui mesmo.
+    """
+    own_trace = trace is None
+    if own_trace:
+        trace = TurnTrace()
+    else:
+        trace.add_span('queue_wait', time.perf_counter() - trace.started)
+    started = time.perf_counter()
+    ok = False
+    try:
+        # Carrega o lead ativo uma única vez e grava tudo numa transação ao final
+        with trace.span('status_lookup'):
+            turn = load_conversation_turn(sender_phone_number)
+        trace.state = turn.status
+        with trace.span('handler'):
+            # Usa a mesma versão do catálogo que gerou os menus já enviados a esta conversa
+            turn.catalog = catalog.snapshot(turn.lead.get('catalogo_versao') if turn.lead else None)
+            response_message = conversa.dispatch(incoming_msg, turn)
+        with trace.span('db_write'):
+            turn.commit()
+        ok = True
+    finally:
+        # Latência e erros de cada turno, exibidos em /health e na página de Status
+        turn_metrics.record(time.perf_counter() - started, ok)
+        if own_trace:
+            trace.finish(ok)
+
+    return response_message
+
+def handle_queued_message(sender_phone_number, incoming_msg, trace=None):
+    """Processa uma mensagem da fila (modo assíncrono) e envia a resposta pelo remetente configurado."""
+    trace = trace or TurnTrace()
+    ok = True
+    try:
+        response_message = process_message(incoming_msg, sender_phone_number, trace)
+    except Exception:
+        ok = False
+        logger.exception("Erro no processamento assíncrono", extra={'fields': {'telefone': sender_phone_number}})
+        response_message = ERROR_MESSAGE
+    try:
+        with trace.span('send'):
+            get_sender().send(sender_phone_number, response_message)
+    except Exception:
+        ok = False
+        raise
+    finally:
+        trace.finish(ok)
+    logger.debug("Resposta enviada", extra={'fields': {'telefone': sender_phone_number, 'resposta': response_message}})
+
+def send_late_reply(sender_phone_number, trace, future):
+    """Envia pelo remetente configurado a resposta de um turno que terminou depois de SYNC_TIMEOUT."""
+    ok = future.exception() is None
+    # Se o turno falhou, o erro já foi registrado pelo worker
+    response_message = future.result() if ok else ERROR_MESSAGE
+    try:
+        with trace.span('send'):
+            get_sender().send(sender_phone_number, response_message)
+    except Exception:
+        ok = False
+        logger.exception("Erro ao enviar a resposta atrasada", extra={'fields': {'telefone': sender_phone_number}})
+    finally:
+        trace.finish(ok)
+
 def whatsapp_webhook():
+    trace = TurnTrace()
+    ok = False
+    # True quando o trace será fechado por outro código (worker assíncrono ou resposta atrasada)
+    deferred = ASYNC_MODE
     try:
         incoming_msg = request.values.get('Body', '').lower().strip()
         sender_phone_number = request.values.get('From', '')
+        trace.fields['telefone'] = sender_phone_number
 
-        print(f"\n--- Nova Mensagem ---")
-        print(f"Origem: {sender_phone_number}")
-        print(f"Mensagem recebida: {incoming_msg}")
+        logger.debug("Mensagem recebida", extra={'fields': {'telefone': sender_phone_number, 'mensagem': incoming_msg}})
 
         resp = MessagingResponse()
-        current_status = get_lead_status(sender_phone_number)
-        response_message = ""
 
-        if incoming_msg == '9':
-            update_lead_status_and_data(sender_phone_number, 'FINALIZADO', {})
-            response_message = "Atendimento finalizado. Para começar um novo, digite 'oi'."
-        
-        elif incoming_msg == 'oi':
-            response_message = start_new_conversation(sender_phone_number)
-        
-        elif current_status == 'AGUARDANDO_NOME':
-            response_message = handle_awaiting_name(incoming_msg, sender_phone_number)
-        
-        elif current_status == 'AGUARDANDO_EMAIL':
-            response_message = handle_awaiting_email(incoming_msg, sender_phone_number)
-        
-        elif current_status == 'AGUARDANDO_ENDERECO':
-            response_message = handle_awaiting_address(incoming_msg, sender_phone_number)
-            
-        elif current_status == 'AGUARDANDO_MODELO':
-            response_message = handle_awaiting_model(incoming_msg, sender_phone_number)
-        
-        elif current_status == 'AGUARDANDO_ANO':
-            response_message = handle_awaiting_year(incoming_msg, sender_phone_number)
-            
-        elif current_status == 'AGUARDANDO_ARMAZENAMENTO':
-            response_message = handle_awaiting_storage(incoming_msg, sender_phone_number)
-        
-        elif current_status == 'AGUARDANDO_CONTINUAR':
-            response_message = handle_awaiting_continue(incoming_msg, sender_phone_number)
-            
-        elif current_status == 'AGUARDANDO_JOGOS':
-            response_message = handle_awaiting_games(incoming_msg, sender_phone_number)
-        
-        elif current_status == 'AGUARDANDO_LOCALIZACAO':
-            response_message = handle_awaiting_location(incoming_msg, sender_phone_number)
+        # Toda mensagem passa pela fila do seu telefone, então duas mensagens
+        # da mesma conversa nunca são processadas ao mesmo tempo.
+        if ASYNC_MODE:
+            # Confirma o recebimento na hora; a resposta é enviada depois pelo worker (que fecha o trace)
+            get_dispatcher().submit(sender_phone_number, handle_queued_message, sender_phone_number, incoming_msg, trace)
+            return str(resp)
 
-        else:
-            response_message = "Desculpe, não entendi. Por favor, digite 'oi' para começar."
-        
-        resp.message(response_message)
-        print(f"Resposta gerada: {response_message}\n")
-        return str(resp)
+        future = get_dispatcher().submit(sender_phone_number, process_message, incoming_msg, sender_phone_number, trace)
+        try:
+            response_message = future.result(timeout=SYNC_TIMEOUT)
+        except FutureTimeoutError:
+            fields = {'telefone': sender_phone_number, 'timeout_s': SYNC_TIMEOUT}
+            if future.cancel():
+                # Ainda estava na fila: não será processada, e o usuário é avisado para reenviar
+                logger.warning("Mensagem descartada após esperar na fila", extra={'fields': fields})
+                resp.message(BUSY_MESSAGE)
+                return str(resp)
+            if sender_configured():
+                # Já está sendo processada e vai alterar a conversa: a resposta segue pelo remetente quando ficar pronta
+                logger.warning("Turno ainda em andamento; resposta será enviada depois", extra={'fields': fields})
+                deferred = True
+                future.add_done_callback(partial(send_late_reply, sender_phone_number, trace))
+                return str(resp)
+            # Sem remetente (TWILIO_* ausentes) a resposta atrasada se perderia: espera o turno e responde no TwiML
+            logger.warning("Turno ainda em andamento e sem remetente configurado; aguardando", extra={'fields': fields})
+            response_message = future.result()
+        with trace.span('twiml_render'):
+            resp.message(response_message)
+            twiml = str(resp)
+        ok = True
+        logger.debug("Resposta gerada", extra={'fields': {'telefone': sender_phone_number, 'resposta': response_message}})
+        return twiml
+
+    except Exception:
+        logger.exception("Erro no webhook", extra={'fields': {'telefone': trace.fields.get('telefone')}})
+        return ERROR_MESSAGE
 
-    except Exception as e:
-        print(f"Ocorreu um erro no webhook: {e}")
-        return "Erro interno. Por favor, tente novamente mais tarde."
\ No newline at end of file
+    finally:
+        if not deferred:
+            trace.finish(ok)
@@ -1,12 +1,267 @@
+import atexit
 import sqlite3
-import pandas as pd
 import json
+import os
+import queue
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
+from events import lead_events
+from session_cache import MISSING, session_cache
+from write_batcher import PendingId, WriteBatcher, resolve_id
 
-def init_db():
-    """Inicializa o banco de dados e cria a tabela 'leads'."""
-    conn = sqlite3.connect('chatbot.db')
-    cursor = conn.cursor()
-    cursor.execute('''
+# Caminho do banco de dados (pode ser sobrescrito pela variável de ambiente CHATBOT_DB)
+DB_PATH = os.environ.get('CHATBOT_DB', 'chatbot.db')
+
+# Configurações do pool de conexões
+POOL_SIZE = int(os.environ.get('CHATBOT_DB_POOL_SIZE', '8'))
+POOL_TIMEOUT = 10.0
+
+# Durabilidade de cada commit: NORMAL (padrão, seguro com WAL; uma queda de energia pode perder os
+# últimos commits) ou FULL (fsync a cada commit; mais barato com CHATBOT_WRITE_MODE=group, um fsync por lote)
+SYNCHRONOUS = os.environ.get('CHATBOT_DB_SYNCHRONOUS', 'NORMAL').upper()
+if SYNCHRONOUS not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+    raise ValueError(f"CHATBOT_DB_SYNCHRONOUS inválido: {SYNCHRONOUS!r}")
+
+# PRAGMAs aplicados a cada nova conexão
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",       # leitores não bloqueiam o escritor (e vice-versa)
+    f"PRAGMA synchronous = {SYNCHRONOUS}",
+    "PRAGMA busy_timeout = 5000",      # espera até 5s por um lock em vez de falhar com "database is locked"
+    "PRAGMA cache_size = -16000",      # ~16MB de cache de páginas por conexão
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Quantidade de statements preparados mantidos em cache por conexão
+CACHED_STATEMENTS = 256
+
+# --- SQL (strings constantes para reaproveitar os statements preparados) ---
+
+SQL_INSERT_LEAD = '''
+    INSERT INTO leads (timestamp, nome, email, telefone, endereco, modelo, ano, tipo_de_armazenamento, jogos_selecionados, status)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+SQL_UPSERT_ACTIVE_SESSION = '''
+    INSERT INTO active_sessions (telefone, lead_id, updated_at, version, catalogo_versao) VALUES (?, ?, ?, 1, ?)
+    ON CONFLICT (telefone) DO UPDATE SET
+        lead_id = excluded.lead_id, updated_at = excluded.updated_at, version = version + 1,
+        catalogo_versao = excluded.catalogo_versao
+'''
+
+SQL_BUMP_SESSION_VERSION = '''
+    UPDATE active_sessions SET version = version + 1, catalogo_versao = COALESCE(?2, catalogo_versao)
+    WHERE telefone = (SELECT telefone FROM leads WHERE id = ?1) AND lead_id = ?1
+'''
+
+SQL_SELECT_SESSION_VERSION = "SELECT version FROM active_sessions WHERE telefone = ?"
+
+SQL_SELECT_LEAD = '''
+    SELECT l.*, s.catalogo_versao FROM active_sessions s
+    JOIN leads l ON l.id = s.lead_id
+    WHERE s.telefone = ?
+'''
+
+SQL_INSERT_GAME = "INSERT OR IGNORE INTO games (titulo) VALUES (?)"
+
+SQL_INSERT_LEAD_GAME = '''
+    INSERT OR IGNORE INTO lead_games (lead_id, game_id)
+    SELECT ?, id FROM games WHERE titulo = ?
+'''
+
+SQL_DELETE_LEAD_GAMES = "DELETE FROM lead_games WHERE lead_id = ?"
+
+# Valores de 'jogos_selecionados' que não representam jogos
+NO_GAMES_VALUES = ('Não informado', 'Nenhum, pois não tem armazenamento')
+
+# Chaves (dia, dimensao, valor) com que um lead contribui para 'daily_rollups'.
+# A mesma consulta serve para um lead (delta na gravação) e para todos (rebuild).
+SQL_ROLLUP_KEYS = '''
+    SELECT substr(l.timestamp, 1, 10) AS dia, 'total' AS dimensao, '' AS valor
+    FROM leads l WHERE {lead_filter}
+    UNION ALL
+    SELECT substr(l.timestamp, 1, 10), 'modelo', l.modelo
+    FROM leads l WHERE {lead_filter} AND l.modelo IS NOT NULL
+    UNION ALL
+    SELECT substr(l.timestamp, 1, 10), 'ano', l.ano
+    FROM leads l WHERE {lead_filter} AND l.ano IS NOT NULL
+    UNION ALL
+    SELECT substr(l.timestamp, 1, 10), 'armazenamento', l.tipo_de_armazenamento
+    FROM leads l WHERE {lead_filter} AND l.tipo_de_armazenamento IS NOT NULL
+    UNION ALL
+    SELECT substr(l.timestamp, 1, 10), 'status', l.status
+    FROM leads l WHERE {lead_filter} AND l.status IS NOT NULL
+    UNION ALL
+    SELECT substr(l.timestamp, 1, 10), 'jogo', g.titulo
+    FROM lead_games lg
+    JOIN games g ON g.id = lg.game_id
+    JOIN leads l ON l.id = lg.lead_id
+    WHERE {lead_filter}
+'''
+
+SQL_UPSERT_ROLLUP = '''
+    INSERT INTO daily_rollups (dia, dimensao, valor, count) VALUES (?, ?, ?, ?)
+    ON CONFLICT (dia, dimensao, valor) DO UPDATE SET count = count + excluded.count
+'''
+
+# Depois de um delta negativo: a chave que chegou a zero sai da tabela, como no rebuild
+SQL_DELETE_EMPTY_ROLLUP = "DELETE FROM daily_rollups WHERE dia = ? AND dimensao = ? AND valor = ? AND count <= 0"
+
+SQL_SELECT_DATA_VERSION = "SELECT version FROM data_version WHERE id = 1"
+
+SQL_INSERT_CATALOG_VERSION = "INSERT OR IGNORE INTO catalog_versions (version, content, created_at) VALUES (?, ?, ?)"
+
+SQL_SELECT_CATALOG_VERSION = "SELECT content FROM catalog_versions WHERE version = ?"
+
+# Colunas da tabela 'leads' que podem ser gravadas pelo chatbot
+LEAD_COLUMNS = (
+    'timestamp', 'nome', 'email', 'telefone', 'endereco', 'modelo',
+    'ano', 'tipo_de_armazenamento', 'jogos_selecionados', 'status'
+)
+
+
+class ConnectionPool:
+    """Pool de conexões SQLite compartilhado entre as threads da aplicação.
+
+    As conexões são criadas sob demanda até o limite `size`, configuradas
+    com WAL e PRAGMAs ajustados, e reaproveitadas entre as requisições para
+    manter o cache de statements preparados de cada conexão.
+    """
+
+    def __init__(self, path, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        """Retira uma conexão do pool, criando uma nova se ainda houver espaço."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Tempo esgotado aguardando uma conexão livre no pool.")
+
+    def release(self, conn):
+        """Devolve a conexão ao pool, descartando qualquer transação pendente."""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close_all(self):
+        """Fecha todas as conexões ociosas do pool."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Retorna o pool de conexões do processo, criando-o na primeira chamada."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+@contextmanager
+def get_connection():
+    """Empresta uma conexão do pool durante o bloco `with`."""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+_write_batcher = None
+_write_batcher_lock = threading.Lock()
+
+def get_write_batcher():
+    """Retorna o gravador do processo (ver write_batcher), criando-o na primeira chamada.
+
+    No encerramento do processo, as gravações ainda na fila são gravadas
+    antes de sair (flush-on-shutdown).
+    """
+    global _write_batcher
+    if _write_batcher is None:
+        with _write_batcher_lock:
+            if _write_batcher is None:
+                _write_batcher = WriteBatcher(get_connection)
+                atexit.register(_write_batcher.stop)
+    return _write_batcher
+
+def flush_writes(timeout=None):
+    """Espera as gravações enfileiradas (modo write_behind) chegarem ao banco."""
+    if _write_batcher is not None:
+        _write_batcher.flush(timeout)
+
+def write_stats():
+    """Contadores do gravador, ou None se nenhuma gravação foi feita neste processo."""
+    return _write_batcher.stats() if _write_batcher is not None else None
+
+@contextmanager
+def transaction():
+    """Empresta uma conexão e faz commit ao final do bloco (ou rollback em caso de erro)."""
+    with get_connection() as conn:
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+# --- MIGRAÇÕES DE ESQUEMA ---
+# Cada migração roda uma única vez, em ordem. A versão do esquema fica em
+# PRAGMA user_version, então bancos antigos (versão 0) recebem todas as
+# migrações pendentes na próxima chamada de init_db().
+
+def _migration_create_leads(conn):
+    """Cria a tabela 'leads' (no-op em bancos criados antes das migrações)."""
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS leads (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             timestamp TEXT,
@@ -21,96 +276,430 @@ def init_db():
             status TEXT
         )
     ''')
-    conn.commit()
-    conn.close()
 
-def save_lead_to_db(lead_data):
-    """Salva um novo lead no banco de dados."""
-    conn = sqlite3.connect('chatbot.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO leads (timestamp, nome, email, telefone, endereco, modelo, ano, tipo_de_armazenamento, jogos_selecionados, status)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        lead_data.get('timestamp'),
-        lead_data.get('nome'),
-        lead_data.get('email'),
-        lead_data.get('telefone'),
-        lead_data.get('endereco'),
-        lead_data.get('modelo'),
-        lead_data.get('ano'),
-        lead_data.get('tipo_de_armazenamento'),
-        lead_data.get('jogos_selecionados'),
-        lead_data.get('status')
-    ))
-    conn.commit()
-    conn.close()
+def _migration_active_sessions(conn):
+    """Cria a tabela 'active_sessions' e o índice de leads por telefone.
 
-def update_lead_status_and_data(phone_number, new_status, new_data=None):
-    """Atualiza o status e outros dados de um lead existente."""
-    conn = sqlite3.connect('chatbot.db')
-    cursor = conn.cursor()
-    
-    if new_data:
-        update_str = ', '.join([f"{key} = ?" for key in new_data.keys()])
-        values = list(new_data.values()) + [new_status, phone_number, phone_number]
-        cursor.execute(f'''
-            UPDATE leads
-            SET {update_str}, status = ?
-            WHERE telefone = ? AND id = (
-                SELECT id FROM leads
-                WHERE telefone = ?
-                ORDER BY timestamp DESC
-                LIMIT 1
-            )
-        ''', tuple(values))
-    else:
-        cursor.execute('''
-            UPDATE leads
-            SET status = ?
-            WHERE telefone = ? AND id = (
-                SELECT id FROM leads
-                WHERE telefone = ?
-                ORDER BY timestamp DESC
-                LIMIT 1
-            )
-        ''', (new_status, phone_number, phone_number))
-        
-    conn.commit()
-    conn.close()
+    'active_sessions' aponta, para cada telefone, o lead da conversa atual,
+    então o lead ativo é encontrado pela chave primária em vez de varrer e
+    ordenar 'leads'. O índice (telefone, timestamp) cobre a busca do lead
+    mais recente de um telefone (o id vem junto como rowid).
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_telefone_timestamp ON leads (telefone, timestamp)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS active_sessions (
+            telefone TEXT PRIMARY KEY,
+            lead_id INTEGER NOT NULL,
+            updated_at TEXT
+        ) WITHOUT ROWID
+    ''')
+    # Backfill: o lead mais recente de cada telefone passa a ser o lead ativo
+    conn.execute('''
+        INSERT OR REPLACE INTO active_sessions (telefone, lead_id, updated_at)
+        SELECT t.telefone,
+               (SELECT l.id FROM leads l WHERE l.telefone = t.telefone ORDER BY l.timestamp DESC LIMIT 1),
+               MAX(t.timestamp)
+        FROM leads t
+        WHERE t.telefone IS NOT NULL
+        GROUP BY t.telefone
+    ''')
 
-def get_lead_status(phone_number):
-    """Retorna o status atual do lead, ou None se não existir."""
-    conn = sqlite3.connect('chatbot.db')
+def _migration_lead_games(conn):
+    """Cria as tabelas normalizadas 'games' e 'lead_games' e importa as seleções existentes.
+
+    'leads.jogos_selecionados' continua existindo (é o texto mostrado no
+    resumo e exportado em CSV), mas as contagens por jogo passam a ser
+    feitas em SQL sobre 'lead_games'.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS games (
+            id INTEGER PRIMARY KEY,
+            titulo TEXT NOT NULL UNIQUE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS lead_games (
+            lead_id INTEGER NOT NULL,
+            game_id INTEGER NOT NULL,
+            PRIMARY KEY (lead_id, game_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lead_games_game ON lead_games (game_id, lead_id)")
+    # Backfill a partir do texto separado por vírgulas
+    rows = conn.execute("SELECT id, jogos_selecionados FROM leads WHERE jogos_selecionados IS NOT NULL").fetchall()
+    for lead_id, jogos_selecionados in rows:
+        _replace_lead_games(conn, lead_id, jogos_selecionados)
+
+def _migration_dashboard_indexes(conn):
+    """Cria os índices usados pelos filtros do dashboard (intervalo de datas e ano)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_timestamp ON leads (timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_ano ON leads (ano)")
+
+def _migration_daily_rollups(conn):
+    """Cria a tabela 'daily_rollups' e a preenche a partir dos leads existentes.
+
+    Cada linha guarda quantos leads de um dia têm um valor numa dimensão
+    (modelo, ano, armazenamento, status, jogo; 'total' conta todos). A
+    tabela é mantida por deltas a cada gravação de lead, então o dashboard
+    lê O(dias) linhas em vez de O(leads).
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_rollups (
+            dia TEXT NOT NULL,
+            dimensao TEXT NOT NULL,
+            valor NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (dia, dimensao, valor)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_rollups_dimensao ON daily_rollups (dimensao, dia)")
+    rebuild_rollups(conn)
+
+def _migration_data_version(conn):
+    """Cria o contador 'data_version', incrementado por triggers a cada alteração em 'leads'.
+
+    As páginas do Dash comparam esse número (uma leitura pela chave
+    primária) com o da última atualização e só refazem as consultas quando
+    ele muda. Por ser mantido por triggers, vale para qualquer escritor.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)")
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_leads_data_version_{event.lower()}
+            AFTER {event} ON leads
+            BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+
+def _migration_session_versions(conn):
+    """Adiciona 'active_sessions.version', incrementada a cada gravação do lead ativo do telefone.
+
+    O cache de sessões guarda a versão que cada lead em cache reflete e a
+    confere no banco (uma leitura pela chave primária) antes de usá-lo,
+    então gravações de outro processo invalidam o cache.
+    """
+    conn.execute("ALTER TABLE active_sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+def _migration_catalog_versions(conn):
+    """Grava com cada conversa a versão do catálogo (content.json) que gerou os menus enviados a ela.
+
+    'catalog_versions' guarda o conteúdo de cada versão usada por alguma
+    conversa, identificado pelo hash, e 'active_sessions.catalogo_versao'
+    aponta a versão da conversa. Assim a numeração dos menus continua a
+    mesma depois de reiniciar o processo ou em outro processo.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_versions (
+            version TEXT PRIMARY KEY,
+            content TEXT NOT NULL,
+            created_at TEXT
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("ALTER TABLE active_sessions ADD COLUMN catalogo_versao TEXT")
+
+def _migration_drop_empty_rollups(conn):
+    """Remove de 'daily_rollups' as linhas zeradas deixadas pelos deltas antes de serem apagadas na gravação."""
+    conn.execute("DELETE FROM daily_rollups WHERE count <= 0")
+
+MIGRATIONS = (
+    _migration_create_leads,
+    _migration_active_sessions,
+    _migration_lead_games,
+    _migration_dashboard_indexes,
+    _migration_daily_rollups,
+    _migration_data_version,
+    _migration_session_versions,
+    _migration_catalog_versions,
+    _migration_drop_empty_rollups,
+)
+
+def get_schema_version(conn):
+    """Retorna a versão do esquema gravada no banco."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """Aplica as migrações pendentes na conexão informada. Retorna a versão final."""
+    version = get_schema_version(conn)
+    for number, migration in enumerate(MIGRATIONS, start=1):
+        if number > version:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+    return max(version, len(MIGRATIONS))
+
+def init_db():
+    """Inicializa o banco de dados, criando ou atualizando o esquema."""
+    with transaction() as conn:
+        return migrate(conn)
+
+def rebuild_rollups(conn):
+    """Recalcula 'daily_rollups' do zero a partir de 'leads' e 'lead_games' (recuperação)."""
+    lead_filter = "l.timestamp IS NOT NULL"
+    conn.execute("DELETE FROM daily_rollups")
+    conn.execute(f'''
+        INSERT INTO daily_rollups (dia, dimensao, valor, count)
+        SELECT dia, dimensao, valor, COUNT(*)
+        FROM ({SQL_ROLLUP_KEYS.format(lead_filter=lead_filter)})
+        GROUP BY dia, dimensao, valor
+    ''')
+
+def _rollup_keys(conn, lead_id):
+    """Chaves de 'daily_rollups' com que o lead contribui hoje (lidas do próprio banco)."""
+    lead_filter = "l.id = :lead_id AND l.timestamp IS NOT NULL"
+    return conn.execute(SQL_ROLLUP_KEYS.format(lead_filter=lead_filter), {'lead_id': lead_id}).fetchall()
+
+def _apply_rollup_delta(conn, before, after):
+    """Aplica em 'daily_rollups' a diferença entre as chaves antigas e as novas de um lead."""
+    delta = Counter(after)
+    delta.subtract(before)
+    for (dia, dimensao, valor), count in delta.items():
+        if count:
+            conn.execute(SQL_UPSERT_ROLLUP, (dia, dimensao, valor, count))
+        if count < 0:
+            conn.execute(SQL_DELETE_EMPTY_ROLLUP, (dia, dimensao, valor))
+
+def split_game_titles(jogos_selecionados):
+    """Separa o texto de 'jogos_selecionados' na lista de títulos escolhidos."""
+    if not jogos_selecionados or jogos_selecionados in NO_GAMES_VALUES:
+        return []
+    return [titulo.strip() for titulo in jogos_selecionados.split(', ') if titulo.strip()]
+
+def _replace_lead_games(conn, lead_id, jogos_selecionados):
+    """Regrava as linhas de 'lead_games' do lead a partir do texto de 'jogos_selecionados'."""
+    conn.execute(SQL_DELETE_LEAD_GAMES, (lead_id,))
+    for titulo in split_game_titles(jogos_selecionados):
+        conn.execute(SQL_INSERT_GAME, (titulo,))
+        conn.execute(SQL_INSERT_LEAD_GAME, (lead_id, titulo))
+
+def _insert_lead(conn, lead_data):
+    """Insere o lead e o torna o lead ativo do telefone. Retorna o id criado."""
+    cursor = conn.execute(SQL_INSERT_LEAD, tuple(lead_data.get(col) for col in LEAD_COLUMNS))
+    lead_id = cursor.lastrowid
+    if lead_data.get('telefone') is not None:
+        conn.execute(SQL_UPSERT_ACTIVE_SESSION, (
+            lead_data.get('telefone'), lead_id, lead_data.get('timestamp'), lead_data.get('catalogo_versao'),
+        ))
+    if split_game_titles(lead_data.get('jogos_selecionados')):
+        _replace_lead_games(conn, lead_id, lead_data.get('jogos_selecionados'))
+    _apply_rollup_delta(conn, [], _rollup_keys(conn, lead_id))
+    return lead_id
+
+def _update_lead(conn, lead_id, changes, catalog_version=None):
+    """Grava as colunas alteradas de um lead, mantendo 'lead_games' e 'daily_rollups' em dia."""
+    before = _rollup_keys(conn, lead_id)
+    update_str = ', '.join([f"{key} = ?" for key in changes.keys()])
+    conn.execute(f"UPDATE leads SET {update_str} WHERE id = ?", tuple(changes.values()) + (lead_id,))
+    conn.execute(SQL_BUMP_SESSION_VERSION, (lead_id, catalog_version))
+    if 'jogos_selecionados' in changes:
+        _replace_lead_games(conn, lead_id, changes['jogos_selecionados'])
+    _apply_rollup_delta(conn, before, _rollup_keys(conn, lead_id))
+
+def _publish_lead_change(lead_id, status, novo=False):
+    """Avisa os assinantes (páginas do Dash via SSE) que um lead foi gravado. Chamar só após o commit."""
+    lead_events.publish({'type': 'lead', 'lead_id': lead_id, 'status': status, 'novo': novo})
+
+def _save_catalog_version(conn, catalog):
+    """Grava o conteúdo de uma versão do catálogo (CatalogSnapshot), se ainda não estiver no banco."""
+    conn.execute(SQL_INSERT_CATALOG_VERSION, (catalog.version, catalog.content, datetime.now().isoformat()))
+
+def load_catalog_version(version):
+    """Conteúdo (dict) de uma versão do catálogo gravada com alguma conversa, ou None."""
+    with get_connection() as conn:
+        row = conn.execute(SQL_SELECT_CATALOG_VERSION, (version,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def _insert_lead_op(conn, lead_data, pending=None, catalog=None):
+    """Gravação de um lead novo (roda no gravador); anota o id criado em `pending`."""
+    if catalog is not None:
+        _save_catalog_version(conn, catalog)
+    lead_id = _insert_lead(conn, lead_data)
+    if pending is not None:
+        pending.assigned = lead_id
+    return lead_id
+
+def _update_lead_op(conn, lead_id, changes, catalog=None):
+    """Gravação das alterações de um lead (roda no gravador). Retorna o id gravado."""
+    lead_id = resolve_id(lead_id)
+    if catalog is not None:
+        _save_catalog_version(conn, catalog)
+    _update_lead(conn, lead_id, changes, catalog.version if catalog is not None else None)
+    return lead_id
+
+def get_data_version():
+    """Contador de alterações em 'leads' (0 se o banco ainda não foi migrado)."""
+    with get_connection() as conn:
+        try:
+            row = conn.execute(SQL_SELECT_DATA_VERSION).fetchone()
+        except sqlite3.OperationalError:
+            return 0
+    return row[0] if row else 0
+
+def _fetch_active_lead(conn, phone_number):
+    """Lê o lead ativo do telefone como um dicionário (sqlite3.Row, sem pandas)."""
     cursor = conn.cursor()
-    cursor.execute("SELECT status FROM leads WHERE telefone = ? ORDER BY timestamp DESC LIMIT 1", (phone_number,))
-    result = cursor.fetchone()
-    conn.close()
-    return result[0] if result else None
+    cursor.row_factory = sqlite3.Row
+    row = cursor.execute(SQL_SELECT_LEAD, (phone_number,)).fetchone()
+    return dict(row) if row else None
+
+def _fetch_session_version(conn, phone_number):
+    """Versão da sessão do telefone (0 se ele não tem lead ativo)."""
+    row = conn.execute(SQL_SELECT_SESSION_VERSION, (phone_number,)).fetchone()
+    return row[0] if row else 0
 
 def get_lead_info(phone_number):
     """Retorna as informações do lead como um dicionário, ou None se não existir."""
-    conn = sqlite3.connect('chatbot.db')
-    df = pd.read_sql_query("SELECT * FROM leads WHERE telefone = ? ORDER BY timestamp DESC LIMIT 1", conn, params=(phone_number,))
-    conn.close()
-    
-    if not df.empty:
-        return df.iloc[0].to_dict()
-    else:
-        return None
-
-def get_data_from_db():
-    """Função centralizada para ler dados da tabela 'leads' do banco de dados."""
-    conn = sqlite3.connect('chatbot.db')
-    try:
-        df = pd.read_sql_query("SELECT * FROM leads", conn)
-    except pd.io.sql.DatabaseError:
-        df = pd.DataFrame(columns=['id', 'timestamp', 'nome', 'email', 'telefone', 'endereco', 'modelo', 'ano', 'tipo_de_armazenamento', 'jogos_selecionados', 'status'])
-    finally:
-        conn.close()
+    with get_connection() as conn:
+        return _fetch_active_lead(conn, phone_number)
+
+
+class ConversationTurn:
+    """Unidade de trabalho de uma mensagem recebida pelo webhook.
+
+    O lead ativo do telefone é carregado uma única vez (do cache de sessões,
+    ou do banco numa falha de cache) e entregue aos handlers como um
+    dicionário em `lead`. Os handlers registram as alterações com
+    `start_lead()` e `update()`, e tudo é gravado numa única transação em
+    `commit()`, que também atualiza o cache (write-through).
+
+    `version` é a versão da sessão do telefone ('active_sessions.version')
+    que `lead` reflete. Cada gravação a incrementa em um.
+    """
+
+    def __init__(self, phone_number, lead=None, version=0):
+        self.phone_number = phone_number
+        self.lead = lead
+        self.version = version
+        # Versão do catálogo (CatalogSnapshot) usada neste turno; definida pelo chatbot e
+        # gravada com a conversa ('catalogo_versao') no commit, se mudou
+        self.catalog = None
+        self._is_new = False
+        self._changes = {}
+
+    @property
+    def status(self):
+        """Status atual do lead ativo, ou None se não houver lead."""
+        return self.lead.get('status') if self.lead else None
+
+    def start_lead(self, lead_data):
+        """Substitui o lead ativo por um novo lead, que será inserido no commit."""
+        self.lead = dict(lead_data)
+        self._is_new = True
+        self._changes = {}
 
-    if not df.empty and 'timestamp' in df.columns:
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df['data_dia'] = df['timestamp'].dt.date
+    def update(self, new_status, new_data=None):
+        """Altera o status e outros dados do lead ativo (sem efeito se não houver lead)."""
+        if self.lead is None:
+            return
+        changes = dict(new_data or {})
+        changes['status'] = new_status
+        for key in changes:
+            if key not in LEAD_COLUMNS:
+                raise ValueError(f"Coluna inválida para o lead: {key}")
+        self.lead.update(changes)
+        self._changes.update(changes)
 
-    return df
\ No newline at end of file
+    def commit(self):
+        """Grava as alterações pendentes numa única transação (ou num lote do gravador).
+
+        Nos modos direct e group, o cache de sessões só é atualizado depois
+        do commit. No modo write_behind, ele é atualizado na hora, e o id de
+        um lead novo fica como PendingId até a inserção ser gravada. Se a
+        gravação falhar, o telefone sai do cache e o próximo turno relê o
+        estado do banco.
+
+        O cache recebe a versão que a sessão terá depois desta gravação. Se
+        outro processo gravar a mesma conversa, a versão no banco não bate
+        e o próximo turno relê o lead.
+        """
+        batcher = get_write_batcher()
+        novo, pending = self._is_new, None
+        if not novo and not (self._changes and self.lead.get('id') is not None):
+            return
+        catalog = self.catalog
+        if catalog is not None and self.lead.get('catalogo_versao') != catalog.version:
+            self.lead['catalogo_versao'] = catalog.version
+        else:
+            catalog = None
+        if novo:
+            if not batcher.waits_for_commit:
+                pending = self.lead['id'] = PendingId()
+            op = partial(_insert_lead_op, lead_data=dict(self.lead), pending=pending, catalog=catalog)
+        else:
+            op = partial(_update_lead_op, lead_id=self.lead['id'], changes=dict(self._changes), catalog=catalog)
+        phone_number, status = self.phone_number, self.lead.get('status')
+        self.version += 1
+
+        def on_error(error):
+            if pending is not None:
+                pending.assigned = None
+            session_cache.invalidate(phone_number)
+
+        if not batcher.waits_for_commit:
+            # Antes do submit: se a gravação falhar, a invalidação em on_error prevalece
+            session_cache.put(phone_number, self.lead, self.version)
+        future = batcher.submit(op, on_commit=lambda lead_id: _publish_lead_change(lead_id, status, novo=novo), on_error=on_error)
+        if batcher.waits_for_commit:
+            lead_id = future.result()
+            if novo:
+                self.lead['id'] = lead_id
+            session_cache.put(phone_number, self.lead, self.version)
+        elif pending is not None:
+            pending.future = future
+        self._is_new = False
+        self._changes = {}
+
+def load_conversation_turn(phone_number):
+    """Carrega o lead ativo do telefone e retorna um ConversationTurn.
+
+    O estado vem do cache de sessões quando a versão da sessão no banco
+    ainda é a do lead em cache (uma leitura pela chave primária). Numa
+    falha de cache, ou se outro processo gravou a conversa, o lead é relido
+    do banco e passa a popular o cache.
+    """
+    cached = session_cache.get(phone_number)
+    if cached is not MISSING:
+        lead, version = cached
+        with get_connection() as conn:
+            current = _fetch_session_version(conn, phone_number)
+        if current != version:
+            # No modo write_behind, a versão do banco pode estar atrás só porque a fila ainda não foi gravada
+            flush_writes()
+            with get_connection() as conn:
+                current = _fetch_session_version(conn, phone_number)
+        if current == version:
+            return ConversationTurn(phone_number, lead, version)
+    # No modo write_behind, o banco só tem o estado certo depois que a fila de gravação esvazia
+    flush_writes()
+    with get_connection() as conn:
+        # A versão é lida antes do lead: se uma gravação cair no meio, o lead lido é o mais novo
+        # e a versão antiga só faz o próximo turno reler o banco
+        version = _fetch_session_version(conn, phone_number)
+        lead = _fetch_active_lead(conn, phone_number)
+    session_cache.put(phone_number, lead, version)
+    return ConversationTurn(phone_number, lead, version)
+
+def save_lead_to_db(lead_data):
+    """Salva um novo lead no banco de dados e o torna o lead ativo do telefone.
+
+    Passa pelo mesmo caminho dos turnos do chatbot (ConversationTurn), então
+    o cache de sessões e o modo de gravação são respeitados.
+    """
+    turn = load_conversation_turn(lead_data.get('telefone'))
+    turn.start_lead(lead_data)
+    turn.commit()
+
+def update_lead_status_and_data(phone_number, new_status, new_data=None):
+    """Atualiza o status e outros dados do lead ativo do telefone (sem efeito se não houver lead)."""
+    turn = load_conversation_turn(phone_number)
+    turn.update(new_status, new_data)
+    turn.commit()
+
+def get_lead_status(phone_number):
+    """Retorna o status atual do lead, ou None se não existir."""
+    return load_conversation_turn(phone_number).status
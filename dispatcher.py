@@ -0,0 +1,150 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future
+
+# Quantidade de filas/workers (cada telefone sempre cai na mesma fila)
+WORKERS = int(os.environ.get('CHATBOT_WORKERS', '4'))
+
+# Quantas latências recentes cada fila guarda para calcular os percentis
+LATENCY_WINDOW = 512
+
+logger = logging.getLogger('chatbot.dispatcher')
+
+# Sentinela que encerra um worker
+_STOP = object()
+
+
+class ShardStats:
+    """Métricas de uma fila: mensagens processadas, erros e latências recentes."""
+
+    def __init__(self):
+        self.processed = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, latency, failed):
+        with self._lock:
+            self.processed += 1
+            if failed:
+                self.errors += 1
+            self.latencies.append(latency)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            processed, errors = self.processed, self.errors
+        if latencies:
+            avg = sum(latencies) / len(latencies)
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            max_latency = latencies[-1]
+        else:
+            avg = p95 = max_latency = 0.0
+        return {
+            'processed': processed,
+            'errors': errors,
+            'latency_avg_ms': avg * 1000,
+            'latency_p95_ms': p95 * 1000,
+            'latency_max_ms': max_latency * 1000,
+        }
+
+
+class MessageDispatcher:
+    """Distribui o trabalho de cada conversa entre um conjunto fixo de filas.
+
+    O telefone de origem é mapeado por hash para uma das filas, e cada fila
+    tem uma única thread. Assim, as mensagens de uma mesma conversa são
+    processadas estritamente na ordem de chegada (sem leitura-alteração-
+    gravação intercaladas no mesmo lead), enquanto conversas diferentes
+    rodam em paralelo.
+    """
+
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self._queues = [queue.Queue() for _ in range(workers)]
+        self._stats = [ShardStats() for _ in range(workers)]
+        self._threads = []
+
+    def start(self):
+        """Inicia as threads dos workers."""
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, args=(index,),
+                name=f"chatbot-worker-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def shard_for(self, phone_number):
+        """Retorna o índice da fila responsável pelo telefone (estável entre processos)."""
+        return zlib.crc32(phone_number.encode('utf-8')) % self.workers
+
+    def submit(self, phone_number, fn, *args):
+        """Enfileira `fn(*args)` na fila do telefone e retorna um Future com o resultado."""
+        future = Future()
+        self._queues[self.shard_for(phone_number)].put((fn, args, future, time.perf_counter()))
+        return future
+
+    def stop(self, timeout=10.0):
+        """Processa o que já está na fila e encerra os workers."""
+        for shard_queue in self._queues:
+            shard_queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def stats(self):
+        """Retorna, por fila, a profundidade atual e as métricas de latência (espera + processamento)."""
+        result = []
+        for index, (shard_queue, shard_stats) in enumerate(zip(self._queues, self._stats)):
+            snapshot = shard_stats.snapshot()
+            snapshot['shard'] = index
+            snapshot['queue_depth'] = shard_queue.qsize()
+            result.append(snapshot)
+        return result
+
+    def _run(self, index):
+        shard_queue = self._queues[index]
+        shard_stats = self._stats[index]
+        while True:
+            item = shard_queue.get()
+            if item is _STOP:
+                shard_queue.task_done()
+                return
+            fn, args, future, enqueued_at = item
+            failed = False
+            try:
+                if future.set_running_or_notify_cancel():
+                    future.set_result(fn(*args))
+            except Exception as e:
+                failed = True
+                logger.error("Erro no worker %s: %s", threading.current_thread().name, e)
+                future.set_exception(e)
+            finally:
+                shard_stats.record(time.perf_counter() - enqueued_at, failed)
+                shard_queue.task_done()
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_dispatcher():
+    """Retorna o dispatcher do processo, iniciando os workers na primeira chamada."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = MessageDispatcher()
+                _dispatcher.start()
+                atexit.register(_dispatcher.stop)
+    return _dispatcher
+
+def dispatcher_stats():
+    """Métricas das filas, ou lista vazia se o dispatcher ainda não foi iniciado neste processo."""
+    return _dispatcher.stats() if _dispatcher is not None else []
@@ -0,0 +1,96 @@
+import json
+import queue
+import threading
+
+# Eventos guardados por assinante antes de descartar os mais antigos (cliente lento ou parado)
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Intervalo (em segundos) entre os comentários de keep-alive do stream SSE
+HEARTBEAT_INTERVAL = 15.0
+
+
+class Subscription:
+    """Fila de eventos de um assinante (por exemplo, uma aba do navegador conectada ao SSE)."""
+
+    def __init__(self, bus, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self._bus = bus
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def _deliver(self, event):
+        while True:
+            try:
+                self._queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Retorna o próximo evento, ou None se nada chegar dentro de `timeout` segundos."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+
+class EventBus:
+    """Pub/sub em memória do processo.
+
+    O caminho de gravação do chatbot publica um evento a cada lead alterado
+    e cada assinante recebe uma cópia na sua própria fila. A publicação
+    nunca bloqueia: se um assinante não consome, os eventos mais antigos
+    da fila dele são descartados.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self.published = 0
+
+    def subscribe(self):
+        subscription = Subscription(self)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = tuple(self._subscribers)
+            self.published += 1
+        for subscription in subscribers:
+            subscription._deliver(event)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+
+def sse_stream(subscription, heartbeat=HEARTBEAT_INTERVAL):
+    """Gera o corpo de uma resposta text/event-stream a partir de uma assinatura.
+
+    Envia um comentário de keep-alive a cada `heartbeat` segundos sem
+    eventos e cancela a assinatura quando o cliente desconecta.
+    """
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            event = subscription.get(timeout=heartbeat)
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        subscription.close()
+
+
+# Eventos de alteração de leads, publicados por database.py depois de cada commit
+lead_events = EventBus()
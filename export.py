@@ -0,0 +1,178 @@
+import csv
+import io
+import zlib
+from datetime import date, timedelta
+from urllib.parse import urlencode
+from database import LEAD_COLUMNS, get_connection
+
+# Colunas exportadas, na ordem do arquivo
+EXPORT_COLUMNS = ('id',) + LEAD_COLUMNS
+
+# Quantidade de leads lidos do banco por vez
+CHUNK_SIZE = 1000
+
+# Formato -> (mimetype, extensão do arquivo)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'csv.gz': ('application/gzip', 'csv.gz'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+SQL_EXPORT_CHUNK = '''
+    SELECT {columns} FROM leads
+    WHERE id > ? {where}
+    ORDER BY id
+    LIMIT ?
+'''
+
+
+class ExportError(ValueError):
+    """Parâmetros de exportação inválidos (formato, datas) ou dependência ausente."""
+
+
+def _day(value):
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise ExportError(f"Data inválida: {value!r} (use AAAA-MM-DD)")
+
+def export_filters(start_date=None, end_date=None, status=None):
+    """Condições extras do WHERE para o intervalo de datas e o status. Retorna (sql, parâmetros)."""
+    conditions, params = [], []
+    if start_date:
+        conditions.append("timestamp >= ?")
+        params.append(_day(start_date).isoformat())
+    if end_date:
+        conditions.append("timestamp < ?")
+        params.append((_day(end_date) + timedelta(days=1)).isoformat())
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+    return ''.join(f" AND {condition}" for condition in conditions), tuple(params)
+
+def iter_lead_chunks(start_date=None, end_date=None, status=None, chunk_size=CHUNK_SIZE):
+    """Percorre os leads filtrados em blocos de até `chunk_size` linhas (tuplas em EXPORT_COLUMNS).
+
+    A paginação é por chave (id > último id lido), então cada bloco é uma
+    leitura curta pelo índice da chave primária e a conexão volta ao pool
+    entre um bloco e outro, mesmo em downloads lentos.
+    """
+    where, params = export_filters(start_date, end_date, status)
+    sql = SQL_EXPORT_CHUNK.format(columns=', '.join(EXPORT_COLUMNS), where=where)
+    last_id = 0
+    while True:
+        with get_connection() as conn:
+            rows = conn.execute(sql, (last_id,) + params + (chunk_size,)).fetchall()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1][0]
+
+def stream_csv(chunks):
+    """Gera o CSV (com cabeçalho) como texto, um pedaço por bloco de leads."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+def stream_gzip(text_chunks):
+    """Compacta (gzip) um gerador de texto sem juntar o arquivo inteiro na memória."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for text in text_chunks:
+        data = compressor.compress(text.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportError("A exportação em Parquet requer o pacote 'pyarrow'.")
+    return pyarrow, pyarrow.parquet
+
+class _ChunkSink:
+    """Arquivo só de escrita que guarda os bytes até serem retirados com drain().
+
+    O tell() conta todos os bytes já escritos, porque o rodapé do Parquet
+    guarda os deslocamentos de cada row group no arquivo final.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+def stream_parquet(chunks):
+    """Gera um arquivo Parquet com um row group por bloco de leads (requer pyarrow)."""
+    pa, pq = _import_pyarrow()
+    schema = pa.schema([(column, pa.int64() if column in ('id', 'ano') else pa.string()) for column in EXPORT_COLUMNS])
+    sink = _ChunkSink()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema) as writer:
+        for rows in chunks:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+def export_leads(export_format='csv', start_date=None, end_date=None, status=None):
+    """Prepara a exportação dos leads filtrados.
+
+    Retorna (gerador do conteúdo, mimetype, nome do arquivo). Os filtros
+    são validados aqui, antes de o download começar, e um ExportError é
+    lançado para parâmetros inválidos.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f"Formato inválido: {export_format!r} (use {', '.join(EXPORT_FORMATS)})")
+    export_filters(start_date, end_date, status)
+    chunks = iter_lead_chunks(start_date, end_date, status)
+    if export_format == 'csv':
+        body = (text.encode('utf-8') for text in stream_csv(chunks))
+    elif export_format == 'csv.gz':
+        body = stream_gzip(stream_csv(chunks))
+    else:
+        # Falha já aqui (antes dos cabeçalhos HTTP) se o pyarrow não estiver instalado
+        _import_pyarrow()
+        body = stream_parquet(chunks)
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    return body, mimetype, f"leads_xbox_360.{extension}"
+
+def list_statuses():
+    """Status que já apareceram nos leads (para o filtro da exportação), lidos dos rollups diários."""
+    with get_connection() as conn:
+        rows = conn.execute("SELECT DISTINCT valor FROM daily_rollups WHERE dimensao = 'status' AND count > 0 ORDER BY valor").fetchall()
+    return [row[0] for row in rows]
+
+def export_url(export_format='csv', start_date=None, end_date=None, status=None):
+    """URL do endpoint /export/leads com os filtros escolhidos na página de Leads."""
+    params = {'formato': export_format, 'inicio': start_date and str(start_date)[:10], 'fim': end_date and str(end_date)[:10], 'status': status}
+    return '/export/leads?' + urlencode({key: value for key, value in params.items() if value})
@@ -0,0 +1,75 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Quantidade máxima de combinações de filtros guardadas (pode ser sobrescrita por variável de ambiente)
+CACHE_MAX_SIZE = int(os.environ.get('CHATBOT_FIGURE_CACHE_SIZE', '64'))
+
+
+class FigureCache:
+    """Cache LRU dos indicadores e gráficos já montados do dashboard.
+
+    A chave é a combinação de filtros (início, fim, ano) e cada entrada
+    pertence a uma versão dos dados (o token de data_version). Quando uma
+    consulta chega com uma versão nova, ou seja, quando leads foram
+    gravados, todas as entradas da versão anterior são descartadas de uma
+    vez. Assim um gráfico nunca é servido com dados antigos, e voltar a um
+    intervalo já visto sem leads novos não refaz consultas nem figuras.
+    """
+
+    def __init__(self, max_size=CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_compute(self, key, version, compute):
+        """Retorna o valor de `key` na versão `version`, chamando `compute()` numa falha de cache."""
+        with self._lock:
+            if version != self._version:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Calculado fora do lock: duas abas pedindo o mesmo filtro no mesmo instante só calculam em dobro
+        value = compute()
+
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+    def stats(self):
+        """Retorna os contadores do cache."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+
+# Cache compartilhado pelas abas abertas do dashboard
+dashboard_cache = FigureCache()
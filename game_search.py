@@ -0,0 +1,221 @@
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter
+
+# Numerais romanos comuns em títulos de jogos ("GTA V" == "gta 5")
+ROMAN_NUMERALS = {
+    'i': '1', 'ii': '2', 'iii': '3', 'iv': '4', 'v': '5',
+    'vi': '6', 'vii': '7', 'viii': '8', 'ix': '9', 'x': '10',
+}
+
+# Pontuação mínima para aceitar um resultado e a diferença mínima para o segundo colocado
+MIN_SCORE = 0.45
+MIN_MARGIN = 0.12
+
+# Pontuação mínima para um resultado aparecer como sugestão
+MIN_SUGGESTION_SCORE = 0.3
+
+# Semelhança mínima (trigramas) para uma palavra digitada casar com uma palavra do vocabulário
+MIN_WORD_SIMILARITY = 0.5
+MAX_WORD_MATCHES = 4
+
+# Máximo de títulos que uma única palavra pode trazer como candidatos
+CANDIDATE_LIMIT = 256
+
+
+def normalize(text):
+    """Minúsculas, sem acentos e sem pontuação."""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text.lower()).split())
+
+
+def tokenize(text):
+    """Separa o texto normalizado em palavras, trocando numerais romanos por algarismos."""
+    return [ROMAN_NUMERALS.get(token, token) for token in normalize(text).split()]
+
+
+def has_word(text):
+    """True se o texto tem ao menos uma palavra de 2+ caracteres com letras que não é numeral romano.
+
+    Sem uma palavra assim ("4 5", "1-5", "x"), o texto é só numeração e não
+    passa pela busca aproximada.
+    """
+    return any(
+        len(token) >= 2 and not token.isdigit() and token not in ROMAN_NUMERALS
+        for token in normalize(text).split()
+    )
+
+
+def trigrams(tokens):
+    """Trigramas de caracteres de cada palavra (com bordas), usados para tolerar erros de digitação."""
+    grams = set()
+    for token in tokens:
+        padded = f" {token} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def acronyms(tokens):
+    """Siglas das sequências de 2 a 4 palavras ("call of duty" -> "cod")."""
+    result = set()
+    for size in range(2, 5):
+        for start in range(len(tokens) - size + 1):
+            words = tokens[start:start + size]
+            if all(not word.isdigit() for word in words):
+                result.add(''.join(word[0] for word in words))
+    return result
+
+
+class GameSearchIndex:
+    """Índice pré-calculado para encontrar jogos por texto livre.
+
+    O índice tem dois níveis. O vocabulário (todas as palavras e siglas dos
+    títulos, como "cod") é indexado por trigramas de caracteres, o que
+    permite achar rapidamente as palavras parecidas com cada palavra
+    digitada, mesmo com erros de digitação. Cada palavra aponta para os
+    títulos em que aparece. A pontuação de um título combina quanto do
+    texto digitado ele cobre e quanto do próprio título foi citado, com as
+    palavras raras pesando mais (IDF).
+
+    Para o custo não crescer com o catálogo, só as palavras digitadas mais
+    raras geram candidatos (no máximo CANDIDATE_LIMIT títulos por palavra,
+    começando pelos títulos mais curtos); palavras muito comuns apenas
+    reavaliam os candidatos já encontrados.
+    """
+
+    def __init__(self, titles):
+        """`titles` é um mapeamento id -> título (ex.: número do menu -> nome do jogo)."""
+        self._ids = []
+        self._titles = []
+        self._doc_weights = []
+        self._words = {}            # palavra -> id da palavra
+        self._word_docs = []        # id da palavra -> títulos que a contêm (mais curtos primeiro)
+        self._word_doc_sets = []    # id da palavra -> conjunto dos títulos que a contêm
+        self._word_grams = []       # id da palavra -> quantidade de trigramas
+        self._gram_words = {}       # trigrama -> ids das palavras que o contêm
+
+        doc_tokens = []
+        for doc, (game_id, title) in enumerate(titles.items()):
+            tokens = set(tokenize(title))
+            self._ids.append(game_id)
+            self._titles.append(title)
+            doc_tokens.append(tokens)
+            for word in tokens | acronyms(tokenize(title)):
+                word_id = self._words.get(word)
+                if word_id is None:
+                    word_id = self._add_word(word)
+                self._word_docs[word_id].append(doc)
+
+        total = max(len(self._ids), 1)
+        self._idf = [math.log(1 + total / len(docs)) for docs in self._word_docs]
+        for tokens in doc_tokens:
+            self._doc_weights.append(sum(self._idf[self._words[word]] for word in tokens) or 1.0)
+        for docs in self._word_docs:
+            docs.sort(key=self._doc_weights.__getitem__)
+        self._word_doc_sets = [frozenset(docs) for docs in self._word_docs]
+
+    def _add_word(self, word):
+        word_id = len(self._word_docs)
+        self._words[word] = word_id
+        self._word_docs.append([])
+        grams = trigrams([word])
+        self._word_grams.append(len(grams))
+        for gram in grams:
+            self._gram_words.setdefault(gram, []).append(word_id)
+        return word_id
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _similar_words(self, token):
+        """Palavras do vocabulário parecidas com `token`, como [(id da palavra, semelhança)]."""
+        word_id = self._words.get(token)
+        if word_id is not None:
+            return [(word_id, 1.0)]
+        if token.isdigit():
+            return []
+        grams = trigrams([token])
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._gram_words.get(gram, ()))
+        matches = []
+        for word_id, common in shared.items():
+            similarity = 2.0 * common / (len(grams) + self._word_grams[word_id])
+            if similarity >= MIN_WORD_SIMILARITY:
+                matches.append((word_id, similarity))
+        return heapq.nlargest(MAX_WORD_MATCHES, matches, key=lambda match: match[1])
+
+    def search(self, query, limit=5):
+        """Retorna até `limit` resultados como (pontuação, id, título), do melhor para o pior."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        # Palavras desconhecidas pesam como as mais raras do catálogo
+        unknown_weight = math.log(1 + len(self._ids)) if self._ids else 1.0
+        terms = []
+        for token in tokens:
+            similar = self._similar_words(token)
+            weight = max((self._idf[word_id] for word_id, _ in similar), default=unknown_weight)
+            postings = sum(len(self._word_docs[word_id]) for word_id, _ in similar)
+            terms.append((postings, weight, similar, token.isdigit()))
+        terms.sort(key=lambda term: term[0])
+        query_weight = sum(term[1] for term in terms)
+
+        matched = {}
+        # Títulos que casaram com alguma palavra que não é número: só eles entram no resultado
+        worded = set()
+        for postings, weight, similar, numeral in terms:
+            if not matched or postings <= CANDIDATE_LIMIT:
+                # Palavra rara (ou a primeira): gera candidatos a partir das listas de títulos
+                best = {}
+                for word_id, similarity in similar:
+                    for doc in self._word_docs[word_id][:CANDIDATE_LIMIT]:
+                        if similarity > best.get(doc, 0.0):
+                            best[doc] = similarity
+                for doc, similarity in best.items():
+                    matched[doc] = matched.get(doc, 0.0) + weight * similarity
+                if not numeral:
+                    worded.update(best)
+            else:
+                # Palavra comum: só soma pontos aos candidatos que já existem
+                for word_id, similarity in similar:
+                    doc_set = self._word_doc_sets[word_id]
+                    bonus = weight * similarity
+                    for doc in doc_set.intersection(matched):
+                        matched[doc] += bonus
+                        if not numeral:
+                            worded.add(doc)
+
+        doc_weights = self._doc_weights
+        scored = (
+            (0.7 * min(1.0, value / query_weight) + 0.3 * min(1.0, value / doc_weights[doc]), doc)
+            for doc, value in matched.items() if doc in worded
+        )
+        return [(round(score, 4), self._ids[doc], self._titles[doc]) for score, doc in heapq.nlargest(limit, scored)]
+
+    def resolve(self, query, limit=5):
+        """Resolve o texto para um único jogo.
+
+        Retorna (id, título, []) quando há um resultado claro, ou
+        (None, None, sugestões) quando o texto é ambíguo ou fraco demais;
+        as sugestões são (id, título) ordenados por relevância e a lista
+        fica vazia quando nada parecido foi encontrado. Texto sem nenhuma
+        palavra (só números ou numerais romanos) nunca é resolvido.
+        """
+        if not has_word(query):
+            return None, None, []
+        results = self.search(query, limit)
+        if not results:
+            return None, None, []
+        best_score, best_id, best_title = results[0]
+        if best_score < MIN_SCORE:
+            return None, None, [(game_id, title) for score, game_id, title in results if score >= MIN_SUGGESTION_SCORE]
+        close = [(game_id, title) for score, game_id, title in results if best_score - score < MIN_MARGIN]
+        if len(close) == 1:
+            return best_id, best_title, []
+        return None, None, close
@@ -0,0 +1,173 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from flask import Blueprint, Response, jsonify, request
+from database import DB_PATH, get_connection, get_schema_version, write_stats
+from dispatcher import dispatcher_stats
+from session_cache import session_cache
+from tracing import dropped_log_records, metrics
+
+# Quantidade de turnos guardados para calcular os percentis de latência
+METRICS_WINDOW = 4096
+
+# Janela (em segundos) usada para a vazão e a taxa de erros recentes, contadas em buckets de 1 segundo
+THROUGHPUT_WINDOW = 60
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class TurnMetrics:
+    """Latência, vazão e erros dos turnos de conversa processados neste processo.
+
+    A vazão e a taxa de erros recentes vêm de contadores por segundo
+    (THROUGHPUT_WINDOW buckets reaproveitados em círculo), então valem para
+    qualquer volume de mensagens. As latências dos percentis vêm de uma
+    janela circular das últimas METRICS_WINDOW durações. Os totais desde o
+    início do processo ficam em contadores separados.
+    """
+
+    def __init__(self, window=METRICS_WINDOW, buckets=THROUGHPUT_WINDOW, clock=time.monotonic):
+        self.clock = clock
+        self._samples = deque(maxlen=window)
+        self._bucket_seconds = [None] * buckets
+        self._bucket_turns = [0] * buckets
+        self._bucket_errors = [0] * buckets
+        self._lock = threading.Lock()
+        self.total = 0
+        self.errors = 0
+
+    def record(self, seconds, ok=True):
+        second = int(self.clock())
+        index = second % len(self._bucket_seconds)
+        with self._lock:
+            self._samples.append(seconds)
+            if self._bucket_seconds[index] != second:
+                # O bucket guardava um segundo que já saiu da janela
+                self._bucket_seconds[index] = second
+                self._bucket_turns[index] = 0
+                self._bucket_errors[index] = 0
+            self._bucket_turns[index] += 1
+            self.total += 1
+            if not ok:
+                self._bucket_errors[index] += 1
+                self.errors += 1
+
+    def snapshot(self):
+        """Retorna as métricas como dict (latências em ms, vazão em turnos por minuto)."""
+        oldest = int(self.clock()) - len(self._bucket_seconds) + 1
+        with self._lock:
+            latencies = sorted(self._samples)
+            buckets = zip(self._bucket_seconds, self._bucket_turns, self._bucket_errors)
+            recent = [(turns, errors) for second, turns, errors in buckets if second is not None and second >= oldest]
+            total, errors = self.total, self.errors
+        recent_turns = sum(turns for turns, _ in recent)
+        recent_errors = sum(errors for _, errors in recent)
+        return {
+            'turns_total': total,
+            'errors_total': errors,
+            'turns_per_minute': recent_turns * 60.0 / len(self._bucket_seconds),
+            'error_rate': recent_errors / recent_turns if recent_turns else 0.0,
+            'latency_p50_ms': _percentile(latencies, 0.50) * 1000,
+            'latency_p95_ms': _percentile(latencies, 0.95) * 1000,
+            'latency_p99_ms': _percentile(latencies, 0.99) * 1000,
+            'latency_max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+        }
+
+
+def db_health(quick_check=False):
+    """Sondagens do banco em tempo constante.
+
+    O último lead vem de MAX(timestamp) pelo índice idx_leads_timestamp e o
+    tamanho vem das PRAGMAs page_count/page_size, sem ler a tabela. O
+    PRAGMA quick_check percorre o banco inteiro, então só roda quando
+    `quick_check=True` (pedido explícito).
+    """
+    started = time.perf_counter()
+    report = {'ok': False, 'path': DB_PATH}
+    if not os.path.exists(DB_PATH):
+        report['error'] = "Banco de dados não encontrado"
+        return report
+    try:
+        with get_connection() as conn:
+            report['last_lead_at'] = conn.execute("SELECT MAX(timestamp) FROM leads").fetchone()[0]
+            report['schema_version'] = get_schema_version(conn)
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            report['freelist_pages'] = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if quick_check:
+                report['quick_check'] = conn.execute("PRAGMA quick_check").fetchone()[0]
+    except sqlite3.Error as e:
+        report['error'] = str(e)
+        return report
+    report['size_bytes'] = page_size * page_count
+    wal_path = DB_PATH + '-wal'
+    report['wal_bytes'] = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+    report['ok'] = report.get('quick_check', 'ok') == 'ok'
+    report['probe_ms'] = (time.perf_counter() - started) * 1000
+    return report
+
+
+def queue_health():
+    """Profundidade total e por fila do despachante de mensagens deste processo."""
+    shards = dispatcher_stats()
+    return {
+        'depth': sum(shard['queue_depth'] for shard in shards),
+        'errors': sum(shard['errors'] for shard in shards),
+        'shards': shards,
+    }
+
+
+def metrics_text():
+    """Métricas do processo no formato de texto do Prometheus.
+
+    Além dos histogramas por etapa e estado gravados pelos turnos, inclui
+    medidores lidos na hora: profundidade de cada fila, cache de conversas,
+    gravações pendentes e registros de log descartados.
+    """
+    cache = session_cache.stats()
+    gauges = [
+        ('chatbot_dispatcher_queue_depth', "Mensagens aguardando em cada fila do despachante.",
+         [({'shard': shard['shard']}, shard['queue_depth']) for shard in dispatcher_stats()]),
+        ('chatbot_session_cache_entries', "Conversas no cache de sessões.", [({}, cache['size'])]),
+        ('chatbot_session_cache_hit_ratio', "Fração de leituras do status atendidas pelo cache de sessões.", [({}, cache['hit_ratio'])]),
+        ('chatbot_log_dropped_records', "Registros de log descartados porque a fila do log estava cheia.", [({}, dropped_log_records())]),
+    ]
+    writes = write_stats()
+    if writes is not None:
+        gauges.append(('chatbot_write_pending', "Gravações na fila do gravador, ainda não gravadas no banco.",
+                       [({'mode': writes['mode']}, writes['pending'])]))
+    return metrics.render(gauges)
+
+def health_report(quick_check=False):
+    """Relatório completo: banco, turnos de conversa, cache de conversas, filas e gravações."""
+    db = db_health(quick_check)
+    return {
+        'ok': db['ok'],
+        'db': db,
+        'turns': turn_metrics.snapshot(),
+        'session_cache': session_cache.stats(),
+        'queues': queue_health(),
+        'writes': write_stats(),
+    }
+
+
+# Métricas dos turnos, alimentadas pelo chatbot
+turn_metrics = TurnMetrics()
+
+# GET /health (e /health?quick_check=1 para a verificação de integridade completa) e GET /metrics (Prometheus)
+health_blueprint = Blueprint('health', __name__)
+
+@health_blueprint.route("/health")
+def health():
+    report = health_report(quick_check=request.args.get('quick_check') == '1')
+    return jsonify(report), 200 if report['ok'] else 503
+
+@health_blueprint.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics_text(), mimetype="text/plain; version=0.0.4")
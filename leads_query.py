@@ -0,0 +1,123 @@
+import re
+import sqlite3
+from database import LEAD_COLUMNS, get_connection
+
+# Colunas exibidas na tabela de leads (e as únicas aceitas em filtros e ordenação)
+TABLE_COLUMNS = ('id',) + LEAD_COLUMNS
+
+# Operadores do filter_query do DataTable -> operador SQL
+FILTER_OPERATORS = {
+    '=': '=', 'eq': '=', 's=': '=', 'i=': '=',
+    '!=': '!=', 'ne': '!=', 's!=': '!=', 'i!=': '!=',
+    '>': '>', 'gt': '>', 's>': '>', 'i>': '>',
+    '>=': '>=', 'ge': '>=', 's>=': '>=', 'i>=': '>=',
+    '<': '<', 'lt': '<', 's<': '<', 'i<': '<',
+    '<=': '<=', 'le': '<=', 's<=': '<=', 'i<=': '<=',
+    'contains': 'contains', 'scontains': 'scontains', 'icontains': 'contains',
+    'datestartswith': 'datestartswith',
+}
+
+# Comparações sem diferenciar maiúsculas de minúsculas. LIKE (contains, icontains) já não
+# diferencia; scontains usa instr(), que diferencia, e os demais s* são as comparações normais.
+CASE_INSENSITIVE_OPERATORS = frozenset(('i=', 'i!=', 'i>', 'i>=', 'i<', 'i<='))
+
+# "{coluna} operador valor" (o valor pode vir entre aspas)
+FILTER_PART_RE = re.compile(r'^\s*\{(?P<column>[^}]+)\}\s*(?P<operator>\S+)\s*(?P<value>.*?)\s*$')
+FILTER_BLANK_RE = re.compile(r'^\s*\{(?P<column>[^}]+)\}\s*is\s+(?P<negate>not\s+)?(blank|nil)\s*$')
+
+SQL_COUNT_LEADS = "SELECT COUNT(*) FROM leads {where}"
+
+SQL_SELECT_LEADS_PAGE = '''
+    SELECT {columns} FROM leads
+    {where}
+    ORDER BY {order_by}
+    LIMIT ? OFFSET ?
+'''
+
+def _parse_value(value):
+    """Remove as aspas de um valor do filtro; sem aspas, números viram int/float."""
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'`':
+        quote = value[0]
+        return value[1:-1].replace('\\' + quote, quote)
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+def _escape_like(value):
+    return str(value).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def filter_query_to_sql(filter_query):
+    """Traduz o filter_query do DataTable ('{status} eq "FINALIZADO" && {ano} > 2010')
+    para um WHERE parametrizado. Retorna (sql, parâmetros).
+
+    Só colunas de TABLE_COLUMNS são aceitas e os valores sempre viram
+    parâmetros; trechos que não forem entendidos são ignorados, como o
+    DataTable faz com filtros inválidos.
+    """
+    conditions, params = [], []
+    for part in (filter_query or '').split(' && '):
+        blank = FILTER_BLANK_RE.match(part)
+        if blank:
+            column = blank.group('column')
+            if column in TABLE_COLUMNS:
+                if blank.group('negate'):
+                    conditions.append(f"({column} IS NOT NULL AND {column} != '')")
+                else:
+                    conditions.append(f"({column} IS NULL OR {column} = '')")
+            continue
+        match = FILTER_PART_RE.match(part)
+        if not match or match.group('column') not in TABLE_COLUMNS:
+            continue
+        operator = FILTER_OPERATORS.get(match.group('operator'))
+        if operator is None or match.group('value') == '':
+            continue
+        column = match.group('column')
+        value = _parse_value(match.group('value'))
+        if operator == 'contains':
+            conditions.append(f"{column} LIKE ? ESCAPE '\\'")
+            params.append(f"%{_escape_like(value)}%")
+        elif operator == 'scontains':
+            conditions.append(f"instr({column}, ?) > 0")
+            params.append(str(value))
+        elif operator == 'datestartswith':
+            conditions.append(f"{column} LIKE ? ESCAPE '\\'")
+            params.append(f"{_escape_like(value)}%")
+        else:
+            collate = " COLLATE NOCASE" if match.group('operator') in CASE_INSENSITIVE_OPERATORS else ""
+            conditions.append(f"{column}{collate} {operator} ?")
+            params.append(value)
+    if not conditions:
+        return "", ()
+    return "WHERE " + " AND ".join(conditions), tuple(params)
+
+def sort_by_to_sql(sort_by):
+    """Traduz o sort_by do DataTable para ORDER BY (o id desempata e mantém a paginação estável)."""
+    order = []
+    for item in sort_by or []:
+        column = item.get('column_id')
+        if column in TABLE_COLUMNS and column != 'id':
+            order.append(f"{column} {'DESC' if item.get('direction') == 'desc' else 'ASC'}")
+    direction = next((item.get('direction') for item in sort_by or [] if item.get('column_id') == 'id'), 'asc')
+    order.append(f"id {'DESC' if direction == 'desc' else 'ASC'}")
+    return ', '.join(order)
+
+def fetch_leads_page(page_current=0, page_size=10, sort_by=None, filter_query=''):
+    """Uma página da tabela de leads, com filtro e ordenação feitos no SQLite.
+
+    Retorna (linhas como dicts, total de leads que passam no filtro).
+    """
+    where, params = filter_query_to_sql(filter_query)
+    page_current = page_current or 0
+    sql = SQL_SELECT_LEADS_PAGE.format(columns=', '.join(TABLE_COLUMNS), where=where, order_by=sort_by_to_sql(sort_by))
+    with get_connection() as conn:
+        try:
+            total = conn.execute(SQL_COUNT_LEADS.format(where=where), params).fetchone()[0]
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            rows = cursor.execute(sql, params + (page_size, page_current * page_size)).fetchall()
+        except sqlite3.OperationalError:
+            return [], 0
+    return [dict(row) for row in rows], total
@@ -0,0 +1,75 @@
+import os
+import threading
+
+
+class TwilioSender:
+    """Envia mensagens de WhatsApp pela API REST da Twilio."""
+
+    def __init__(self, account_sid=None, auth_token=None, from_number=None):
+        from twilio.rest import Client
+
+        self.client = Client(
+            account_sid or os.environ.get('TWILIO_ACCOUNT_SID'),
+            auth_token or os.environ.get('TWILIO_AUTH_TOKEN')
+        )
+        self.from_number = from_number or os.environ.get('TWILIO_WHATSAPP_NUMBER')
+
+    def send(self, to, body):
+        self.client.messages.create(from_=self.from_number, to=to, body=body)
+
+
+class FakeSender:
+    """Remetente local que apenas guarda as mensagens enviadas (para testes e desenvolvimento)."""
+
+    def __init__(self):
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def send(self, to, body):
+        with self._lock:
+            self.sent.append((to, body))
+
+    def messages_to(self, to):
+        """Retorna, em ordem, as mensagens enviadas para um telefone."""
+        with self._lock:
+            return [body for recipient, body in self.sent if recipient == to]
+
+
+# Variáveis de ambiente de que o TwilioSender precisa
+TWILIO_SETTINGS = ('TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_WHATSAPP_NUMBER')
+
+SENDERS = {
+    'twilio': TwilioSender,
+    'fake': FakeSender,
+}
+
+_sender = None
+_sender_lock = threading.Lock()
+
+def get_sender():
+    """Retorna o remetente configurado em CHATBOT_OUTBOUND_SENDER ('twilio' por padrão)."""
+    global _sender
+    if _sender is None:
+        with _sender_lock:
+            if _sender is None:
+                name = os.environ.get('CHATBOT_OUTBOUND_SENDER', 'twilio')
+                _sender = SENDERS[name]()
+    return _sender
+
+def sender_configured():
+    """Indica se get_sender() consegue enviar mensagens fora da resposta do webhook.
+
+    Verdadeiro se já há um remetente no processo, se CHATBOT_OUTBOUND_SENDER
+    escolhe outro que não o da Twilio, ou se as variáveis TWILIO_* estão
+    definidas.
+    """
+    if _sender is not None:
+        return True
+    if os.environ.get('CHATBOT_OUTBOUND_SENDER', 'twilio') != 'twilio':
+        return True
+    return all(os.environ.get(name) for name in TWILIO_SETTINGS)
+
+def set_sender(sender):
+    """Substitui o remetente do processo (ex.: um FakeSender em testes)."""
+    global _sender
+    _sender = sender
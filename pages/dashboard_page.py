@@ -1,16 +1,20 @@
 import dash
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.express as px
 from dash import dcc, html, callback_context
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
 from datetime import datetime, date
-import plotly.graph_objects as go
-from utils import get_data_from_db # Linha alterada: importa a função do novo arquivo
+from utils import data_version_token
+from figure_cache import dashboard_cache
+from analytics import count_kpis, count_leads_by_day, count_leads_by_model, count_leads_by_year, count_leads_by_game
 
 # --- FUNÇÕES ---
+# pandas e plotly são importados dentro das funções: o app (e o webhook) sobem sem
+# carregá-los, e o custo só aparece na primeira visita ao dashboard.
 
 def create_funnel_graph(total_leads, modelos_count):
+    import pandas as pd
+    import plotly.graph_objects as go
+
     df_funnel = pd.DataFrame(dict(
         number=[total_leads, modelos_count],
         stage=['Leads Totais', 'Modelo Selecionado']
@@ -30,42 +34,22 @@ def create_funnel_graph(total_leads, modelos_count):
     )
     return fig
 
-def create_dashboard_elements(df, start_date=None, end_date=None, selected_year=None):
-    df_filtered = df.copy()
-
-    if selected_year is not None:
-        df_filtered = df_filtered[df_filtered['ano'] == selected_year]
-    elif start_date and end_date:
-        start_date_obj = pd.to_datetime(start_date).normalize()
-        end_date_obj = pd.to_datetime(end_date).normalize() + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
-        df_filtered = df_filtered[(df_filtered['timestamp'] >= start_date_obj) & (df_filtered['timestamp'] <= end_date_obj)]
-
-    if df_filtered.empty:
-        total_leads = 0
-        modelos_count = 0
-        leads_hoje = 0
-        leads_recentes = 0
-        df_modelos = pd.DataFrame(columns=['modelo', 'count'])
-        df_leads_por_dia = pd.DataFrame(columns=['data_dia', 'count'])
-        df_anos = pd.DataFrame(columns=['ano', 'count'])
-        df_jogos = pd.DataFrame(columns=['jogos_selecionados', 'count']) # Linha corrigida
-    else:
-        total_leads = len(df_filtered)
-        modelos_count = len(df_filtered.dropna(subset=['modelo']))
-
-        hoje = pd.Timestamp.today().normalize()
-        ultimos_7_dias = hoje - pd.Timedelta(days=7)
-        leads_hoje = len(df_filtered[df_filtered['data_dia'] == hoje.date()])
-        leads_recentes = len(df_filtered[df_filtered['timestamp'] >= ultimos_7_dias])
-
-        try:
-            df_jogos = df_filtered['jogos_selecionados'].value_counts().reset_index(name='count')
-        except KeyError:
-            df_jogos = pd.DataFrame(columns=['jogos_selecionados', 'count'])
-
-        df_modelos = df_filtered['modelo'].value_counts().reset_index(name='count')
-        df_leads_por_dia = df_filtered.groupby('data_dia').size().reset_index(name='count')
-        df_anos = df_filtered['ano'].value_counts().reset_index(name='count')
+def create_dashboard_elements(start_date=None, end_date=None, selected_year=None):
+    import pandas as pd
+    import plotly.express as px
+
+    # Todos os filtros e contagens rodam em SQL; só os resultados agrupados chegam aqui
+    kpis = count_kpis(start_date, end_date, selected_year)
+    total_leads = kpis['total_leads']
+    modelos_count = kpis['modelos_count']
+    leads_hoje = kpis['leads_hoje']
+    leads_recentes = kpis['leads_recentes']
+
+    df_modelos = pd.DataFrame(count_leads_by_model(start_date, end_date, selected_year), columns=['modelo', 'count'])
+    df_leads_por_dia = pd.DataFrame(count_leads_by_day(start_date, end_date, selected_year), columns=['data_dia', 'count'])
+    df_anos = pd.DataFrame(count_leads_by_year(start_date, end_date, selected_year), columns=['ano', 'count'])
+    # Contagem por jogo individual (tabela lead_games), não por combinação escolhida
+    df_jogos = pd.DataFrame(count_leads_by_game(start_date, end_date, selected_year), columns=['jogo', 'count'])
 
     fig_modelos = px.pie(
         df_modelos,
@@ -94,9 +78,9 @@ def create_dashboard_elements(df, start_date=None, end_date=None, selected_year=
     )
     fig_jogos = px.bar(
         df_jogos,
-        x='jogos_selecionados', # Linha corrigida
+        x='jogo',
         y='count',
-        labels={'jogos_selecionados': 'Jogo', 'count': 'Solicitações'},
+        labels={'jogo': 'Jogo', 'count': 'Solicitações'},
         title='Jogos Mais Solicitados',
         color_discrete_sequence=px.colors.sequential.Plasma
     )
@@ -105,130 +89,142 @@ def create_dashboard_elements(df, start_date=None, end_date=None, selected_year=
 
     fig_funnel = create_funnel_graph(total_leads, modelos_count)
 
-    return total_leads, modelos_count, leads_hoje, leads_recentes, fig_modelos, fig_leads_por_dia, fig_anos, fig_jogos, fig_funnel, df_filtered
+    return total_leads, modelos_count, leads_hoje, leads_recentes, fig_modelos, fig_leads_por_dia, fig_anos, fig_jogos, fig_funnel
 
-# --- LAYOUT DO DASHBOARD ---
-df_initial = get_data_from_db()
-today = date.today()
-
-total_leads_init, modelos_count_init, leads_hoje_init, leads_recentes_init, fig_modelos_init, fig_leads_por_dia_init, fig_anos_init, fig_jogos_init, fig_funnel_init, _ = create_dashboard_elements(df_initial, today, today)
-
-layout = dbc.Container([
-    # Componente de intervalo para auto-atualização a cada 30 segundos
-    dcc.Interval(
-        id='interval-component',
-        interval=30*1000,  # em milissegundos
-        n_intervals=0
-    ),
-
-    dbc.Row([
-        dbc.Col(html.H2("Dashboard", className="text-white")),
-        dbc.Col(
-            html.P(id="last-updated-text", className="text-muted", style={'fontSize': '0.9em'}),
-            width="auto", 
-            align="end"
-        )
-    ], className="g-0 my-4 d-flex align-items-center justify-content-between"),
-
-    dbc.Row([
-        dbc.Col(
-            html.Div([
-                html.H5("Filtrar por Data", className="text-white"),
-                dcc.DatePickerRange(
-                    id='date-picker-range',
-                    start_date=today,
-                    end_date=today,
-                    display_format='DD/MM/YYYY',
-                    style={
-                        'color': '#fff',
-                        'background-color': '#212529',
-                        'border': '1px solid #495057'
-                    }
-                )
-            ]),
-            xs=12, md=6
-        )
-    ]),
-
-    # KPIs
-    dbc.Row([
-        dbc.Col(dbc.Card(
-            [
-                dbc.CardHeader(html.H5("Total de Leads", className="text-white")),
-                dbc.CardBody([
-                    html.H3(id="total-leads", children=total_leads_init, className="text-white"),
-                    html.I(className="fa-solid fa-users fa-2x fa-beat", style={'color': '#0b5ed7'})
-                ], className="d-flex justify-content-between align-items-center")
-            ],
-            color="primary", inverse=True
-        ), xs=12, sm=6, lg=3, className="my-2"),
-
-        dbc.Col(dbc.Card(
-            [
-                dbc.CardHeader(html.H5("Hoje", className="text-white")),
-                dbc.CardBody([
-                    html.H3(id="leads-hoje", children=leads_hoje_init, className="text-white"),
-                    html.I(className="fa-solid fa-calendar-day fa-2x fa-beat", style={'color': '#157347'})
-                ], className="d-flex justify-content-between align-items-center")
-            ],
-            color="success", inverse=True
-        ), xs=12, sm=6, lg=3, className="my-2"),
-
-        dbc.Col(dbc.Card(
-            [
-                dbc.CardHeader(html.H5("Modelos", className="text-white")),
-                dbc.CardBody([
-                    html.H3(id="modelos-count", children=modelos_count_init, className="text-white"),
-                    html.I(className="fa-solid fa-gamepad fa-2x fa-beat", style={'color': '#0aa6e0'})
-                ], className="d-flex justify-content-between align-items-center")
-            ],
-            color="info", inverse=True
-        ), xs=12, sm=6, lg=3, className="my-2"),
-
-        dbc.Col(dbc.Card(
-            [
-                dbc.CardHeader(html.H5("Recentes", className="text-white")),
-                dbc.CardBody([
-                    html.H3(id="leads-recentes", children=leads_recentes_init, className="text-white"),
-                    html.I(className="fa-solid fa-clock-rotate-left fa-2x fa-beat", style={'color': '#e6a300'})
-                ], className="d-flex justify-content-between align-items-center")
-            ],
-            color="warning", inverse=True
-        ), xs=12, sm=6, lg=3, className="my-2"),
-    ], className="my-4"),
-
-    dbc.Row([
-        dbc.Col(
-            dbc.Card(dbc.CardBody(
-                dcc.Graph(id='graph-daily-leads', figure=fig_leads_por_dia_init)
-            )), xs=12, md=6, className="mb-3"
-        ),
-        dbc.Col(
-            dbc.Card(dbc.CardBody(
-                dcc.Graph(id='graph-funnel', figure=fig_funnel_init)
-            )), xs=12, md=6
-        ),
-    ], className="my-4"),
+def get_dashboard_elements(start_date, end_date, selected_year, version):
+    """create_dashboard_elements com memoização por (filtros, versão dos dados).
 
-    dbc.Row([
-        dbc.Col(
-            dbc.Card(dbc.CardBody(
-                dcc.Graph(id='graph-models', figure=fig_modelos_init)
-            )), xs=12, md=4, className="mb-3"
-        ),
-        dbc.Col(
-            dbc.Card(dbc.CardBody(
-                dcc.Graph(id='graph-by-year', figure=fig_anos_init)
-            )), xs=12, md=4, className="mb-3"
-        ),
-        dbc.Col(
-            dbc.Card(dbc.CardBody(
-                dcc.Graph(id='graph-by-game', figure=fig_jogos_init)
-            )), xs=12, md=4
-        ),
-    ], className="my-4"),
+    As figuras são guardadas já serializadas (dicts), prontas para o Dash.
+    """
+    key = (str(start_date)[:10] if start_date else None, str(end_date)[:10] if end_date else None, selected_year)
+
+    def compute():
+        elements = create_dashboard_elements(start_date, end_date, selected_year)
+        return elements[:4] + tuple(fig.to_dict() for fig in elements[4:])
 
-], fluid=True, className="bg-dark text-white p-3")
+    return dashboard_cache.get_or_compute(key, version, compute)
+
+# --- LAYOUT DO DASHBOARD ---
+def layout():
+    """Layout montado a cada visita à página; os valores e gráficos são preenchidos pelo callback update_dashboard."""
+    today = date.today()
+    return dbc.Container([
+        # Componente de intervalo para auto-atualização a cada 30 segundos
+        dcc.Interval(
+            id='interval-component',
+            interval=30*1000,  # em milissegundos
+            n_intervals=0
+        ),
+        dcc.Store(id='dashboard-data-version'),
+
+        dbc.Row([
+            dbc.Col(html.H2("Dashboard", className="text-white")),
+            dbc.Col(
+                html.P(id="last-updated-text", className="text-muted", style={'fontSize': '0.9em'}),
+                width="auto", 
+                align="end"
+            )
+        ], className="g-0 my-4 d-flex align-items-center justify-content-between"),
+
+        dbc.Row([
+            dbc.Col(
+                html.Div([
+                    html.H5("Filtrar por Data", className="text-white"),
+                    dcc.DatePickerRange(
+                        id='date-picker-range',
+                        start_date=today,
+                        end_date=today,
+                        display_format='DD/MM/YYYY',
+                        style={
+                            'color': '#fff',
+                            'background-color': '#212529',
+                            'border': '1px solid #495057'
+                        }
+                    )
+                ]),
+                xs=12, md=6
+            )
+        ]),
+
+        # KPIs
+        dbc.Row([
+            dbc.Col(dbc.Card(
+                [
+                    dbc.CardHeader(html.H5("Total de Leads", className="text-white")),
+                    dbc.CardBody([
+                        html.H3(id="total-leads", className="text-white"),
+                        html.I(className="fa-solid fa-users fa-2x fa-beat", style={'color': '#0b5ed7'})
+                    ], className="d-flex justify-content-between align-items-center")
+                ],
+                color="primary", inverse=True
+            ), xs=12, sm=6, lg=3, className="my-2"),
+
+            dbc.Col(dbc.Card(
+                [
+                    dbc.CardHeader(html.H5("Hoje", className="text-white")),
+                    dbc.CardBody([
+                        html.H3(id="leads-hoje", className="text-white"),
+                        html.I(className="fa-solid fa-calendar-day fa-2x fa-beat", style={'color': '#157347'})
+                    ], className="d-flex justify-content-between align-items-center")
+                ],
+                color="success", inverse=True
+            ), xs=12, sm=6, lg=3, className="my-2"),
+
+            dbc.Col(dbc.Card(
+                [
+                    dbc.CardHeader(html.H5("Modelos", className="text-white")),
+                    dbc.CardBody([
+                        html.H3(id="modelos-count", className="text-white"),
+                        html.I(className="fa-solid fa-gamepad fa-2x fa-beat", style={'color': '#0aa6e0'})
+                    ], className="d-flex justify-content-between align-items-center")
+                ],
+                color="info", inverse=True
+            ), xs=12, sm=6, lg=3, className="my-2"),
+
+            dbc.Col(dbc.Card(
+                [
+                    dbc.CardHeader(html.H5("Recentes", className="text-white")),
+                    dbc.CardBody([
+                        html.H3(id="leads-recentes", className="text-white"),
+                        html.I(className="fa-solid fa-clock-rotate-left fa-2x fa-beat", style={'color': '#e6a300'})
+                    ], className="d-flex justify-content-between align-items-center")
+                ],
+                color="warning", inverse=True
+            ), xs=12, sm=6, lg=3, className="my-2"),
+        ], className="my-4"),
+
+        dbc.Row([
+            dbc.Col(
+                dbc.Card(dbc.CardBody(
+                    dcc.Graph(id='graph-daily-leads')
+                )), xs=12, md=6, className="mb-3"
+            ),
+            dbc.Col(
+                dbc.Card(dbc.CardBody(
+                    dcc.Graph(id='graph-funnel')
+                )), xs=12, md=6
+            ),
+        ], className="my-4"),
+
+        dbc.Row([
+            dbc.Col(
+                dbc.Card(dbc.CardBody(
+                    dcc.Graph(id='graph-models')
+                )), xs=12, md=4, className="mb-3"
+            ),
+            dbc.Col(
+                dbc.Card(dbc.CardBody(
+                    dcc.Graph(id='graph-by-year')
+                )), xs=12, md=4, className="mb-3"
+            ),
+            dbc.Col(
+                dbc.Card(dbc.CardBody(
+                    dcc.Graph(id='graph-by-game')
+                )), xs=12, md=4
+            ),
+        ], className="my-4"),
+
+    ], fluid=True, className="bg-dark text-white p-3")
 
 # --- CALLBACKS ---
 
@@ -243,15 +239,21 @@ layout = dbc.Container([
     Output("graph-by-year", "figure"),
     Output("graph-by-game", "figure"),
     Output("graph-funnel", "figure"),
+    Output("dashboard-data-version", "data"),
     Input("interval-component", "n_intervals"),
     Input("date-picker-range", "start_date"),
     Input("date-picker-range", "end_date"),
-    Input("graph-by-year", "clickData")
+    Input("graph-by-year", "clickData"),
+    Input("live-lead-event", "data"),
+    State("dashboard-data-version", "data")
 )
-def update_dashboard(n, start_date, end_date, clickData):
+def update_dashboard(n, start_date, end_date, clickData, live_event, last_version):
     triggered_id = callback_context.triggered[0]['prop_id'].split('.')[0]
 
-    df_updated = get_data_from_db()
+    # Sem leads novos desde a última atualização, o intervalo (ou um evento repetido) não refaz nenhuma consulta
+    version = data_version_token()
+    if triggered_id in ('interval-component', 'live-lead-event') and version == last_version:
+        return (dash.no_update,) * 11
 
     if triggered_id == 'interval-component':
         start_date = None
@@ -261,7 +263,7 @@ def update_dashboard(n, start_date, end_date, clickData):
     if clickData and 'points' in clickData:
         selected_year = clickData['points'][0]['x']
 
-    total_leads, modelos_count, leads_hoje, leads_recentes, fig_modelos, fig_leads_por_dia, fig_anos, fig_jogos, fig_funnel, df_filtered = create_dashboard_elements(df_updated, start_date, end_date, selected_year)
+    total_leads, modelos_count, leads_hoje, leads_recentes, fig_modelos, fig_leads_por_dia, fig_anos, fig_jogos, fig_funnel = get_dashboard_elements(start_date, end_date, selected_year, version)
 
     last_updated_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
 
@@ -276,4 +278,12 @@ def update_dashboard(n, start_date, end_date, clickData):
         fig_anos,
         fig_jogos,
         fig_funnel,
-    )
\ No newline at end of file
+        version,
+    )
+
+# Com o SSE conectado (assets/live_updates.js) o polling é desligado; se a conexão cair, ele volta
+dash.clientside_callback(
+    "function(connected) { return Boolean(connected); }",
+    Output("interval-component", "disabled"),
+    Input("live-connected", "data")
+)
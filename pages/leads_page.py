@@ -1,83 +1,141 @@
 import dash
 import dash_bootstrap_components as dbc
 from dash import dcc, html, dash_table, callback_context
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
 import io
+import math
 from datetime import datetime
-from utils import get_data_from_db
+from utils import data_version_token
+from export import EXPORT_FORMATS, export_url, list_statuses
+from leads_query import TABLE_COLUMNS, fetch_leads_page
 
 # Layout da página de Leads
-df_initial = get_data_from_db()
-layout = dbc.Container(
-    [
-        html.H2("Dados Brutos dos Leads", className="text-white mt-4"),
-        html.P("Aqui você pode visualizar, buscar e baixar todos os leads.", className="text-muted"),
+def layout():
+    """Layout montado a cada visita à página; a tabela é preenchida pelo callback update_table."""
+    return dbc.Container(
+        [
+            html.H2("Dados Brutos dos Leads", className="text-white mt-4"),
+            html.P("Aqui você pode visualizar, buscar e baixar todos os leads.", className="text-muted"),
 
-        # Linha nova: Adiciona o dcc.Interval para auto-atualização
-        dcc.Interval(
-            id='interval-leads',
-            interval=5*1000, # Atualiza a cada 5 segundos
-            n_intervals=0
-        ),
+            # Linha nova: Adiciona o dcc.Interval para auto-atualização
+            dcc.Interval(
+                id='interval-leads',
+                interval=5*1000, # Atualiza a cada 5 segundos
+                n_intervals=0
+            ),
         
-        # Linha nova: Adiciona um elemento para mostrar a data da última atualização
-        html.P(id="last-updated-leads", className="text-muted", style={'fontSize': '0.9em'}),
+            # Linha nova: Adiciona um elemento para mostrar a data da última atualização
+            html.P(id="last-updated-leads", className="text-muted", style={'fontSize': '0.9em'}),
 
-        dbc.Button("Baixar Dados", id="download-button", color="secondary", className="mb-3"),
-        dcc.Download(id="download-leads-csv"),
+            # Filtros da exportação; o botão aponta para o endpoint /export/leads, que envia o arquivo em streaming
+            dbc.Row([
+                dbc.Col(
+                    dcc.DatePickerRange(id='export-date-range', display_format='DD/MM/YYYY', clearable=True),
+                    xs=12, md="auto", className="mb-2"
+                ),
+                dbc.Col(
+                    dcc.Dropdown(id='export-status', placeholder="Todos os status", style={'color': '#212529', 'minWidth': '220px'}),
+                    xs=12, md="auto", className="mb-2"
+                ),
+                dbc.Col(
+                    dbc.RadioItems(
+                        id='export-format',
+                        options=[{'label': fmt.upper(), 'value': fmt} for fmt in EXPORT_FORMATS],
+                        value='csv',
+                        inline=True
+                    ),
+                    xs=12, md="auto", className="mb-2"
+                ),
+                dbc.Col(
+                    dbc.Button("Baixar Dados", id="download-button", color="secondary", href=export_url(), external_link=True),
+                    xs=12, md="auto", className="mb-2"
+                ),
+            ], className="mb-3 align-items-center"),
+            dcc.Store(id='leads-data-version'),
 
-        dash_table.DataTable(
-            id='leads-table',
-            columns=[{"name": i, "id": i} for i in df_initial.columns],
-            data=df_initial.to_dict('records'),
-            sort_action="native",
-            filter_action="native",
-            page_action="native",
-            page_current=0,
-            page_size=10,
-            style_table={'overflowX': 'auto'},
-            style_data_conditional=[
-                {
-                    'if': {'filter_query': '{status} eq "FINALIZADO"'},
-                    'backgroundColor': '#28a745',
+            dash_table.DataTable(
+                id='leads-table',
+                columns=[{"name": i, "id": i} for i in TABLE_COLUMNS],
+                data=[],
+                # Paginação, ordenação e filtro feitos no SQLite (só a página atual vai para o navegador)
+                sort_action="custom",
+                sort_mode="single",
+                sort_by=[],
+                filter_action="custom",
+                filter_query='',
+                page_action="custom",
+                page_current=0,
+                page_size=10,
+                style_table={'overflowX': 'auto'},
+                style_data_conditional=[
+                    {
+                        'if': {'filter_query': '{status} eq "FINALIZADO"'},
+                        'backgroundColor': '#28a745',
+                        'color': 'white',
+                        'fontWeight': 'bold'
+                    }
+                ],
+                style_header={
+                    'backgroundColor': '#343a40',
                     'color': 'white',
                     'fontWeight': 'bold'
+                },
+                style_data={
+                    'backgroundColor': '#495057',
+                    'color': 'white'
                 }
-            ],
-            style_header={
-                'backgroundColor': '#343a40',
-                'color': 'white',
-                'fontWeight': 'bold'
-            },
-            style_data={
-                'backgroundColor': '#495057',
-                'color': 'white'
-            }
-        )
-    ],
-    fluid=True,
-    className="bg-dark text-white p-3",
+            )
+        ],
+        fluid=True,
+        className="bg-dark text-white p-3",
+    )
+
+# Link de download com os filtros escolhidos
+@dash.callback(
+    Output("download-button", "href"),
+    Input("export-format", "value"),
+    Input("export-date-range", "start_date"),
+    Input("export-date-range", "end_date"),
+    Input("export-status", "value"),
 )
+def update_download_link(export_format, start_date, end_date, status):
+    return export_url(export_format, start_date, end_date, status)
 
-# Callback para download dos dados (inalterado)
+# Opções do filtro de status, renovadas junto com a tabela
 @dash.callback(
-    Output("download-leads-csv", "data"),
-    Input("download-button", "n_clicks"),
-    prevent_initial_call=True,
+    Output("export-status", "options"),
+    Input("leads-data-version", "data"),
 )
-def generate_csv(n_clicks):
-    df = get_data_from_db()
-    return dcc.send_data_frame(df.to_csv, "leads_xbox_360.csv")
+def update_status_options(version):
+    return [{'label': status, 'value': status} for status in list_statuses()]
 
-# Linhas alteradas:
 @dash.callback(
     Output('leads-table', 'data'),
+    Output('leads-table', 'page_count'),
     Output('last-updated-leads', 'children'),
-    Input('interval-leads', 'n_intervals'), # Linha nova: agora o intervalo dispara o callback
+    Output('leads-data-version', 'data'),
+    Input('interval-leads', 'n_intervals'),
     Input('leads-table', 'page_current'),
-    Input('leads-table', 'page_size')
+    Input('leads-table', 'page_size'),
+    Input('leads-table', 'sort_by'),
+    Input('leads-table', 'filter_query'),
+    Input('live-lead-event', 'data'),
+    State('leads-data-version', 'data')
 )
-def update_table(n_intervals, page_current, page_size):
-    df = get_data_from_db()
+def update_table(n_intervals, page_current, page_size, sort_by, filter_query, live_event, last_version):
+    version = data_version_token()
+    # O intervalo (ou o evento ao vivo) só refaz a consulta se algum lead mudou desde a última atualização
+    triggered = callback_context.triggered[0]['prop_id']
+    if version == last_version and triggered in ('interval-leads.n_intervals', 'live-lead-event.data'):
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    rows, total = fetch_leads_page(page_current, page_size, sort_by, filter_query)
+    page_count = max(1, math.ceil(total / page_size))
     last_updated_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    return df.to_dict('records'), f"Última atualização: {last_updated_time}"
\ No newline at end of file
+    return rows, page_count, f"Última atualização: {last_updated_time}", version
+
+# Com o SSE conectado (assets/live_updates.js) o polling é desligado; se a conexão cair, ele volta
+dash.clientside_callback(
+    "function(connected) { return Boolean(connected); }",
+    Output('interval-leads', 'disabled'),
+    Input('live-connected', 'data')
+)
@@ -1,70 +1,246 @@
+import os
 import dash
 import dash_bootstrap_components as dbc
-import sqlite3
-import pandas as pd
-import os
+import requests
 from dash import html, dcc
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
 from datetime import datetime
+from health import db_health, turn_metrics
+from session_cache import session_cache
+from figure_cache import dashboard_cache
+from dispatcher import dispatcher_stats
+from utils import data_version_token
+
+# Turnos, cache de conversas e filas são contadores em memória do processo que atende o
+# webhook. Com CHATBOT_SERVE_WEBHOOK=0 o webhook roda em outro processo (webhook_app.py) e os
+# contadores deste ficam vazios: defina CHATBOT_WEBHOOK_HEALTH_URL (ex.: http://localhost:5000/health)
+# para ler os do webhook. Sem a URL, os cartões mostram os deste processo, identificados como tal.
+SERVE_WEBHOOK = os.environ.get('CHATBOT_SERVE_WEBHOOK', '1') == '1'
+WEBHOOK_HEALTH_URL = os.environ.get('CHATBOT_WEBHOOK_HEALTH_URL')
+WEBHOOK_HEALTH_TIMEOUT = 2
 
-# Função para verificar o status do banco de dados
+def _format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+# Função para verificar o status do banco de dados (sondagens em tempo constante, ver health.py)
 def check_db_status():
+    report = db_health()
+    if not report['ok']:
+        return f"❌ Erro de Conexão: {report.get('error', 'verificação falhou')}", "danger", ""
+
+    last_lead_time = "Nenhum lead encontrado"
+    if report['last_lead_at']:
+        last_lead_time = datetime.fromisoformat(report['last_lead_at']).strftime("%d/%m/%Y %H:%M:%S")
+    details = (
+        f"Esquema v{report['schema_version']} | Tamanho: {_format_bytes(report['size_bytes'])} | "
+        f"WAL: {_format_bytes(report['wal_bytes'])} | Sondagem: {report['probe_ms']:.1f} ms"
+    )
+    return f"✅ Conexão OK (Último lead: {last_lead_time})", "success", details
+
+# Função para obter os contadores do webhook: (turnos, cache de conversas, filas), ou None se o /health remoto falhar
+def webhook_metrics():
+    if not WEBHOOK_HEALTH_URL:
+        return turn_metrics.snapshot(), session_cache.stats(), dispatcher_stats()
     try:
-        if not os.path.exists('chatbot.db'):
-            return "❌ Banco de Dados não encontrado", "danger"
-            
-        conn_test = sqlite3.connect('chatbot.db')
-        df_leads = pd.read_sql_query("SELECT * FROM leads", conn_test)
-        conn_test.close()
-        
-        last_lead_time = "Nenhum lead encontrado"
-        if not df_leads.empty:
-            last_lead_timestamp = df_leads['timestamp'].max()
-            last_lead_time = datetime.fromisoformat(last_lead_timestamp).strftime("%d/%m/%Y %H:%M:%S")
+        # Com o banco fora do ar o /health responde 503, mas o relatório vem completo
+        report = requests.get(WEBHOOK_HEALTH_URL, timeout=WEBHOOK_HEALTH_TIMEOUT).json()
+        return report['turns'], report['session_cache'], report['queues']['shards']
+    except (requests.RequestException, ValueError, KeyError):
+        return None
+
+# Sufixo dos títulos dos cartões alimentados por webhook_metrics
+def metrics_origin():
+    if WEBHOOK_HEALTH_URL:
+        return " (webhook)"
+    return "" if SERVE_WEBHOOK else " (este processo)"
+
+# Função para resumir a vazão, a latência e os erros dos turnos de conversa
+def check_turns(stats):
+    return (
+        f"{stats['turns_per_minute']:.1f} mensagens/min",
+        f"p50 {stats['latency_p50_ms']:.1f} ms | p95 {stats['latency_p95_ms']:.1f} ms | "
+        f"p99 {stats['latency_p99_ms']:.1f} ms | Erros: {stats['error_rate']:.1%} "
+        f"({stats['errors_total']} de {stats['turns_total']})"
+    )
+
+# Função para resumir os contadores do cache de conversas
+def check_session_cache(stats):
+    return (
+        f"{stats['hit_ratio']:.0%} de acertos",
+        f"Acertos: {stats['hits']} | Falhas: {stats['misses']} | "
+        f"Conversas em cache: {stats['size']} | Descartadas: {stats['evictions']}"
+    )
 
-        return f"✅ Conexão OK (Último lead: {last_lead_time})", "success"
-    except Exception as e:
-        return f"❌ Erro de Conexão: {e}", "danger"
+# Função para resumir os contadores do cache de gráficos do dashboard
+def check_figure_cache():
+    stats = dashboard_cache.stats()
+    return (
+        f"{stats['hit_ratio']:.0%} de acertos",
+        f"Acertos: {stats['hits']} | Falhas: {stats['misses']} | "
+        f"Filtros em cache: {stats['size']} | Invalidadas: {stats['invalidations']} | Descartadas: {stats['evictions']}"
+    )
+
+# Função para resumir as filas de processamento das conversas
+def check_dispatcher(shards):
+    if not shards:
+        return "Nenhuma mensagem processada ainda", []
+    total_depth = sum(shard['queue_depth'] for shard in shards)
+    details = [
+        html.Li(
+            f"Fila {shard['shard']}: {shard['queue_depth']} na fila | "
+            f"{shard['processed']} processadas | "
+            f"média {shard['latency_avg_ms']:.1f} ms | p95 {shard['latency_p95_ms']:.1f} ms"
+        )
+        for shard in shards
+    ]
+    return f"{total_depth} mensagens na fila", details
 
 # Layout da página de Status
-layout = dbc.Container([
-    html.H2("Status da Aplicação", className="text-white mt-4"),
-    html.P("Esta página monitora a saúde dos componentes principais.", className="text-muted"),
+def layout():
+    """Layout montado a cada visita à página; os cartões são preenchidos pelo callback update_status."""
+    origin = metrics_origin()
+    notes = []
+    if not SERVE_WEBHOOK and not WEBHOOK_HEALTH_URL:
+        notes.append(html.P(
+            "O webhook roda em outro processo: turnos, cache de conversas e filas abaixo são só deste processo. "
+            "Defina CHATBOT_WEBHOOK_HEALTH_URL (ex.: http://localhost:5000/health) para ver os do webhook.",
+            className="text-warning"
+        ))
+    return dbc.Container([
+        html.H2("Status da Aplicação", className="text-white mt-4"),
+        html.P("Esta página monitora a saúde dos componentes principais.", className="text-muted"),
+        *notes,
     
-    dbc.Row([
-        dbc.Col(
-            dbc.Card(
-                [
-                    dbc.CardHeader(html.H5("Status do Banco de Dados", className="text-white")),
-                    dbc.CardBody([
-                        html.H3(id="db-status-text", className="text-white"),
-                        html.P("Verifica se o arquivo chatbot.db existe e pode ser lido."),
-                    ], className="d-flex justify-content-between align-items-center flex-column")
-                ],
-                color="dark", inverse=True
+        dbc.Row([
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader(html.H5("Status do Banco de Dados", className="text-white")),
+                        dbc.CardBody([
+                            html.H3(id="db-status-text", className="text-white"),
+                            html.P("Verifica se o arquivo chatbot.db existe e pode ser lido."),
+                            html.P(id="db-status-details", className="text-muted"),
+                        ], className="d-flex justify-content-between align-items-center flex-column")
+                    ],
+                    color="dark", inverse=True
+                ),
+                className="my-3"
             ),
-            className="my-3"
-        ),
-    ]),
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader(html.H5("Cache de Conversas" + origin, className="text-white")),
+                        dbc.CardBody([
+                            html.H3(id="cache-status-text", className="text-white"),
+                            html.P(id="cache-status-details"),
+                        ], className="d-flex justify-content-between align-items-center flex-column")
+                    ],
+                    color="dark", inverse=True
+                ),
+                className="my-3"
+            ),
+        ]),
+
+        dbc.Row([
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader(html.H5("Turnos de Conversa" + origin, className="text-white")),
+                        dbc.CardBody([
+                            html.H3(id="turns-status-text", className="text-white"),
+                            html.P(id="turns-status-details"),
+                        ], className="d-flex justify-content-between align-items-center flex-column")
+                    ],
+                    color="dark", inverse=True
+                ),
+                className="my-3"
+            ),
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader(html.H5("Cache de Gráficos", className="text-white")),
+                        dbc.CardBody([
+                            html.H3(id="figure-cache-status-text", className="text-white"),
+                            html.P(id="figure-cache-status-details"),
+                        ], className="d-flex justify-content-between align-items-center flex-column")
+                    ],
+                    color="dark", inverse=True
+                ),
+                className="my-3"
+            ),
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader(html.H5("Filas de Processamento" + origin, className="text-white")),
+                        dbc.CardBody([
+                            html.H3(id="queue-status-text", className="text-white"),
+                            html.Ul(id="queue-status-details", className="list-unstyled"),
+                        ], className="d-flex justify-content-between align-items-center flex-column")
+                    ],
+                    color="dark", inverse=True
+                ),
+                className="my-3"
+            ),
+        ]),
     
-    html.Hr(className="my-4"),
+        html.Hr(className="my-4"),
     
-    html.Div(id='dummy-div', style={'display': 'none'}), # Elemento para disparar o callback
-    dcc.Interval(
-        id='interval-status',
-        interval=5*1000, # Atualiza a cada 5 segundos
-        n_intervals=0
-    ),
+        html.Div(id='dummy-div', style={'display': 'none'}), # Elemento para disparar o callback
+        dcc.Interval(
+            id='interval-status',
+            interval=5*1000, # Atualiza a cada 5 segundos
+            n_intervals=0
+        ),
+        dcc.Store(id='status-data-version'),
 
-], fluid=True, className="bg-dark text-white p-3")
+    ], fluid=True, className="bg-dark text-white p-3")
 
 # Callback para atualizar o status
 @dash.callback(
     Output("db-status-text", "children"),
     Output("db-status-text", "className"),
-    Input("interval-status", "n_intervals")
+    Output("db-status-details", "children"),
+    Output("turns-status-text", "children"),
+    Output("turns-status-details", "children"),
+    Output("cache-status-text", "children"),
+    Output("cache-status-details", "children"),
+    Output("figure-cache-status-text", "children"),
+    Output("figure-cache-status-details", "children"),
+    Output("queue-status-text", "children"),
+    Output("queue-status-details", "children"),
+    Output("status-data-version", "data"),
+    Input("interval-status", "n_intervals"),
+    Input("live-lead-event", "data"),
+    State("status-data-version", "data")
 )
-def update_status(n):
-    status_text, status_color = check_db_status()
-    text_class = f"text-{status_color}"
-    return status_text, text_class
\ No newline at end of file
+def update_status(n, live_event, last_version):
+    # Cache e filas são contadores em memória (deste processo ou do webhook); a consulta ao banco só é refeita se os leads mudaram
+    version = data_version_token()
+    if version == last_version:
+        status_text, text_class, status_details = dash.no_update, dash.no_update, dash.no_update
+    else:
+        status_text, status_color, status_details = check_db_status()
+        text_class = f"text-{status_color}"
+    process_metrics = webhook_metrics()
+    if process_metrics is None:
+        unavailable = "❌ /health do webhook indisponível"
+        turns_text, turns_details = unavailable, WEBHOOK_HEALTH_URL
+        cache_text, cache_details = unavailable, WEBHOOK_HEALTH_URL
+        queue_text, queue_details = unavailable, []
+    else:
+        turns, cache, shards = process_metrics
+        turns_text, turns_details = check_turns(turns)
+        cache_text, cache_details = check_session_cache(cache)
+        queue_text, queue_details = check_dispatcher(shards)
+    figure_cache_text, figure_cache_details = check_figure_cache()
+    return (
+        status_text, text_class, status_details,
+        turns_text, turns_details,
+        cache_text, cache_details,
+        figure_cache_text, figure_cache_details,
+        queue_text, queue_details,
+        version,
+    )
\ No newline at end of file
@@ -0,0 +1,9 @@
+from database import DB_PATH, init_db, rebuild_rollups, transaction
+
+if __name__ == '__main__':
+    # Recalcula a tabela 'daily_rollups' do zero (use se os totais do dashboard divergirem dos leads)
+    init_db()
+    with transaction() as conn:
+        rebuild_rollups(conn)
+        dias = conn.execute("SELECT COUNT(DISTINCT dia) FROM daily_rollups").fetchone()[0]
+    print(f"Rollups diários de '{DB_PATH}' recalculados ({dias} dias).")
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Sentinela para diferenciar "telefone não está no cache" de "telefone sem lead"
+MISSING = object()
+
+# Configurações padrão (podem ser sobrescritas por variáveis de ambiente)
+CACHE_MAX_SIZE = int(os.environ.get('CHATBOT_SESSION_CACHE_SIZE', '5000'))
+CACHE_TTL = float(os.environ.get('CHATBOT_SESSION_CACHE_TTL', '1800'))
+
+
+class SessionCache:
+    """Cache LRU com TTL do estado das conversas (status e dados coletados) por telefone.
+
+    Cada entrada guarda o lead e a versão da sessão ('active_sessions.version')
+    que ele reflete. Quem lê o cache confere essa versão no banco (uma
+    leitura pela chave primária) antes de confiar no lead, então uma
+    gravação feita por outro processo é percebida no turno seguinte. Ou
+    seja, um acerto não elimina a ida ao banco: troca a leitura do lead
+    (JOIN com 'leads') por essa leitura da versão. As gravações continuam
+    indo para o banco (write-through) e as conversas ociosas por mais de
+    `ttl` segundos são descartadas.
+    """
+
+    def __init__(self, max_size=CACHE_MAX_SIZE, ttl=CACHE_TTL, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, phone_number):
+        """Retorna (cópia do lead ou None se o telefone não tem lead, versão da sessão), ou MISSING."""
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(phone_number)
+            if entry is None or now - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[phone_number]
+                    self.evictions += 1
+                self.misses += 1
+                return MISSING
+            self._entries[phone_number] = (now, entry[1])
+            self._entries.move_to_end(phone_number)
+            self.hits += 1
+            lead, version = entry[1]
+        return (dict(lead) if lead is not None else None), version
+
+    def put(self, phone_number, lead, version):
+        """Grava (uma cópia de) o estado atual da conversa e a versão da sessão correspondente."""
+        now = self.clock()
+        value = (dict(lead) if lead is not None else None, version)
+        with self._lock:
+            self._entries[phone_number] = (now, value)
+            self._entries.move_to_end(phone_number)
+            self._evict(now)
+
+    def invalidate(self, phone_number):
+        """Remove o telefone do cache (a próxima leitura irá ao banco)."""
+        with self._lock:
+            self._entries.pop(phone_number, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self, now):
+        # As entradas mais antigas ficam no início: descarta expiradas e o excesso
+        while self._entries:
+            phone_number, (last_access, _) = next(iter(self._entries.items()))
+            if len(self._entries) > self.max_size or now - last_access > self.ttl:
+                del self._entries[phone_number]
+                self.evictions += 1
+            else:
+                break
+
+    def stats(self):
+        """Retorna os contadores do cache."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+
+# Cache compartilhado pelo processo
+session_cache = SessionCache()
@@ -0,0 +1,48 @@
+class StateMachine:
+    """Motor declarativo da conversa: uma tabela de despacho montada uma única vez.
+
+    Os handlers são registrados com os decoradores `command` (mensagens
+    que valem em qualquer etapa, como '9' e 'oi') e `state` (uma etapa
+    AGUARDANDO_*). Cada turno vira uma consulta O(1) em dicionário e uma
+    chamada de função, e novas etapas são adicionadas só registrando um
+    novo handler, sem mexer no roteador.
+
+    Todo handler recebe `(incoming_msg, turn)` e retorna o texto da resposta.
+    """
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self._commands = {}
+        self._states = {}
+
+    def command(self, text):
+        """Registra um handler para uma mensagem exata, válida em qualquer etapa."""
+        def decorator(handler):
+            self._commands[text] = handler
+            return handler
+        return decorator
+
+    def state(self, name):
+        """Registra o handler de uma etapa da conversa."""
+        def decorator(handler):
+            if name in self._states:
+                raise ValueError(f"Etapa já registrada: {name}")
+            self._states[name] = handler
+            return handler
+        return decorator
+
+    @property
+    def states(self):
+        """Nomes das etapas registradas."""
+        return tuple(self._states)
+
+    def resolve(self, incoming_msg, status):
+        """Retorna o handler responsável pela mensagem na etapa atual."""
+        handler = self._commands.get(incoming_msg)
+        if handler is None:
+            handler = self._states.get(status, self.fallback)
+        return handler
+
+    def dispatch(self, incoming_msg, turn):
+        """Executa o handler da mensagem e retorna o texto da resposta."""
+        return self.resolve(incoming_msg, turn.status)(incoming_msg, turn)
@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Antes de importar os módulos do app: banco temporário e sem linhas de log por turno
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['CHATBOT_DB'] = os.path.join(tempfile.mkdtemp(prefix='chatbot-tests-'), 'chatbot.db')
+os.environ['CHATBOT_TRACE_SAMPLE_RATE'] = '0'
+os.environ['CHATBOT_OUTBOUND_SENDER'] = 'fake'
+
+import database
+from session_cache import session_cache
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Banco novo e migrado para o teste, com pool, gravador e cache de sessões zerados."""
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'chatbot.db'))
+    monkeypatch.setattr(database, '_pool', None)
+    monkeypatch.setattr(database, '_write_batcher', None)
+    session_cache.clear()
+    database.init_db()
+    yield database
+    if database._write_batcher is not None:
+        database._write_batcher.stop()
+    if database._pool is not None:
+        database._pool.close_all()
+    session_cache.clear()
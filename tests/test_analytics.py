@@ -0,0 +1,97 @@
+from datetime import date
+
+import pytest
+
+import analytics
+
+TODAY = date(2025, 8, 10)
+
+# Consultas de referência, direto sobre 'leads' (sem 'daily_rollups')
+SQL_BY_DAY = "SELECT substr(timestamp, 1, 10), COUNT(*) FROM leads {where} GROUP BY 1 ORDER BY 1"
+SQL_BY_VALUE = "SELECT {column}, COUNT(*) FROM leads {where} GROUP BY 1 ORDER BY 2 DESC, 1"
+SQL_BY_GAME = '''
+    SELECT g.titulo, COUNT(*) FROM lead_games lg JOIN games g ON g.id = lg.game_id JOIN leads l ON l.id = lg.lead_id
+    {where} GROUP BY g.id ORDER BY 2 DESC, 1
+'''
+
+RANGES = [(None, None), ('2025-08-03', '2025-08-07'), ('2025-08-10', '2025-08-10')]
+
+
+def start(db, phone, day, modelo=None, ano=None, jogos=None):
+    turn = db.load_conversation_turn(phone)
+    turn.start_lead({'timestamp': f'2025-08-{day:02d}T10:00:00', 'telefone': phone, 'status': 'AGUARDANDO_NOME'})
+    turn.commit()
+    data = {key: value for key, value in (('modelo', modelo), ('ano', ano), ('jogos_selecionados', jogos)) if value is not None}
+    if data:
+        update(db, phone, 'AGUARDANDO_JOGOS', data)
+
+
+def update(db, phone, status, data=None):
+    turn = db.load_conversation_turn(phone)
+    turn.update(status, data)
+    turn.commit()
+
+
+def where(start_date, end_date, *extra, alias=''):
+    conditions = list(extra)
+    if start_date:
+        conditions += [f"{alias}timestamp >= '{start_date}'", f"{alias}timestamp < date('{end_date}', '+1 day')"]
+    return "WHERE " + " AND ".join(conditions) if conditions else ""
+
+
+def direct(db, sql):
+    with db.get_connection() as conn:
+        return [tuple(row) for row in conn.execute(sql)]
+
+
+@pytest.fixture
+def leads(db):
+    games = ['GTA V', 'FIFA 19', 'Mortal Kombat']
+    for index in range(24):
+        phone = f'whatsapp:+551190000{index:04d}'
+        start(db, phone, 1 + index % 10, modelo=['Slim', 'Fat', 'Super Slim'][index % 3],
+              ano=2008 + index % 4, jogos=', '.join(games[:1 + index % 3]))
+        if index % 4 == 0:
+            update(db, phone, 'FINALIZADO')
+    # Correções que movem o lead de um valor para outro (o valor antigo pode chegar a zero)
+    update(db, 'whatsapp:+5511900000000', 'FINALIZADO', {'modelo': 'Pro', 'ano': 2015, 'jogos_selecionados': 'Minecraft'})
+    update(db, 'whatsapp:+5511900000001', 'AGUARDANDO_JOGOS', {'modelo': 'Pro'})
+    update(db, 'whatsapp:+5511900000001', 'AGUARDANDO_JOGOS', {'modelo': 'Slim'})
+    # Lead sem modelo nem ano, e um que sai das contagens de ano
+    start(db, 'whatsapp:+5511900009999', 10)
+    update(db, 'whatsapp:+5511900000002', 'AGUARDANDO_JOGOS', {'ano': None})
+    return db
+
+
+def assert_matches_leads(db):
+    for start_date, end_date in RANGES:
+        kpis = analytics.count_kpis(start_date, end_date, today=TODAY)
+        total, modelos = direct(db, f"SELECT COUNT(*), COUNT(modelo) FROM leads {where(start_date, end_date)}")[0]
+        assert (kpis['total_leads'], kpis['modelos_count']) == (total, modelos)
+
+        assert analytics.count_leads_by_day(start_date, end_date) == direct(db, SQL_BY_DAY.format(where=where(start_date, end_date)))
+        for function, column in ((analytics.count_leads_by_model, 'modelo'), (analytics.count_leads_by_year, 'ano')):
+            expected = direct(db, SQL_BY_VALUE.format(column=column, where=where(start_date, end_date, f'{column} IS NOT NULL')))
+            assert sorted(function(start_date, end_date)) == sorted(expected)
+        expected = direct(db, SQL_BY_GAME.format(where=where(start_date, end_date, alias='l.')))
+        assert sorted(analytics.count_leads_by_game(start_date, end_date)) == sorted(expected)
+
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM daily_rollups WHERE count <= 0").fetchone()[0] == 0
+
+
+def test_rollups_match_group_by_over_leads(leads):
+    assert_matches_leads(leads)
+
+
+def test_rollups_match_after_rebuild(leads):
+    with leads.transaction() as conn:
+        leads.rebuild_rollups(conn)
+    assert_matches_leads(leads)
+
+
+def test_moved_values_leave_no_empty_rows(leads):
+    update(leads, 'whatsapp:+5511900000000', 'FINALIZADO', {'modelo': 'Slim', 'jogos_selecionados': 'GTA V'})
+    with leads.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM daily_rollups WHERE valor IN ('Pro', 'Minecraft')").fetchone()[0] == 0
+    assert_matches_leads(leads)
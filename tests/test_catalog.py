@@ -0,0 +1,125 @@
+import json
+import os
+
+import pytest
+
+from catalog import Catalog, CatalogSnapshot
+
+CONTENT_A = {'modelos_xbox': {'1': 'Fat', '2': 'Slim'}, 'jogos': {'1': 'GTA V', '2': 'FIFA 19'}}
+CONTENT_B = {'modelos_xbox': {'1': 'Fat', '2': 'Slim'}, 'jogos': {'1': 'Minecraft', '2': 'GTA V', '3': 'FIFA 19'}}
+
+PHONE = 'whatsapp:+5511977778888'
+
+
+def write_catalog(path, content, tick=1):
+    """Grava o catálogo e avança o mtime, para a mudança ser percebida mesmo no mesmo segundo."""
+    previous = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    path.write_text(json.dumps(content), encoding='utf-8')
+    mtime = previous + tick * 10**9
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / 'content.json'
+    write_catalog(path, CONTENT_A)
+    return path
+
+
+def test_reloads_when_mtime_changes(path):
+    catalog = Catalog(str(path), check_interval=0)
+    first = catalog.current()
+    assert first.jogos['1'] == 'GTA V'
+    assert catalog.current() is first        # arquivo igual: mesmo snapshot
+
+    write_catalog(path, CONTENT_B)
+    second = catalog.current()
+    assert second.jogos['1'] == 'Minecraft'
+    assert second.version != first.version
+    # A versão anterior continua disponível para as conversas em andamento
+    assert catalog.snapshot(first.version) is first
+
+
+def test_check_interval_limits_stats(path):
+    catalog = Catalog(str(path), check_interval=3600)
+    first = catalog.current()
+    write_catalog(path, CONTENT_B)
+    assert catalog.current() is first
+    catalog.reload()
+    assert catalog.current().jogos['1'] == 'Minecraft'
+
+
+def test_invalid_json_keeps_previous_version(path):
+    catalog = Catalog(str(path), check_interval=0)
+    first = catalog.current()
+    path.write_text('{"jogos": ', encoding='utf-8')
+    os.utime(path, ns=(os.stat(path).st_mtime_ns + 10**9,) * 2)
+    assert catalog.current() is first
+
+
+def test_missing_version_is_looked_up_once(path):
+    calls = []
+
+    def loader(version):
+        calls.append(version)
+        return None
+
+    catalog = Catalog(str(path), check_interval=0, loader=loader)
+    for _ in range(5):
+        assert catalog.snapshot('0123456789abcdef') is catalog.current()
+    assert calls == ['0123456789abcdef']
+
+
+def test_loader_error_is_retried(path):
+    calls = []
+
+    def loader(version):
+        calls.append(version)
+        raise OSError('banco ocupado')
+
+    catalog = Catalog(str(path), check_interval=0, loader=loader)
+    catalog.snapshot('0123456789abcdef')
+    catalog.snapshot('0123456789abcdef')
+    assert len(calls) == 2
+
+
+def run_turn(db, catalog, status, data=None, phone=PHONE):
+    turn = db.load_conversation_turn(phone)
+    turn.catalog = catalog.snapshot(turn.lead.get('catalogo_versao') if turn.lead else None)
+    if turn.lead is None:
+        turn.start_lead({'timestamp': '2025-08-01T10:00:00', 'telefone': phone, 'status': status})
+    else:
+        turn.update(status, data)
+    turn.commit()
+    return turn
+
+
+def test_conversation_keeps_persisted_version_after_edit(db, path):
+    catalog = Catalog(str(path), check_interval=0, loader=db.load_catalog_version)
+    version_a = catalog.current().version
+    run_turn(db, catalog, 'AGUARDANDO_JOGOS')
+
+    write_catalog(path, CONTENT_B)
+    # Processo reiniciado (ou outro processo): a versão antiga só existe no banco
+    restarted = Catalog(str(path), check_interval=0, loader=db.load_catalog_version)
+    assert restarted.current().jogos['1'] == 'Minecraft'
+    turn = run_turn(db, restarted, 'AGUARDANDO_JOGOS', {'jogos_selecionados': 'GTA V'})
+    assert turn.catalog.version == version_a
+    assert turn.catalog.jogos['1'] == 'GTA V'
+    assert db.get_lead_info(PHONE)['catalogo_versao'] == version_a
+
+    # Uma conversa nova usa a versão atual
+    other = run_turn(db, restarted, 'AGUARDANDO_JOGOS', phone='whatsapp:+5511900000000')
+    assert other.catalog.version == CatalogSnapshot(CONTENT_B).version
+
+
+def test_conversation_with_unknown_version_is_moved_to_current(db, path):
+    catalog = Catalog(str(path), check_interval=0, loader=db.load_catalog_version)
+    run_turn(db, catalog, 'AGUARDANDO_JOGOS')
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM catalog_versions")
+    write_catalog(path, CONTENT_B)
+    restarted = Catalog(str(path), check_interval=0, loader=db.load_catalog_version)
+    turn = run_turn(db, restarted, 'AGUARDANDO_JOGOS', {'jogos_selecionados': 'Minecraft'})
+    assert turn.catalog is restarted.current()
+    assert db.get_lead_info(PHONE)['catalogo_versao'] == restarted.current().version
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+flask = pytest.importorskip('flask')
+pytest.importorskip('twilio')
+
+import chatbot
+import outbound
+from dispatcher import MessageDispatcher
+from outbound import FakeSender
+
+PHONE = 'whatsapp:+5511955556666'
+
+
+@pytest.fixture
+def webhook(db, monkeypatch):
+    """Webhook síncrono com um dispatcher próprio (uma fila) e SYNC_TIMEOUT curto."""
+    dispatcher = MessageDispatcher(workers=1)
+    dispatcher.start()
+    monkeypatch.setattr(chatbot, 'get_dispatcher', lambda: dispatcher)
+    monkeypatch.setattr(chatbot, 'ASYNC_MODE', False)
+    monkeypatch.setattr(chatbot, 'SYNC_TIMEOUT', 0.05)
+    monkeypatch.setattr(outbound, '_sender', None)
+    yield dispatcher
+    dispatcher.stop()
+
+
+def post(body, phone=PHONE):
+    with flask.Flask(__name__).test_request_context('/whatsapp_webhook', method='POST', data={'Body': body, 'From': phone}):
+        return chatbot.whatsapp_webhook()
+
+
+def slow_handler(monkeypatch, gate, started=None):
+    """Troca o turno por um que só termina quando `gate` é liberado."""
+    calls = []
+
+    def process_message(incoming_msg, sender_phone_number, trace=None):
+        calls.append(incoming_msg)
+        if started is not None:
+            started.set()
+        gate.wait(5)
+        return f'resposta: {incoming_msg}'
+
+    monkeypatch.setattr(chatbot, 'process_message', process_message)
+    return calls
+
+
+def test_sync_reply_in_twiml(webhook, monkeypatch):
+    gate = threading.Event()
+    gate.set()
+    slow_handler(monkeypatch, gate)
+    assert '<Message>resposta: oi</Message>' in post('oi')
+
+
+def test_queued_message_is_cancelled(webhook, monkeypatch):
+    gate = threading.Event()
+    calls = slow_handler(monkeypatch, gate)
+    # A fila do telefone está ocupada por outro trabalho até o fim do timeout
+    blocker = webhook.submit(PHONE, gate.wait, 5)
+    twiml = post('oi')
+    gate.set()
+    blocker.result(timeout=5)
+    webhook.stop()
+    assert chatbot.BUSY_MESSAGE in twiml
+    assert calls == []
+
+
+def test_running_turn_is_deferred_to_the_sender(webhook, monkeypatch):
+    sender = FakeSender()
+    outbound.set_sender(sender)
+    gate, started = threading.Event(), threading.Event()
+    slow_handler(monkeypatch, gate, started)
+    twiml = post('oi')
+    assert started.is_set()
+    assert '<Message>' not in twiml
+    gate.set()
+    webhook.stop()
+    assert sender.messages_to(PHONE) == ['resposta: oi']
+
+
+def test_running_turn_waits_without_a_sender(webhook, monkeypatch):
+    monkeypatch.delenv('CHATBOT_OUTBOUND_SENDER', raising=False)
+    for name in outbound.TWILIO_SETTINGS:
+        monkeypatch.delenv(name, raising=False)
+    assert not outbound.sender_configured()
+    gate = threading.Event()
+    slow_handler(monkeypatch, gate)
+    timer = threading.Timer(0.2, gate.set)
+    timer.start()
+    twiml = post('oi')
+    timer.join()
+    # A resposta não se perde: o webhook esperou o turno em andamento
+    assert '<Message>resposta: oi</Message>' in twiml
+    assert outbound._sender is None
@@ -0,0 +1,105 @@
+import sqlite3
+
+import database
+from session_cache import session_cache
+
+PHONE = 'whatsapp:+5511911112222'
+
+
+def test_legacy_helpers_go_through_conversation_turn(db):
+    assert db.get_lead_status(PHONE) is None
+    db.save_lead_to_db({'timestamp': '2025-08-01T10:00:00', 'telefone': PHONE, 'status': 'AGUARDANDO_NOME'})
+    assert db.get_lead_status(PHONE) == 'AGUARDANDO_NOME'
+
+    db.update_lead_status_and_data(PHONE, 'AGUARDANDO_EMAIL', {'nome': 'Cliente'})
+    assert db.get_lead_status(PHONE) == 'AGUARDANDO_EMAIL'
+    assert db.get_lead_info(PHONE)['nome'] == 'Cliente'
+    # Sem lead ativo, a atualização não grava nada
+    db.update_lead_status_and_data('whatsapp:+5511900000000', 'FINALIZADO')
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM leads").fetchone()[0] == 1
+
+
+# Esquema de 'leads' antes das migrações (bancos criados pela primeira versão do init_db)
+SQL_BASELINE_LEADS = '''
+    CREATE TABLE leads (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        nome TEXT,
+        email TEXT,
+        telefone TEXT,
+        endereco TEXT,
+        modelo TEXT,
+        ano INTEGER,
+        tipo_de_armazenamento TEXT,
+        jogos_selecionados TEXT,
+        status TEXT
+    )
+'''
+
+BASELINE_ROWS = [
+    ('2025-07-01T09:00:00', 'Ana', PHONE, 'Slim', 2010, 'HD Interno', 'GTA V, FIFA 19', 'FINALIZADO'),
+    ('2025-07-05T09:00:00', 'Ana', PHONE, 'Fat', 2008, 'Pendrive 16gb+', 'GTA V', 'AGUARDANDO_JOGOS'),
+    ('2025-07-02T15:30:00', 'Bruno', 'whatsapp:+5511933330000', 'Slim', 2011, 'Não tenho',
+     'Nenhum, pois não tem armazenamento', 'FINALIZADO'),
+    ('2025-07-03T11:00:00', None, None, None, None, None, None, 'AGUARDANDO_NOME'),
+]
+
+
+def test_migrates_baseline_database(tmp_path, monkeypatch):
+    path = str(tmp_path / 'legado.db')
+    conn = sqlite3.connect(path)
+    conn.execute(SQL_BASELINE_LEADS)
+    conn.executemany(
+        "INSERT INTO leads (timestamp, nome, telefone, modelo, ano, tipo_de_armazenamento, jogos_selecionados, status) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", BASELINE_ROWS
+    )
+    conn.commit()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    conn.close()
+
+    monkeypatch.setattr(database, 'DB_PATH', path)
+    monkeypatch.setattr(database, '_pool', None)
+    monkeypatch.setattr(database, '_write_batcher', None)
+    session_cache.clear()
+    try:
+        assert database.init_db() == len(database.MIGRATIONS)
+        with database.get_connection() as conn:
+            first = {table: conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall()
+                     for table in ('leads', 'active_sessions', 'lead_games', 'daily_rollups')}
+        # Rodar de novo não reaplica nada
+        assert database.init_db() == len(database.MIGRATIONS)
+
+        with database.get_connection() as conn:
+            assert database.get_schema_version(conn) == len(database.MIGRATIONS)
+            for table, rows in first.items():
+                assert conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall() == rows
+            leads = conn.execute(
+                "SELECT timestamp, nome, telefone, modelo, ano, tipo_de_armazenamento, jogos_selecionados, status "
+                "FROM leads ORDER BY id"
+            ).fetchall()
+            assert [tuple(row) for row in leads] == BASELINE_ROWS
+            # O lead mais recente de cada telefone é o ativo; o lead sem telefone fica de fora
+            sessions = conn.execute("SELECT telefone, lead_id, version, catalogo_versao FROM active_sessions ORDER BY telefone")
+            assert [tuple(row) for row in sessions] == [(PHONE, 2, 0, None), ('whatsapp:+5511933330000', 3, 0, None)]
+            games = conn.execute(
+                "SELECT lg.lead_id, g.titulo FROM lead_games lg JOIN games g ON g.id = lg.game_id ORDER BY 1, 2"
+            )
+            assert [tuple(row) for row in games] == [(1, 'FIFA 19'), (1, 'GTA V'), (2, 'GTA V')]
+            rollups = conn.execute("SELECT dia, dimensao, valor, count FROM daily_rollups ORDER BY 1, 2, 3").fetchall()
+            database.rebuild_rollups(conn)
+            assert conn.execute("SELECT dia, dimensao, valor, count FROM daily_rollups ORDER BY 1, 2, 3").fetchall() == rollups
+            assert conn.execute("SELECT version FROM data_version").fetchone() is not None
+
+        # A conversa continua do lead ativo migrado
+        turn = database.load_conversation_turn(PHONE)
+        assert (turn.lead['id'], turn.status) == (2, 'AGUARDANDO_JOGOS')
+        turn.update('FINALIZADO')
+        turn.commit()
+        assert database.get_lead_status(PHONE) == 'FINALIZADO'
+    finally:
+        if database._write_batcher is not None:
+            database._write_batcher.stop()
+        if database._pool is not None:
+            database._pool.close_all()
+        session_cache.clear()
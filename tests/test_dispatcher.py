@@ -0,0 +1,60 @@
+import random
+import threading
+import time
+
+import pytest
+
+from dispatcher import MessageDispatcher
+
+
+@pytest.fixture
+def dispatcher():
+    dispatcher = MessageDispatcher(workers=4)
+    dispatcher.start()
+    yield dispatcher
+    dispatcher.stop()
+
+
+def test_messages_of_a_phone_run_in_arrival_order(dispatcher):
+    phones = [f'whatsapp:+55119000000{index:02d}' for index in range(12)]
+    seen = {phone: [] for phone in phones}
+    running = set()
+    overlaps = []
+    lock = threading.Lock()
+
+    def handle(phone, index):
+        with lock:
+            if phone in running:
+                overlaps.append(phone)
+            running.add(phone)
+        time.sleep(random.random() / 1000)
+        with lock:
+            running.discard(phone)
+            seen[phone].append(index)
+        return index
+
+    futures = [dispatcher.submit(phone, handle, phone, index) for index in range(30) for phone in phones]
+    assert [future.result(timeout=10) for future in futures] == [index for index in range(30) for _ in phones]
+    assert all(indexes == list(range(30)) for indexes in seen.values())
+    assert overlaps == []
+
+
+def test_phone_always_maps_to_the_same_shard():
+    # crc32 é estável entre processos (ao contrário de hash())
+    dispatcher = MessageDispatcher(workers=4)
+    assert dispatcher.shard_for('whatsapp:+5511987654321') == dispatcher.shard_for('whatsapp:+5511987654321')
+    assert {dispatcher.shard_for(f'whatsapp:+551190000{index:04d}') for index in range(100)} == {0, 1, 2, 3}
+
+
+def test_failure_does_not_stop_the_shard(dispatcher):
+    phone = 'whatsapp:+5511900000001'
+
+    def fail():
+        raise ValueError('falhou')
+
+    failed = dispatcher.submit(phone, fail)
+    after = dispatcher.submit(phone, lambda: 'ok')
+    assert after.result(timeout=5) == 'ok'
+    with pytest.raises(ValueError):
+        failed.result()
+    assert sum(shard['errors'] for shard in dispatcher.stats()) == 1
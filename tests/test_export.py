@@ -0,0 +1,89 @@
+import csv
+import gzip
+import io
+from functools import partial
+
+import pytest
+
+import export
+from export import EXPORT_COLUMNS, ExportError, export_leads
+
+STATUSES = ('FINALIZADO', 'AGUARDANDO_JOGOS')
+
+
+@pytest.fixture
+def leads(db, monkeypatch):
+    """11 leads e blocos de 3 linhas: a exportação passa por vários blocos, e o último fica incompleto."""
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO leads (timestamp, nome, email, telefone, ano, status) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (f'2025-08-{day:02d}T10:00:00', f'Cliente "{day}", São Paulo\nSP', f'c{day}@exemplo.com',
+                 f'whatsapp:+55119000000{day:02d}', 2000 + day, STATUSES[day % 2])
+                for day in range(1, 12)
+            ],
+        )
+    chunks = []
+
+    def iter_lead_chunks(*args, **kwargs):
+        for rows in original(*args, chunk_size=3, **kwargs):
+            chunks.append(len(rows))
+            yield rows
+
+    original = export.iter_lead_chunks
+    monkeypatch.setattr(export, 'iter_lead_chunks', iter_lead_chunks)
+    return chunks
+
+
+def expected_rows(db, where="", params=()):
+    with db.get_connection() as conn:
+        rows = conn.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM leads {where} ORDER BY id", params).fetchall()
+    return [['' if value is None else str(value) for value in row] for row in rows]
+
+
+def read_csv(data):
+    return list(csv.reader(io.StringIO(data.decode('utf-8'), newline='')))
+
+
+def test_csv_streams_across_chunks(db, leads):
+    body, mimetype, filename = export_leads('csv')
+    parts = list(body)
+    assert leads == [3, 3, 3, 2]
+    assert len(parts) == 1 + len(leads)      # cabeçalho + um pedaço por bloco
+    assert mimetype.startswith('text/csv') and filename.endswith('.csv')
+    header, *rows = read_csv(b''.join(parts))
+    assert header == list(EXPORT_COLUMNS)
+    assert rows == expected_rows(db)
+
+
+def test_csv_gz_streams_across_chunks(db, leads):
+    body, mimetype, filename = export_leads('csv.gz')
+    data = gzip.decompress(b''.join(body))
+    assert leads == [3, 3, 3, 2]
+    assert mimetype == 'application/gzip' and filename.endswith('.csv.gz')
+    header, *rows = read_csv(data)
+    assert rows == expected_rows(db)
+
+
+def test_filters_apply_to_every_chunk(db, leads):
+    body, _, _ = export_leads('csv', '2025-08-02', '2025-08-10', 'FINALIZADO')
+    _, *rows = read_csv(b''.join(body))
+    assert rows == expected_rows(
+        db, "WHERE timestamp >= '2025-08-02' AND timestamp < '2025-08-11' AND status = 'FINALIZADO'"
+    )
+    assert [row[0] for row in rows] == ['2', '4', '6', '8', '10']
+    assert leads == [3, 2]
+
+
+def test_body_is_lazy(db, leads):
+    body, _, _ = export_leads('csv')
+    assert leads == []                       # nada é lido antes de o download começar
+    next(body)
+    next(body)
+    assert leads == [3]
+
+
+@pytest.mark.parametrize('args', [('xlsx',), ('csv', '2025-13-01'), ('csv', None, 'ontem')])
+def test_invalid_parameters(db, args):
+    with pytest.raises(ExportError):
+        export_leads(*args)
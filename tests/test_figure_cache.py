@@ -0,0 +1,64 @@
+import analytics
+from figure_cache import FigureCache
+from utils import data_version_token
+
+KEY = ('2025-08-01', '2025-08-31', None)
+
+
+def add_lead(db, phone, day):
+    turn = db.load_conversation_turn(phone)
+    turn.start_lead({'timestamp': f'2025-08-{day:02d}T10:00:00', 'telefone': phone, 'status': 'AGUARDANDO_NOME'})
+    turn.commit()
+    db.flush_writes(5)
+
+
+def test_entry_is_invalidated_when_data_version_changes(db):
+    cache = FigureCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return analytics.count_kpis(*KEY)['total_leads']
+
+    add_lead(db, 'whatsapp:+5511900000001', 5)
+    version = data_version_token()
+    assert cache.get_or_compute(KEY, version, compute) == 1
+    assert cache.get_or_compute(KEY, data_version_token(), compute) == 1
+    assert len(calls) == 1
+
+    add_lead(db, 'whatsapp:+5511900000002', 6)
+    assert data_version_token() != version
+    assert cache.get_or_compute(KEY, data_version_token(), compute) == 2
+    assert len(calls) == 2
+    assert cache.stats()['invalidations'] == 1
+
+    # Alterar um lead existente também muda a versão
+    turn = db.load_conversation_turn('whatsapp:+5511900000002')
+    turn.update('AGUARDANDO_EMAIL', {'nome': 'Cliente'})
+    turn.commit()
+    db.flush_writes(5)
+    cache.get_or_compute(KEY, data_version_token(), compute)
+    assert len(calls) == 3
+
+
+def test_value_computed_for_an_old_version_is_not_stored():
+    cache = FigureCache()
+
+    def compute_while_data_changes():
+        # Outra aba pede a versão nova enquanto este cálculo está em andamento
+        cache.get_or_compute(('outro',), 'v2', lambda: 'novo')
+        return 'antigo'
+
+    assert cache.get_or_compute(KEY, 'v1', compute_while_data_changes) == 'antigo'
+    assert cache.get_or_compute(KEY, 'v2', lambda: 'recalculado') == 'recalculado'
+
+
+def test_evicts_least_recently_used_filter():
+    cache = FigureCache(max_size=2)
+    for key in ('a', 'b'):
+        cache.get_or_compute(key, 'v1', lambda: key)
+    cache.get_or_compute('a', 'v1', lambda: 'x')
+    cache.get_or_compute('c', 'v1', lambda: 'c')
+    assert cache.get_or_compute('a', 'v1', lambda: 'recalculado') == 'a'
+    assert cache.get_or_compute('b', 'v1', lambda: 'recalculado') == 'recalculado'
+    assert cache.stats()['evictions'] == 2
@@ -0,0 +1,74 @@
+import pytest
+
+from catalog import CatalogSnapshot
+from game_search import GameSearchIndex, has_word
+
+# Recorte do content.json, com os erros de grafia dos títulos reais
+JOGOS = {
+    '1': 'Angry Birds Trilogy',
+    '4': 'Call of Duty Advanced Warfare',
+    '5': 'Call of Duty Black OPS II',
+    '6': 'Call of Duty Gohsts',
+    '7': 'Call of Duty II',
+    '13': 'Forza Horizon',
+    '14': 'GTA V',
+    '16': 'Metal Slug III',
+    '17': 'Metal Slug X',
+    '19': 'Mortal Kombat',
+    '22': 'PES 2018',
+    '3': 'Brazucas 23 (PES 2013)',
+}
+
+COD_TITLES = {'Call of Duty Advanced Warfare', 'Call of Duty Black OPS II', 'Call of Duty Gohsts', 'Call of Duty II'}
+
+
+@pytest.fixture(scope='module')
+def snapshot():
+    return CatalogSnapshot({'jogos': JOGOS})
+
+
+@pytest.mark.parametrize('text, expected', [
+    # Número do menu e título exato
+    ('14', 'GTA V'),
+    ('gta v', 'GTA V'),
+    # Numeral romano ou algarismo
+    ('gta 5', 'GTA V'),
+    ('Gta V', 'GTA V'),
+    # Sigla + subtítulo
+    ('cod black ops', 'Call of Duty Black OPS II'),
+    ('cod advanced warfare', 'Call of Duty Advanced Warfare'),
+    # Erros de digitação
+    ('angri birds', 'Angry Birds Trilogy'),
+    ('forza horizn', 'Forza Horizon'),
+])
+def test_resolves_to_one_game(snapshot, text, expected):
+    assert snapshot.resolve_game(text) == (expected, [])
+
+
+@pytest.mark.parametrize('text', ['4 5', '1-5', 'x', 'iv', '5 x', '2013'])
+def test_numeral_only_input_is_rejected(snapshot, text):
+    assert not has_word(text)
+    assert snapshot.resolve_game(text) == (None, [])
+
+
+@pytest.mark.parametrize('text, expected_titles', [
+    ('cod', COD_TITLES),
+    ('call of duty', COD_TITLES),
+    ('metal slug', {'Metal Slug III', 'Metal Slug X'}),
+    ('pes', {'PES 2018', 'Brazucas 23 (PES 2013)'}),
+])
+def test_ambiguous_input_returns_suggestions(snapshot, text, expected_titles):
+    titulo, sugestoes = snapshot.resolve_game(text)
+    assert titulo is None
+    assert {title for _, title in sugestoes} == expected_titles
+
+
+@pytest.mark.parametrize('text', ['mario kart', 'zzzz qqq', 'zzz 5'])
+def test_below_threshold_returns_nothing(snapshot, text):
+    assert snapshot.resolve_game(text) == (None, [])
+
+
+def test_search_ignores_titles_matched_only_by_numbers():
+    index = GameSearchIndex(JOGOS)
+    assert index.search('5') == []
+    assert [title for _, _, title in index.search('gta 5')][:1] == ['GTA V']
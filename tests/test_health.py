@@ -0,0 +1,69 @@
+import pytest
+
+pytest.importorskip('flask')
+
+from health import TurnMetrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_no_turns():
+    stats = TurnMetrics(clock=FakeClock()).snapshot()
+    assert stats['turns_total'] == 0
+    assert stats['turns_per_minute'] == 0.0
+    assert stats['error_rate'] == 0.0
+    assert stats['latency_p99_ms'] == 0.0
+
+
+def test_rate_over_window():
+    clock = FakeClock()
+    metrics = TurnMetrics(buckets=60, clock=clock)
+    for second in range(30):
+        clock.now = 1000 + second
+        metrics.record(0.01)
+        metrics.record(0.01, ok=False)
+    stats = metrics.snapshot()
+    assert stats['turns_per_minute'] == 60.0
+    assert stats['error_rate'] == 0.5
+    assert stats['turns_total'] == 60 and stats['errors_total'] == 30
+
+
+def test_old_seconds_leave_the_window():
+    clock = FakeClock()
+    metrics = TurnMetrics(buckets=60, clock=clock)
+    metrics.record(0.01, ok=False)
+    clock.now += 59
+    assert metrics.snapshot()['turns_per_minute'] == 1.0
+    clock.now += 1
+    stats = metrics.snapshot()
+    assert stats['turns_per_minute'] == 0.0
+    assert stats['error_rate'] == 0.0
+    assert stats['errors_total'] == 1   # o total desde o início não expira
+
+
+def test_bucket_is_reset_when_reused():
+    clock = FakeClock()
+    metrics = TurnMetrics(buckets=60, clock=clock)
+    for _ in range(5):
+        metrics.record(0.01, ok=False)
+    clock.now += 60   # mesmo índice, um minuto depois
+    metrics.record(0.01)
+    stats = metrics.snapshot()
+    assert stats['turns_per_minute'] == 1.0
+    assert stats['error_rate'] == 0.0
+
+
+def test_latency_percentiles():
+    metrics = TurnMetrics(window=100, clock=FakeClock())
+    for ms in range(1, 101):
+        metrics.record(ms / 1000)
+    stats = metrics.snapshot()
+    assert stats['latency_p50_ms'] == pytest.approx(51)
+    assert stats['latency_p95_ms'] == pytest.approx(96)
+    assert stats['latency_max_ms'] == pytest.approx(100)
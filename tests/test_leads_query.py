@@ -0,0 +1,85 @@
+import pytest
+
+from leads_query import fetch_leads_page, filter_query_to_sql
+
+LIKE = "LIKE ? ESCAPE '\\'"
+
+
+@pytest.mark.parametrize('filter_query, expected_sql, expected_params', [
+    # Sem filtro
+    (None, "", ()),
+    ('', "", ()),
+    # Operadores de comparação e seus sinônimos
+    ('{status} = FINALIZADO', "WHERE status = ?", ('FINALIZADO',)),
+    ('{status} eq FINALIZADO', "WHERE status = ?", ('FINALIZADO',)),
+    ('{status} s= FINALIZADO', "WHERE status = ?", ('FINALIZADO',)),
+    ('{status} != FINALIZADO', "WHERE status != ?", ('FINALIZADO',)),
+    ('{status} ne FINALIZADO', "WHERE status != ?", ('FINALIZADO',)),
+    ('{ano} > 2010', "WHERE ano > ?", (2010,)),
+    ('{ano} ge 2010', "WHERE ano >= ?", (2010,)),
+    ('{ano} lt 2010.5', "WHERE ano < ?", (2010.5,)),
+    ('{ano} <= 2010', "WHERE ano <= ?", (2010,)),
+    # Variantes sem diferenciar maiúsculas de minúsculas
+    ('{status} i= finalizado', "WHERE status COLLATE NOCASE = ?", ('finalizado',)),
+    ('{status} i!= finalizado', "WHERE status COLLATE NOCASE != ?", ('finalizado',)),
+    ('{nome} i< m', "WHERE nome COLLATE NOCASE < ?", ('m',)),
+    # Aspas: o valor fica como texto, sem as aspas e com a aspa escapada desfeita
+    ('{status} eq "FINALIZADO"', "WHERE status = ?", ('FINALIZADO',)),
+    ("{nome} = 'D\\'Ávila'", "WHERE nome = ?", ("D'Ávila",)),
+    ('{nome} = `joão silva`', "WHERE nome = ?", ('joão silva',)),
+    ('{ano} = "2010"', "WHERE ano = ?", ('2010',)),
+    # contains / datestartswith viram LIKE, com %, _ e \ do valor escapados
+    ('{nome} contains ana', f"WHERE nome {LIKE}", ('%ana%',)),
+    ('{nome} icontains ana', f"WHERE nome {LIKE}", ('%ana%',)),
+    ('{email} contains 50%_off', f"WHERE email {LIKE}", ('%50\\%\\_off%',)),
+    ('{endereco} contains "a\\b"', f"WHERE endereco {LIKE}", ('%a\\\\b%',)),
+    ('{timestamp} datestartswith 2025-08', f"WHERE timestamp {LIKE}", ('2025-08%',)),
+    # scontains diferencia maiúsculas de minúsculas: instr() em vez de LIKE, sem escapes
+    ('{nome} scontains Ana', "WHERE instr(nome, ?) > 0", ('Ana',)),
+    ('{email} scontains 50%_off', "WHERE instr(email, ?) > 0", ('50%_off',)),
+    ('{ano} scontains 201', "WHERE instr(ano, ?) > 0", ('201',)),
+    # is blank / is not blank / is nil
+    ('{email} is blank', "WHERE (email IS NULL OR email = '')", ()),
+    ('{email} is not blank', "WHERE (email IS NOT NULL AND email != '')", ()),
+    ('{email} is nil', "WHERE (email IS NULL OR email = '')", ()),
+    # Colunas desconhecidas, operadores desconhecidos e valores vazios são ignorados
+    ('{senha} = x', "", ()),
+    ('{senha} is blank', "", ()),
+    ('{status; DROP TABLE leads} = x', "", ()),
+    ('{status} ~ x', "", ()),
+    ('{status} = ', "", ()),
+    ('status = x', "", ()),
+    # Várias condições
+    ('{status} eq "FINALIZADO" && {ano} > 2010', "WHERE status = ? AND ano > ?", ('FINALIZADO', 2010)),
+    ('{senha} = x && {ano} > 2010', "WHERE ano > ?", (2010,)),
+])
+def test_filter_query_to_sql(filter_query, expected_sql, expected_params):
+    assert filter_query_to_sql(filter_query) == (expected_sql, expected_params)
+
+
+@pytest.mark.parametrize('filter_query, expected_names', [
+    ('{status} = finalizado', []),
+    ('{status} i= finalizado', ['Ana', 'Bruno']),
+    ('{status} i!= finalizado', ['100% Carla']),
+    ('{nome} contains %', ['100% Carla']),
+    ('{nome} contains _', []),
+    ('{nome} contains ana', ['Ana']),
+    ('{nome} scontains ana', []),
+    ('{nome} scontains An', ['Ana']),
+    ('{status} s= Finalizado', ['Bruno']),
+    ('{status} scontains inal', ['Bruno']),
+    ('{email} is blank', ['Bruno']),
+])
+def test_fetch_leads_page_filters(db, filter_query, expected_names):
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO leads (timestamp, nome, email, status) VALUES (?, ?, ?, ?)",
+            [
+                ('2025-08-01T10:00:00', 'Ana', 'ana@exemplo.com', 'FINALIZADO'),
+                ('2025-08-02T10:00:00', 'Bruno', '', 'Finalizado'),
+                ('2025-08-03T10:00:00', '100% Carla', 'carla@exemplo.com', 'AGUARDANDO_JOGOS'),
+            ],
+        )
+    rows, total = fetch_leads_page(0, 10, None, filter_query)
+    assert [row['nome'] for row in rows] == expected_names
+    assert total == len(expected_names)
@@ -0,0 +1,106 @@
+import threading
+
+from session_cache import MISSING, SessionCache, session_cache
+from write_batcher import WriteBatcher
+
+PHONE = 'whatsapp:+5511933334444'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def start_conversation(db, phone=PHONE):
+    turn = db.load_conversation_turn(phone)
+    turn.start_lead({'timestamp': '2025-08-01T10:00:00', 'telefone': phone, 'status': 'AGUARDANDO_NOME'})
+    turn.commit()
+    return turn
+
+
+def test_evicts_least_recently_used_at_capacity():
+    cache = SessionCache(max_size=2, ttl=60, clock=FakeClock())
+    cache.put('a', {'status': 'A'}, 1)
+    cache.put('b', {'status': 'B'}, 1)
+    assert cache.get('a') == ({'status': 'A'}, 1)   # 'a' passa a ser o mais recente
+    cache.put('c', {'status': 'C'}, 1)
+    assert cache.get('b') is MISSING
+    assert cache.get('a') == ({'status': 'A'}, 1)
+    assert cache.get('c') == ({'status': 'C'}, 1)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_expires_entries_after_ttl():
+    clock = FakeClock()
+    cache = SessionCache(max_size=10, ttl=60, clock=clock)
+    cache.put('a', {'status': 'A'}, 1)
+    cache.put('b', None, 0)
+    clock.now += 59
+    assert cache.get('a') == ({'status': 'A'}, 1)   # o acesso renova o prazo de 'a'
+    clock.now += 2
+    assert cache.get('b') is MISSING
+    assert cache.get('a') == ({'status': 'A'}, 1)
+    clock.now += 61
+    assert cache.get('a') is MISSING
+    assert cache.stats() == {'size': 0, 'hits': 2, 'misses': 2, 'evictions': 2, 'hit_ratio': 0.5}
+
+
+def test_returns_copies():
+    cache = SessionCache(clock=FakeClock())
+    lead = {'status': 'A'}
+    cache.put('a', lead, 1)
+    lead['status'] = 'B'
+    cached, _ = cache.get('a')
+    cached['status'] = 'C'
+    assert cache.get('a') == ({'status': 'A'}, 1)
+
+
+def test_stale_entry_is_replaced_after_out_of_band_write(db):
+    start_conversation(db)
+    assert db.load_conversation_turn(PHONE).status == 'AGUARDANDO_NOME'
+    assert session_cache.get(PHONE) is not MISSING
+
+    # Outro processo grava a conversa: o cache deste não sabe
+    with db.transaction() as conn:
+        conn.execute("UPDATE leads SET status = 'FINALIZADO' WHERE telefone = ?", (PHONE,))
+        conn.execute("UPDATE active_sessions SET version = version + 1 WHERE telefone = ?", (PHONE,))
+
+    turn = db.load_conversation_turn(PHONE)
+    assert turn.status == 'FINALIZADO'
+    assert turn.version == 2
+    assert session_cache.get(PHONE) == (turn.lead, 2)
+
+
+def test_hit_is_served_from_cache_when_version_matches(db):
+    start_conversation(db)
+    db.load_conversation_turn(PHONE)
+    # Alteração sem mudar a versão (não acontece no app): prova que o lead veio do cache
+    with db.transaction() as conn:
+        conn.execute("UPDATE leads SET status = 'OUTRO' WHERE telefone = ?", (PHONE,))
+    assert db.load_conversation_turn(PHONE).status == 'AGUARDANDO_NOME'
+
+
+def test_write_behind_never_reads_older_state(db):
+    batcher = db._write_batcher = WriteBatcher(db.get_connection, mode='write_behind')
+    turn = start_conversation(db)
+    statuses = [f'ETAPA_{index}' for index in range(10)]
+    for index, status in enumerate(statuses):
+        # Segura a thread de gravação: o banco fica atrás do que o turno acabou de gravar
+        gate = threading.Event()
+        batcher.submit(lambda conn: gate.wait(5))
+        turn.update(status)
+        turn.commit()
+        timer = threading.Timer(0.05, gate.set)
+        timer.start()
+        if index % 3 == 1:
+            session_cache.clear()          # falha de cache: relê do banco depois do flush
+        elif index % 3 == 2:
+            session_cache.put(PHONE, turn.lead, turn.version - 1)   # versão antiga em cache: flush e releitura
+        turn = db.load_conversation_turn(PHONE)
+        timer.join()
+        assert turn.status == status
+    db.flush_writes(5)
+    assert db.get_lead_info(PHONE)['status'] == statuses[-1]
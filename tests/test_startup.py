@@ -0,0 +1,12 @@
+import pytest
+
+from benchmarks.bench_startup import measure
+
+
+@pytest.mark.parametrize('module', ['webhook_app', 'app'])
+def test_import_is_light(module):
+    pytest.importorskip('dash')
+    pytest.importorskip('twilio')
+    result, = measure(module, runs=1)
+    assert not result['heavy'], f"{module} carregou {result['heavy']} no import"
+    assert result['leads_queries'] == 0
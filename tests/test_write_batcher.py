@@ -0,0 +1,201 @@
+import os
+import threading
+
+import pytest
+
+from write_batcher import PendingId, WriteBatcher, resolve_id
+
+WRITE_MODES = ('direct', 'group', 'write_behind')
+
+# Etapas de uma conversa depois do "oi": (novo status, dados coletados)
+STEPS = (
+    ('AGUARDANDO_EMAIL', {'nome': 'Cliente'}),
+    ('AGUARDANDO_ENDERECO', {'email': 'cliente@exemplo.com'}),
+    ('AGUARDANDO_MODELO', {'endereco': 'Rua das Flores, 10'}),
+    ('AGUARDANDO_ANO', {'modelo': 'Slim'}),
+    ('AGUARDANDO_ARMAZENAMENTO', {'ano': 2010}),
+    ('AGUARDANDO_JOGOS', {'tipo_de_armazenamento': 'HD Interno'}),
+    ('FINALIZADO', {'jogos_selecionados': 'GTA V, FIFA 19'}),
+)
+
+
+def use_batcher(db, mode):
+    """Troca o gravador do processo por um no modo pedido (parado pela fixture `db`)."""
+    db._write_batcher = WriteBatcher(db.get_connection, mode=mode)
+    return db._write_batcher
+
+
+def new_lead(phone, day):
+    return {
+        'timestamp': f'2025-08-{day:02d}T10:00:00', 'nome': 'Não informado', 'email': 'Não informado',
+        'telefone': phone, 'endereco': 'Não informado', 'modelo': 'Não informado', 'ano': 0,
+        'tipo_de_armazenamento': 'Não informado', 'jogos_selecionados': 'Não informado',
+        'status': 'AGUARDANDO_NOME',
+    }
+
+
+def run_conversation(db, phone, day):
+    turn = db.load_conversation_turn(phone)
+    turn.start_lead(new_lead(phone, day))
+    turn.commit()
+    for status, data in STEPS:
+        turn = db.load_conversation_turn(phone)
+        turn.update(status, data)
+        turn.commit()
+
+
+def block_writer(batcher):
+    """Ocupa a thread de gravação até o Event retornado ser liberado; as gravações seguintes ficam na fila."""
+    running, gate = threading.Event(), threading.Event()
+
+    def wait(conn):
+        running.set()
+        gate.wait(5)
+
+    batcher.submit(wait)
+    assert running.wait(5)
+    return gate
+
+
+def create_scratch_table(db):
+    with db.transaction() as conn:
+        conn.execute("CREATE TABLE scratch (value INTEGER)")
+
+
+def insert_value(value):
+    return lambda conn: conn.execute("INSERT INTO scratch (value) VALUES (?)", (value,)).lastrowid
+
+
+def scratch_values(db):
+    with db.get_connection() as conn:
+        return [row[0] for row in conn.execute("SELECT value FROM scratch ORDER BY rowid")]
+
+
+def all_rollups(conn):
+    return conn.execute("SELECT dia, dimensao, valor, count FROM daily_rollups ORDER BY dia, dimensao, valor").fetchall()
+
+
+def test_failed_write_is_rolled_back_alone(db):
+    create_scratch_table(db)
+    batcher = use_batcher(db, 'group')
+    gate = block_writer(batcher)
+    errors = []
+
+    def failing(conn):
+        conn.execute("INSERT INTO scratch (value) VALUES (99)")
+        raise ValueError("falhou")
+
+    futures = [
+        batcher.submit(insert_value(1)),
+        batcher.submit(failing, on_error=errors.append),
+        batcher.submit(insert_value(2)),
+    ]
+    gate.set()
+    batcher.flush(5)
+
+    # As três gravações entraram no mesmo lote (com o flush, talvez)
+    assert batcher.stats()['max_batch'] >= 3
+    assert scratch_values(db) == [1, 2]
+    assert futures[0].result() and futures[2].result()
+    with pytest.raises(ValueError):
+        futures[1].result()
+    assert [str(error) for error in errors] == ["falhou"]
+
+
+def test_pending_id_resolves_after_commit(db):
+    batcher = use_batcher(db, 'write_behind')
+    phone = 'whatsapp:+5511900000001'
+    turn = db.load_conversation_turn(phone)
+    gate = block_writer(batcher)
+
+    turn.start_lead(new_lead(phone, 1))
+    turn.commit()
+    pending = turn.lead['id']
+    assert isinstance(pending, PendingId)
+    assert pending.assigned is None
+    with pytest.raises(LookupError):
+        resolve_id(pending)
+    # A gravação seguinte da conversa usa o PendingId antes de ele ter valor
+    turn.update('AGUARDANDO_EMAIL', {'nome': 'Cliente'})
+    turn.commit()
+
+    gate.set()
+    lead_id = pending.value(timeout=5)
+    db.flush_writes(5)
+    assert resolve_id(pending) == lead_id
+    assert str(pending) == str(lead_id)
+    with db.get_connection() as conn:
+        row = conn.execute("SELECT id, nome, status FROM leads").fetchall()
+    assert row == [(lead_id, 'Cliente', 'AGUARDANDO_EMAIL')]
+
+
+def test_stop_flushes_queue_in_order(db):
+    create_scratch_table(db)
+    batcher = use_batcher(db, 'write_behind')
+    gate = block_writer(batcher)
+    futures = [batcher.submit(insert_value(value)) for value in range(50)]
+    assert not any(future.done() for future in futures)
+
+    gate.set()
+    batcher.stop()
+    assert all(future.done() for future in futures)
+    assert scratch_values(db) == list(range(50))
+    assert batcher.stats()['pending'] == 0
+
+    # Depois de stop(), as gravações rodam na hora, na thread de quem chama
+    assert batcher.submit(insert_value(50)).done()
+    assert scratch_values(db) == list(range(51))
+
+
+@pytest.mark.parametrize('mode', WRITE_MODES)
+def test_rollups_match_rebuild_after_concurrent_turns(db, mode):
+    use_batcher(db, mode)
+    threads = [
+        threading.Thread(target=run_conversation, args=(db, f'whatsapp:+55119{index:08d}', index % 3 + 1))
+        for index in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    db.flush_writes(10)
+
+    with db.transaction() as conn:
+        assert conn.execute("SELECT status, COUNT(*) FROM leads GROUP BY status").fetchall() == [('FINALIZADO', 20)]
+        incremental = all_rollups(conn)
+        db.rebuild_rollups(conn)
+        assert incremental == all_rollups(conn)
+
+
+@pytest.mark.parametrize('mode', WRITE_MODES)
+def test_queued_conversations_with_fake_sender(db, mode, monkeypatch):
+    pytest.importorskip('flask')
+    pytest.importorskip('twilio')
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import chatbot
+    from benchmarks.bench_webhook import FLOW, SUMMARY_MARKER
+    from dispatcher import MessageDispatcher
+    from outbound import FakeSender, set_sender
+
+    use_batcher(db, mode)
+    sender = FakeSender()
+    set_sender(sender)
+    dispatcher = MessageDispatcher()
+    dispatcher.start()
+    phones = [f'whatsapp:+55219{index:08d}' for index in range(10)]
+    try:
+        for message, _ in FLOW:
+            for phone in phones:
+                dispatcher.submit(phone, chatbot.handle_queued_message, phone, message)
+    finally:
+        dispatcher.stop()
+    db.flush_writes(10)
+
+    for phone in phones:
+        replies = sender.messages_to(phone)
+        assert len(replies) == len(FLOW)
+        assert SUMMARY_MARKER in replies[-1]
+    with db.transaction() as conn:
+        incremental = all_rollups(conn)
+        db.rebuild_rollups(conn)
+        assert incremental == all_rollups(conn)
@@ -0,0 +1,241 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Fração dos turnos gravados no log estruturado (0 a 1). As métricas agregadas sempre contam todos os turnos.
+TRACE_SAMPLE_RATE = float(os.environ.get('CHATBOT_TRACE_SAMPLE_RATE', '1.0'))
+
+# Nível do log do chatbot (DEBUG também registra o texto das mensagens)
+LOG_LEVEL = os.environ.get('CHATBOT_LOG_LEVEL', 'INFO').upper()
+
+# Registros aguardando a thread de escrita; com a fila cheia, os novos são descartados em vez de bloquear
+LOG_QUEUE_SIZE = 10000
+
+# Limites (em segundos) dos buckets dos histogramas de latência
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Estado usado nas métricas quando o telefone não tem conversa ativa
+NO_STATE = 'SEM_CONVERSA'
+
+# Descrição (# HELP) de cada métrica exposta em /metrics
+METRIC_HELP = {
+    'chatbot_turn_span_seconds': "Duração de cada etapa do turno de conversa, por etapa e estado.",
+    'chatbot_turn_seconds': "Duração total do turno de conversa, por estado.",
+    'chatbot_turns_total': "Turnos de conversa processados, por estado e resultado.",
+    'chatbot_write_batch_seconds': "Duração de cada transação de gravação (lote de gravações dos turnos).",
+    'chatbot_write_batch_ops_total': "Gravações executadas pelas transações de gravação.",
+}
+
+logger = logging.getLogger('chatbot')
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como uma linha JSON, incluindo os campos passados em extra={'fields': {...}}."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que nunca bloqueia quem registra: com a fila cheia, o registro é descartado e contado."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler = None
+_listener = None
+
+def configure_logging(stream=None):
+    """Liga o logger 'chatbot' a uma fila escrita em JSON por uma thread própria (só na primeira chamada).
+
+    O turno de conversa só enfileira o registro; a formatação e a escrita
+    em `stream` (stderr por padrão) acontecem fora do caminho da mensagem.
+    """
+    global _handler, _listener
+    if _handler is not None:
+        return
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+    _handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+    logger.addHandler(_handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+def dropped_log_records():
+    return _handler.dropped if _handler is not None else 0
+
+
+class Histogram:
+    """Histograma cumulativo no formato do Prometheus (buckets, soma e contagem)."""
+
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+        self.total += seconds
+        self.count += 1
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in pairs) + '}'
+
+
+class MetricsRegistry:
+    """Histogramas e contadores em memória, expostos no formato de texto do Prometheus.
+
+    As séries são identificadas por (nome, rótulos ordenados). Registrar uma
+    amostra custa um lock e algumas somas; o texto só é montado quando
+    /metrics é consultado.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self, gauges=()):
+        """Texto no formato de exposição do Prometheus. `gauges` são tuplas (nome, ajuda, [(rótulos, valor)])."""
+        with self._lock:
+            histograms = [(key, list(h.counts), h.total, h.count) for key, h in self._histograms.items()]
+            counters = list(self._counters.items())
+
+        lines = []
+        described = set()
+
+        def describe(name, kind, help_text):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), counts, total, count in sorted(histograms):
+            describe(name, 'histogram', METRIC_HELP.get(name, name))
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        for (name, labels), value in sorted(counters):
+            describe(name, 'counter', METRIC_HELP.get(name, name))
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for name, help_text, samples in gauges:
+            describe(name, 'gauge', help_text)
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(sorted(labels.items()))} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+class TurnTrace:
+    """Etapas cronometradas (spans) de um turno de conversa.
+
+    O turno anota o estado em que a conversa estava (`state`) e cada etapa
+    com `span(nome)`. Em finish() as durações entram nos histogramas do
+    processo, rotuladas por etapa e estado, e, se o turno foi sorteado pela
+    amostragem, uma linha JSON com todas as etapas vai para o log.
+    """
+
+    __slots__ = ('state', 'spans', 'started', 'sampled', 'fields', 'finished')
+
+    def __init__(self, sampled=None, **fields):
+        self.state = None
+        self.spans = []
+        self.started = time.perf_counter()
+        self.sampled = random.random() < TRACE_SAMPLE_RATE if sampled is None else sampled
+        self.fields = fields
+        self.finished = False
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, time.perf_counter() - started))
+
+    def add_span(self, name, seconds):
+        self.spans.append((name, seconds))
+
+    def finish(self, ok=True):
+        """Registra o turno nas métricas (e no log, se amostrado). Só a primeira chamada tem efeito."""
+        if self.finished:
+            return
+        self.finished = True
+        elapsed = time.perf_counter() - self.started
+        state = self.state or NO_STATE
+        for name, seconds in self.spans:
+            metrics.observe('chatbot_turn_span_seconds', seconds, span=name, state=state)
+        metrics.observe('chatbot_turn_seconds', elapsed, state=state)
+        metrics.inc('chatbot_turns_total', state=state, outcome='ok' if ok else 'error')
+        if self.sampled and logger.isEnabledFor(logging.INFO):
+            fields = dict(self.fields, state=state, ok=ok, total_ms=round(elapsed * 1000, 3))
+            fields['spans_ms'] = {name: round(seconds * 1000, 3) for name, seconds in self.spans}
+            logger.info("turno", extra={'fields': fields})
+
+
+# Métricas do processo, expostas em /metrics
+metrics = MetricsRegistry()
+
+configure_logging()
@@ -0,0 +1,37 @@
+"""Serviço enxuto só com o webhook do WhatsApp.
+
+Importa apenas o chatbot e o banco (sem Dash, pandas ou plotly), então sobe
+rápido e ocupa pouca memória. O painel (app.py) pode rodar em outro
+processo sobre o mesmo banco:
+
+    gunicorn -w 1 --threads 8 'webhook_app:create_app()'   # webhook
+    CHATBOT_SERVE_WEBHOOK=0 python app.py                  # painel, sem o webhook
+
+O webhook deve rodar num único processo (escale com --threads): as filas
+que mantêm as mensagens de um telefone em ordem (dispatcher) existem por
+processo, então com -w > 1 duas mensagens seguidas do mesmo telefone
+podem ser processadas ao mesmo tempo em workers diferentes, e uma
+resposta pode sobrescrever a outra.
+"""
+import os
+from flask import Blueprint, Flask
+from chatbot import whatsapp_webhook
+from database import init_db
+from health import health_blueprint
+
+webhook_blueprint = Blueprint('whatsapp_webhook', __name__)
+
+@webhook_blueprint.route("/whatsapp_webhook", methods=["POST"])
+def webhook():
+    return whatsapp_webhook()
+
+def create_app():
+    """Cria o app Flask do webhook, garantindo antes que o esquema do banco está atualizado."""
+    init_db()
+    app = Flask(__name__)
+    app.register_blueprint(webhook_blueprint)
+    app.register_blueprint(health_blueprint)
+    return app
+
+if __name__ == '__main__':
+    create_app().run(port=int(os.environ.get('CHATBOT_WEBHOOK_PORT', '5000')))
@@ -0,0 +1,230 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from tracing import metrics
+
+# Como as gravações dos turnos chegam ao banco:
+#   direct       - cada gravação na sua própria transação, na thread de quem grava (padrão)
+#   group        - gravações de turnos simultâneos num único commit; o turno espera o commit antes de responder
+#   write_behind - o turno só enfileira a gravação e responde; o commit acontece em seguida, em lote.
+#                  Uma queda do processo perde as gravações da fila (no máximo alguns ms); um
+#                  encerramento normal grava tudo antes de sair.
+WRITE_MODES = ('direct', 'group', 'write_behind')
+WRITE_MODE = os.environ.get('CHATBOT_WRITE_MODE', 'direct')
+
+# Um lote leva as gravações que já estão na fila (até BATCH_SIZE) e é gravado na hora: as que chegam
+# durante o commit formam o lote seguinte. Com BATCH_WINDOW > 0, o lote ainda espera até esse tempo
+# após a primeira gravação por outras (lotes maiores em troca de latência; útil só no write_behind).
+BATCH_WINDOW = float(os.environ.get('CHATBOT_WRITE_BATCH_MS', '0')) / 1000
+BATCH_SIZE = int(os.environ.get('CHATBOT_WRITE_BATCH_SIZE', '128'))
+
+logger = logging.getLogger('chatbot.writes')
+
+# Sentinela que encerra a thread de gravação
+_STOP = object()
+
+
+class PendingId:
+    """Id de um lead cuja inserção ainda está na fila de gravação.
+
+    No modo write_behind, o turno que cria o lead responde antes do commit,
+    então o lead em cache guarda este objeto no lugar do id. As gravações
+    seguintes da mesma conversa rodam depois da inserção, na mesma thread
+    de gravação, e leem o id de `assigned`. Fora dela, value() (e str())
+    espera o commit da inserção.
+    """
+
+    __slots__ = ('assigned', 'future')
+
+    def __init__(self):
+        self.assigned = None
+        self.future = None
+
+    def value(self, timeout=None):
+        return self.future.result(timeout)
+
+    def __str__(self):
+        return str(self.value())
+
+    def __repr__(self):
+        return f"PendingId({self.assigned!r})"
+
+
+def resolve_id(lead_id):
+    """Id concreto de um lead (dentro da thread de gravação, um PendingId já tem o id atribuído)."""
+    if isinstance(lead_id, PendingId):
+        if lead_id.assigned is None:
+            raise LookupError("A inserção do lead não foi gravada.")
+        return lead_id.assigned
+    return lead_id
+
+
+class _Write:
+    __slots__ = ('op', 'on_commit', 'on_error', 'future')
+
+    def __init__(self, op, on_commit, on_error):
+        self.op = op
+        self.on_commit = on_commit
+        self.on_error = on_error
+        self.future = Future()
+
+
+class WriteBatcher:
+    """Agrupa as gravações de vários turnos em poucas transações (group commit).
+
+    Cada gravação é uma função `op(conn)`. Nos modos group e write_behind,
+    uma única thread tira as gravações da fila em ordem (FIFO) e executa
+    cada lote numa transação. Cada gravação fica no seu próprio SAVEPOINT,
+    então uma gravação com erro é desfeita sozinha e não derruba as demais
+    do lote. `on_commit(resultado)` roda depois do commit e `on_error(erro)`
+    se a gravação não for gravada.
+
+    No modo direct, ou depois de stop(), a gravação roda na hora, na thread
+    de quem chamou, numa transação própria.
+    """
+
+    def __init__(self, connect, mode=WRITE_MODE, window=BATCH_WINDOW, batch_size=BATCH_SIZE):
+        if mode not in WRITE_MODES:
+            raise ValueError(f"CHATBOT_WRITE_MODE inválido: {mode!r} (use {', '.join(WRITE_MODES)})")
+        self.connect = connect
+        self.mode = mode
+        self.window = window
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stopped = False
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.batches = 0
+        self.writes = 0
+        self.errors = 0
+        self.max_batch = 0
+
+    @property
+    def waits_for_commit(self):
+        """True se quem grava deve esperar o commit antes de seguir (modos direct e group)."""
+        return self.mode != 'write_behind'
+
+    def submit(self, op, on_commit=None, on_error=None):
+        """Agenda `op(conn)` e retorna um Future com o resultado, resolvido após o commit."""
+        write = _Write(op, on_commit, on_error)
+        with self._lock:
+            inline = self.mode == 'direct' or self._stopped
+            if not inline:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="chatbot-writer", daemon=True)
+                    self._thread.start()
+                self.pending += 1
+                self._queue.put(write)
+        if inline:
+            self._commit([write])
+        return write.future
+
+    def flush(self, timeout=None):
+        """Espera até que tudo o que já estava na fila tenha sido gravado."""
+        if self.pending:
+            self.submit(lambda conn: None).result(timeout)
+
+    def stop(self, timeout=10.0):
+        """Grava o que está na fila e encerra a thread (gravações seguintes rodam na hora)."""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(_STOP)
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'pending': self.pending,
+                'batches': self.batches,
+                'writes': self.writes,
+                'errors': self.errors,
+                'max_batch': self.max_batch,
+                'avg_batch': self.writes / self.batches if self.batches else 0.0,
+            }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = False
+            # Sem janela, não espera: o que chega durante este commit entra no próximo lote
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            with self._lock:
+                self.pending -= len(batch)
+            if stop:
+                return
+
+    def _commit(self, batch):
+        """Executa o lote numa transação, um SAVEPOINT por gravação, e avisa cada gravação do resultado."""
+        started = time.perf_counter()
+        outcomes = []
+        try:
+            with self.connect() as conn:
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    for write in batch:
+                        conn.execute("SAVEPOINT write_op")
+                        try:
+                            result = write.op(conn)
+                        except Exception as e:
+                            conn.execute("ROLLBACK TO write_op")
+                            conn.execute("RELEASE write_op")
+                            outcomes.append((write, False, e))
+                        else:
+                            conn.execute("RELEASE write_op")
+                            outcomes.append((write, True, result))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+        except Exception as e:
+            # Commit (ou BEGIN) falhou: nada do lote foi gravado
+            outcomes = [(write, False, e) for write in batch]
+
+        elapsed = time.perf_counter() - started
+        failed = sum(1 for _, ok, _ in outcomes if not ok)
+        with self._lock:
+            self.batches += 1
+            self.writes += len(batch)
+            self.errors += failed
+            self.max_batch = max(self.max_batch, len(batch))
+        metrics.observe('chatbot_write_batch_seconds', elapsed, mode=self.mode)
+        metrics.inc('chatbot_write_batch_ops_total', len(batch), mode=self.mode)
+
+        for write, ok, value in outcomes:
+            callback = write.on_commit if ok else write.on_error
+            if ok:
+                write.future.set_result(value)
+            else:
+                if not self.waits_for_commit:
+                    # Ninguém espera o Future no modo write_behind: o erro só aparece aqui
+                    logger.error("Gravação descartada: %s", value)
+                write.future.set_exception(value)
+            if callback is not None:
+                try:
+                    callback(value)
+                except Exception:
+                    logger.exception("Erro no retorno de uma gravação")